@@ -1563,6 +1563,16 @@ def create_para_file(variables):
     
     return para_path
 
+def parse_engine_record(line):
+    """The JSON record of a `tarang_linux --progress json` line, or None for any other output"""
+    if not line.startswith('{"event"'):
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
 def start_local_simulation(para_path, process_id):
     """Start local simulation process and return the Popen handle.
     Streams stdout via a background thread using SocketIO.
@@ -1581,6 +1591,8 @@ def start_local_simulation(para_path, process_id):
             cmd = [_sys.executable, '-u', script_path]
             if para_path:
                 cmd.append(para_path)
+            # One JSON record per progress interval instead of prose lines
+            cmd += ['--progress', 'json']
         elif system == "Linux":
             if os.path.exists("./tarang_linux"):
                 print(f"Using Linux simulation executable: ./tarang_linux")
@@ -1674,6 +1686,13 @@ print("Done")
         def stream_output(proc):
             try:
                 for line in proc.stdout:
+                    record = parse_engine_record(line)
+                    if record is not None:
+                        socketio.emit('simulation_progress', {
+                            'process_id': process_id,
+                            'record': record
+                        })
+                        continue
                     socketio.emit('simulation_output', {
                         'process_id': process_id,
                         'output': line.rstrip('\n')
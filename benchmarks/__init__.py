@@ -0,0 +1,4 @@
+"""
+Benchmarks for the Tarang engine
+Run from the repository root, e.g. python -m benchmarks.precision
+"""
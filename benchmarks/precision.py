@@ -0,0 +1,85 @@
+"""
+Single vs double precision benchmark
+Runs the same initial field in float64 and float32 and compares speed, memory and accuracy
+
+    python -m benchmarks.precision --sizes 32 64 128 --steps 20
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+from tarang_engine.initial import random_field
+from tarang_engine.params import load_parameters
+from tarang_engine.simulation import make_solver
+
+
+def build(N, real_dtype, scheme, nu, dt):
+    """Solver at N^3 with the given precision"""
+    params = load_parameters()
+    params.update(Nx=N, Ny=N, Nz=N, nu=nu, dt=dt, time_scheme=scheme, real_dtype=real_dtype, complex_dtype='complex')
+    return make_solver(params)
+
+
+def timed_run(solver, steps, dt):
+    """Wall time of `steps` steps after one warm-up step"""
+    solver.step(dt)
+    start = time.perf_counter()
+    for _ in range(steps):
+        solver.step(dt)
+    return time.perf_counter() - start
+
+
+def compare(N, steps, scheme='RK4', nu=0.01, dt=1e-3):
+    """float64 vs float32 for one grid size"""
+    ref = build(N, 'float64', scheme, nu, dt)
+    random_field(ref)
+    single = build(N, 'float32', scheme, nu, dt)
+    single.uk[...] = ref.uk
+    e0 = ref.energy()
+
+    t64 = timed_run(ref, steps, dt)
+    t32 = timed_run(single, steps, dt)
+
+    diff = single.uk.astype(np.complex128) - ref.uk
+    rel_l2 = float(np.sqrt(np.sum(np.abs(diff)**2) / np.sum(np.abs(ref.uk)**2)))
+    return {
+        'N': N,
+        'steps': steps,
+        'scheme': scheme,
+        'float64_steps_per_sec': steps / t64,
+        'float32_steps_per_sec': steps / t32,
+        'speedup': t64 / t32,
+        'float64_workspace_mib': ref.workspace.nbytes / 2**20,
+        'float32_workspace_mib': single.workspace.nbytes / 2**20,
+        'velocity_rel_l2_error': rel_l2,
+        'energy_rel_error': abs(single.energy() - ref.energy()) / ref.energy(),
+        'energy_change': (ref.energy() - e0) / e0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare float32 and float64 engine runs')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[32, 64])
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--scheme', default='RK4')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'N':>5} {'f64 st/s':>10} {'f32 st/s':>10} {'speedup':>8} {'f64 MiB':>9} {'f32 MiB':>9} "
+          f"{'rel L2':>10} {'rel dE':>10}")
+    for N in args.sizes:
+        r = compare(N, args.steps, args.scheme)
+        results.append(r)
+        print(f"{N:5d} {r['float64_steps_per_sec']:10.2f} {r['float32_steps_per_sec']:10.2f} "
+              f"{r['speedup']:8.2f} {r['float64_workspace_mib']:9.1f} {r['float32_workspace_mib']:9.1f} "
+              f"{r['velocity_rel_l2_error']:10.2e} {r['energy_rel_error']:10.2e}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Checkpoint restart benchmark
+Times saving and restarting from the binary checkpoint against an HDF5 field snapshot of the same state
+
+    python -m benchmarks.restart --sizes 64 128 --json restart.json
+
+Load time covers restoring the state (including the real-space refresh);
+restart time runs on to the end of the first step. The solver is built
+beforehand, so both measure only what the format costs.
+
+The files are written just before being read and are likely still in the
+page cache; drop caches between runs to measure cold reads.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from tarang_engine.checkpoint import load_checkpoint, save_checkpoint
+from tarang_engine.initial import random_field
+from tarang_engine.output import read_snapshot, write_snapshot
+from tarang_engine.params import load_parameters
+from tarang_engine.simulation import make_solver
+
+
+def build(N, scheme, dt):
+    """Solver at N^3"""
+    params = load_parameters()
+    params.update(Nx=N, Ny=N, Nz=N, dt=dt, time_scheme=scheme)
+    return make_solver(params)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def restart_time(load, path, N, scheme, dt):
+    """Seconds to load path and to the end of the first step, and the energy restored"""
+    solver = build(N, scheme, dt)
+    start = time.perf_counter()
+    load(solver, path)
+    loaded = time.perf_counter()
+    solver.step(dt)
+    return loaded - start, time.perf_counter() - start, solver.energy()
+
+
+def compare(N, directory, scheme='RK2', dt=1e-3):
+    """Checkpoint vs HDF5 for one grid size"""
+    source = build(N, scheme, dt)
+    random_field(source)
+    source.step(dt)
+    ckpt = os.path.join(directory, f"bench_{N}.tck")
+    h5 = os.path.join(directory, f"bench_{N}.h5")
+
+    save_ckpt = timed(save_checkpoint, source, ckpt)
+    save_h5 = timed(write_snapshot, h5, source.field_names, source.state, source.step_count, source.t, source.fft)
+    load_ckpt, restart_ckpt, e_ckpt = restart_time(load_checkpoint, ckpt, N, scheme, dt)
+    load_h5, restart_h5, e_h5 = restart_time(read_snapshot, h5, N, scheme, dt)
+    if e_ckpt != e_h5:
+        raise RuntimeError(f"Restarted states differ at N={N}: {e_ckpt} vs {e_h5}")
+    return {
+        'N': N,
+        'checkpoint_mib': os.path.getsize(ckpt) / 2**20,
+        'hdf5_mib': os.path.getsize(h5) / 2**20,
+        'checkpoint_save_sec': save_ckpt,
+        'hdf5_save_sec': save_h5,
+        'checkpoint_load_sec': load_ckpt,
+        'hdf5_load_sec': load_h5,
+        'checkpoint_restart_sec': restart_ckpt,
+        'hdf5_restart_sec': restart_h5,
+        'load_speedup': load_h5 / load_ckpt,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare checkpoint and HDF5 restart times')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[32, 64])
+    parser.add_argument('--scheme', default='RK2')
+    parser.add_argument('--dir', help='Directory for the test files (default: a temporary one)')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'N':>5} {'MiB':>8} {'ckpt save':>10} {'h5 save':>10} {'ckpt load':>10} {'h5 load':>10} "
+          f"{'speedup':>8} {'ckpt restart':>13} {'h5 restart':>11}")
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for N in args.sizes:
+            r = compare(N, directory, args.scheme)
+            results.append(r)
+            print(f"{N:5d} {r['checkpoint_mib']:8.1f} {r['checkpoint_save_sec']:10.4f} {r['hdf5_save_sec']:10.4f} "
+                  f"{r['checkpoint_load_sec']:10.4f} {r['hdf5_load_sec']:10.4f} {r['load_speedup']:8.2f} "
+                  f"{r['checkpoint_restart_sec']:13.4f} {r['hdf5_restart_sec']:11.4f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
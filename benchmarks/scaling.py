@@ -0,0 +1,127 @@
+"""
+Strong and weak scaling benchmark for the MPI engine
+Launches the engine under mpiexec for each rank count and tabulates steps/s and parallel efficiency
+
+    python -m benchmarks.scaling --ranks 1 2 4 8 --N 64 --mode both
+    python -m benchmarks.scaling --ranks 1 2 4 --decomposition pencil --json scaling.json
+
+Strong scaling keeps the grid at N^3; weak scaling grows it to (N*ranks) x N x N
+so every rank holds the same number of points.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from tarang_engine.distributed import mpi_world
+from tarang_engine.initial import taylor_green
+from tarang_engine.params import load_parameters
+from tarang_engine.simulation import make_fft, make_solver
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def worker(args):
+    """Run inside mpiexec: time `steps` steps and print one JSON record from rank 0"""
+    params = load_parameters()
+    params.update(Nx=args.Nx, Ny=args.Ny, Nz=args.Nz, time_scheme=args.scheme,
+                  mpi_decomposition=args.decomposition)
+    comm = mpi_world()
+    solver = make_solver(params, fft=make_fft(params, comm))
+    taylor_green(solver)
+    dt = float(params['dt'])
+
+    solver.step(dt)
+    if comm is not None:
+        comm.Barrier()
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        solver.step(dt)
+    if comm is not None:
+        comm.Barrier()
+    elapsed = time.perf_counter() - start
+
+    if solver.fft.rank == 0:
+        rate = args.steps / elapsed
+        print(json.dumps({
+            'ranks': solver.fft.nprocs,
+            'grid': [args.Nx, args.Ny, args.Nz],
+            'layout': solver.fft.describe(),
+            'steps_per_sec': rate,
+            'ns_per_point_step': 1e9 / (rate * solver.grid_points),
+            'energy': solver.energy(),
+        }), flush=True)
+    elif comm is not None:
+        solver.energy()
+
+
+def launch(mpiexec, ranks, grid, args):
+    """Run one worker configuration and return its JSON record"""
+    cmd = [mpiexec, '-n', str(ranks), sys.executable, '-m', 'benchmarks.scaling', '--worker',
+           '--Nx', str(grid[0]), '--Ny', str(grid[1]), '--Nz', str(grid[2]),
+           '--steps', str(args.steps), '--scheme', args.scheme, '--decomposition', args.decomposition]
+    result = subprocess.run(cmd, cwd=REPO_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} failed:\n{result.stdout}\n{result.stderr}")
+    lines = [line for line in result.stdout.splitlines() if line.startswith('{')]
+    return json.loads(lines[-1])
+
+
+def sweep(mode, args):
+    """Records for every rank count, with efficiency relative to the first one"""
+    records = []
+    for ranks in args.ranks:
+        grid = (args.N * ranks, args.N, args.N) if mode == 'weak' else (args.N, args.N, args.N)
+        record = launch(args.mpiexec, ranks, grid, args)
+        record['mode'] = mode
+        records.append(record)
+
+    base = records[0]
+    for r in records:
+        speedup = r['steps_per_sec'] / base['steps_per_sec']
+        # Strong: ideal speedup is the rank ratio; weak: ideal is a constant step rate
+        r['efficiency'] = speedup * base['ranks'] / r['ranks'] if mode == 'strong' else speedup
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Strong/weak scaling of the MPI engine')
+    parser.add_argument('--ranks', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--N', type=int, default=64)
+    parser.add_argument('--steps', type=int, default=10)
+    parser.add_argument('--scheme', default='RK2')
+    parser.add_argument('--mode', choices=['strong', 'weak', 'both'], default='both')
+    parser.add_argument('--decomposition', choices=['slab', 'pencil'], default='slab')
+    parser.add_argument('--mpiexec', default='mpiexec')
+    parser.add_argument('--json', help='Also write the results to this file')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--Nx', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--Ny', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--Nz', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    modes = ['strong', 'weak'] if args.mode == 'both' else [args.mode]
+    results = []
+    for mode in modes:
+        records = sweep(mode, args)
+        results.extend(records)
+        print(f"\n{mode} scaling ({args.decomposition})")
+        print(f"{'ranks':>6} {'grid':>14} {'steps/s':>10} {'ns/pt/step':>11} {'efficiency':>11}")
+        for r in records:
+            grid = 'x'.join(str(n) for n in r['grid'])
+            print(f"{r['ranks']:6d} {grid:>14} {r['steps_per_sec']:10.2f} "
+                  f"{r['ns_per_point_step']:11.2f} {r['efficiency']:11.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+Engine benchmark suite with regression baselines
+Times hydro and MHD steps over grid sizes and precisions, and compares a run against a stored baseline
+
+    python -m benchmarks.suite run --json bench.json
+    python -m benchmarks.suite run --sizes 32 64 --kinds HYDRO --dtypes float64 --json quick.json
+    python -m benchmarks.suite compare baseline.json bench.json --threshold 0.1
+
+Every case runs in its own process so that peak RSS is the case's own and
+no FFT plan or operator cache carries over. steps/s is taken from the
+fastest of --repeats timed blocks to damp noise from other load on the
+machine; the per-phase times average over all of them. compare exits with status 1
+when a case's steps/s dropped, or its peak RSS grew, by more than the
+threshold, so it can gate a CI job.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+import numpy as np
+from tarang_engine import __version__
+from tarang_engine.initial import random_field
+from tarang_engine.params import load_parameters
+from tarang_engine.simulation import make_fft, make_solver
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Bumped whenever the layout of the result file changes
+SCHEMA_VERSION = 1
+
+COMPLEX_DTYPES = {'float32': 'complex64', 'float64': 'complex128'}
+
+
+def worker(args):
+    """Run inside a fresh process: time one case and print its JSON record"""
+    params = load_parameters()
+    params.update(kind=args.kind, Nx=args.N, Ny=args.N, Nz=args.N, time_scheme=args.scheme, dt=args.dt,
+                  real_dtype=args.dtype, complex_dtype=COMPLEX_DTYPES[args.dtype], FIXED_DT=True)
+    solver = make_solver(params, fft=make_fft(params))
+    random_field(solver)
+
+    solver.step(args.dt)
+    solver.timers.reset()
+    blocks = []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            solver.step(args.dt)
+        blocks.append(time.perf_counter() - start)
+
+    t = solver.timers.snapshot()
+    nsteps = args.steps * args.repeats
+    # Loop overhead outside solver.step is charged to 'other' and left out
+    phases = {name: t[name] for name in ('fft', 'nonlinear', 'integrator')}
+    rate = args.steps / min(blocks)
+    print(json.dumps({
+        'kind': args.kind,
+        'N': args.N,
+        'dtype': args.dtype,
+        'scheme': args.scheme,
+        'steps': args.steps,
+        'repeats': args.repeats,
+        'steps_per_sec': rate,
+        'ns_per_point_step': 1e9 / (rate * solver.grid_points),
+        'phase_sec_per_step': {name: value / nsteps for name, value in phases.items()},
+        'peak_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'workspace_mib': solver.workspace.nbytes / 2**20,
+        'energy': solver.energy(),
+    }), flush=True)
+
+
+def launch(kind, N, dtype, args):
+    """Run one case in a subprocess and return its record"""
+    cmd = [sys.executable, '-m', 'benchmarks.suite', 'worker', '--kind', kind, '--N', str(N),
+           '--dtype', dtype, '--steps', str(args.steps), '--repeats', str(args.repeats),
+           '--scheme', args.scheme, '--dt', str(args.dt)]
+    result = subprocess.run(cmd, cwd=REPO_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} failed:\n{result.stdout}\n{result.stderr}")
+    lines = [line for line in result.stdout.splitlines() if line.startswith('{')]
+    return json.loads(lines[-1])
+
+
+def git_commit():
+    """Commit of the working tree, or None outside a git checkout"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def machine():
+    """Where the numbers were taken; compare warns when this differs"""
+    return {
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+    }
+
+
+def case_key(record):
+    return (record['kind'], record['N'], record['dtype'], record['scheme'])
+
+
+def case_name(key):
+    kind, N, dtype, scheme = key
+    return f"{kind} {N}^3 {dtype} {scheme}"
+
+
+def run(args):
+    """Time every (kind, N, dtype) case and print a table, optionally saving the versioned report"""
+    results = []
+    print(f"{'case':>28} {'steps/s':>9} {'ns/pt/step':>11} {'fft':>7} {'nonlin':>7} {'integ':>7} {'RSS MiB':>9}")
+    for kind in args.kinds:
+        for N in args.sizes:
+            for dtype in args.dtypes:
+                r = launch(kind, N, dtype, args)
+                results.append(r)
+                step = sum(r['phase_sec_per_step'].values())
+                share = {name: value / step for name, value in r['phase_sec_per_step'].items()}
+                print(f"{case_name(case_key(r)):>28} {r['steps_per_sec']:9.2f} {r['ns_per_point_step']:11.2f} "
+                      f"{share['fft']:7.1%} {share['nonlinear']:7.1%} {share['integrator']:7.1%} "
+                      f"{r['peak_rss_mib']:9.1f}")
+
+    report = {
+        'schema_version': SCHEMA_VERSION,
+        'engine_version': __version__,
+        'git_commit': git_commit(),
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'machine': machine(),
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        return 1 if regressions(baseline, report, args.threshold) else 0
+    return 0
+
+
+def regressions(baseline, current, threshold):
+    """Print the case-by-case comparison and return the regressed cases"""
+    for report in (baseline, current):
+        if report.get('schema_version') != SCHEMA_VERSION:
+            raise ValueError(f"Result file has schema_version {report.get('schema_version')}, "
+                             f"this suite reads {SCHEMA_VERSION}")
+    if baseline['machine'] != current['machine']:
+        print("warning: the baseline was taken on a different machine or software stack")
+    old = {case_key(r): r for r in baseline['results']}
+    flagged = []
+    print(f"{'case':>28} {'steps/s':>17} {'change':>8} {'RSS MiB':>15} {'change':>8}")
+    for r in current['results']:
+        key = case_key(r)
+        base = old.get(key)
+        if base is None:
+            print(f"{case_name(key):>28}  (not in baseline)")
+            continue
+        speed = r['steps_per_sec'] / base['steps_per_sec'] - 1
+        memory = r['peak_rss_mib'] / base['peak_rss_mib'] - 1
+        slow, fat = speed < -threshold, memory > threshold
+        mark = '  REGRESSION' if slow or fat else ''
+        print(f"{case_name(key):>28} {base['steps_per_sec']:8.2f}->{r['steps_per_sec']:<8.2f} {speed:+8.1%} "
+              f"{base['peak_rss_mib']:7.0f}->{r['peak_rss_mib']:<7.0f} {memory:+8.1%}{mark}")
+        if slow or fat:
+            flagged.append(key)
+    print(f"{len(flagged)} regression(s) beyond {threshold:.0%} "
+          f"(baseline {baseline.get('git_commit')}, current {current.get('git_commit')})")
+    return flagged
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    return 1 if regressions(baseline, current, args.threshold) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Engine benchmark suite with regression baselines')
+    commands = parser.add_subparsers(dest='command', required=True, metavar='{run,compare}')
+
+    run_parser = commands.add_parser('run', help='Time the engine over a grid of cases')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=[32, 64, 128, 256])
+    run_parser.add_argument('--kinds', nargs='+', default=['HYDRO', 'MHD'])
+    run_parser.add_argument('--dtypes', nargs='+', choices=sorted(COMPLEX_DTYPES), default=['float32', 'float64'])
+    run_parser.add_argument('--steps', type=int, default=5)
+    run_parser.add_argument('--repeats', type=int, default=3, help='Timed blocks of --steps; the fastest counts')
+    run_parser.add_argument('--scheme', default='RK4')
+    run_parser.add_argument('--dt', type=float, default=1e-3)
+    run_parser.add_argument('--json', help='Write the versioned report to this file')
+    run_parser.add_argument('--baseline', help='Also compare against this report')
+    run_parser.add_argument('--threshold', type=float, default=0.1)
+
+    compare_parser = commands.add_parser('compare', help='Flag regressions of a report against a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='Relative slowdown or memory growth that counts as a regression')
+
+    worker_parser = commands.add_parser('worker')
+    worker_parser.add_argument('--kind')
+    worker_parser.add_argument('--N', type=int)
+    worker_parser.add_argument('--dtype')
+    worker_parser.add_argument('--steps', type=int)
+    worker_parser.add_argument('--repeats', type=int)
+    worker_parser.add_argument('--scheme')
+    worker_parser.add_argument('--dt', type=float)
+
+    args = parser.parse_args()
+    if args.command == 'worker':
+        worker(args)
+        return 0
+    return run(args) if args.command == 'run' else compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
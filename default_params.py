@@ -2,6 +2,9 @@ import numpy as np
 device_rank = 0
 complex_dtype = "complex"
 real_dtype = "float64"
+kernel_backend = "numpy"
+ensemble = None
+ensemble_batch = 0
 BOX_SIZE_DEFAULT = True
 
 L  =  [10, 10, 10]
@@ -37,6 +37,9 @@ iter_modes_save_inter = 200.0
 device_rank = 0
 complex_dtype = 'complex'
 real_dtype = 'float64'
+kernel_backend = 'numpy'
+ensemble = None
+ensemble_batch = 0
 BOX_SIZE_DEFAULT = True
 L = [6.283185307179586, 6.283185307179586, 6.283185307179586]
 Rac = 657.5113644795163
@@ -37,6 +37,12 @@ function setupSocketHandlers() {
         }
     });
 
+    socket.on('simulation_progress', function(data) {
+        if (data.process_id === currentProcessId) {
+            appendOutput(formatProgress(data.record));
+        }
+    });
+
     socket.on('simulation_complete', function(data) {
         if (data.process_id === currentProcessId) {
             updateStatus('completed', 'Simulation completed successfully!');
@@ -78,6 +84,22 @@ function clearOutput() {
     }
 }
 
+function formatProgress(record) {
+    // One output line from a JSON progress record of the engine
+    const num = (v, digits) => (v === null || v === undefined) ? '-' : Number(v).toExponential(digits);
+    if (record.event === 'progress') {
+        const step = record.nsteps ? `${record.step}/${record.nsteps}` : `${record.step}`;
+        const eta = record.eta_sec === null ? '-' : `${record.eta_sec.toFixed(1)}s`;
+        return `Step ${step}: t=${record.t.toFixed(4)} | dt=${num(record.dt, 3)} | KE=${num(record.energy, 6)} | ` +
+               `CFL=${record.cfl === null ? '-' : record.cfl.toFixed(3)} | ` +
+               `${record.steps_per_sec.toFixed(2)} steps/s | ETA ${eta}`;
+    }
+    if (record.event === 'summary') {
+        return `Completed ${record.steps} steps in ${record.elapsed.toFixed(3)}s | ${record.steps_per_sec.toFixed(2)} steps/s`;
+    }
+    return `${record.event}: t=${record.t !== undefined ? record.t.toFixed(4) : ''} ${record.detail || record.path || ''}`;
+}
+
 // Optimized output appending with batching for better performance
 let outputBuffer = [];
 let outputTimeout = null;
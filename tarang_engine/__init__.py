@@ -0,0 +1,6 @@
+"""
+Tarang simulation engine
+Pseudo-spectral solvers driven by the para.py parameter files written by the web app
+"""
+
+__version__ = '2.1.0'
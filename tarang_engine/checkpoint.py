@@ -0,0 +1,120 @@
+"""
+Binary checkpoint/restart for the Tarang engine
+A fixed-size JSON header followed by the raw spectral state, reloaded through np.memmap
+
+Layout of a .tck file:
+    bytes 0..8            magic b'TARANGCK'
+    bytes 8..HEADER_SIZE  UTF-8 JSON metadata, space padded
+    HEADER_SIZE..         state array, C order, dtype and shape from the header
+The data block starts on a page boundary, so a restart maps it straight
+into the solver state without parsing or staging the whole file.
+"""
+
+import json
+import os
+import numpy as np
+from tarang_engine.fft import spectral_blocks
+
+CHECKPOINT_MAGIC = b'TARANGCK'
+CHECKPOINT_VERSION = 1
+HEADER_SIZE = 4096
+
+
+def checkpoint_path(output_dir, fft, name='checkpoint'):
+    """Rolling checkpoint file; every rank of a distributed run keeps its own block"""
+    suffix = '' if fft.nprocs == 1 else f"_rank{fft.rank}"
+    return os.path.join(output_dir or '.', f"{name}{suffix}.tck")
+
+
+def is_checkpoint(path):
+    """True when path starts with the checkpoint magic"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(CHECKPOINT_MAGIC)) == CHECKPOINT_MAGIC
+    except OSError:
+        return False
+
+
+def save_checkpoint(solver, path):
+    """Write the solver state atomically: temporary file, fsync, rename"""
+    state = solver.state
+    header = {
+        'version': CHECKPOINT_VERSION,
+        'kind': solver.kind,
+        'dtype': state.dtype.str,
+        'shape': list(state.shape),
+        'global_shape': list(solver.fft.global_shape),
+        'spectral_offset': list(solver.fft.spectral_offset),
+        't': solver.t,
+        'dt': solver.dt,
+        'step': solver.step_count,
+        'rng': solver.rng.bit_generator.state,
+    }
+    text = json.dumps(header).encode()
+    if len(CHECKPOINT_MAGIC) + len(text) > HEADER_SIZE:
+        raise ValueError(f"Checkpoint header needs {len(text)} bytes, more than {HEADER_SIZE}")
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(CHECKPOINT_MAGIC + text.ljust(HEADER_SIZE - len(CHECKPOINT_MAGIC)))
+        f.write(np.ascontiguousarray(state).data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def read_header(path):
+    """Metadata dict of a checkpoint file"""
+    with open(path, 'rb') as f:
+        block = f.read(HEADER_SIZE)
+    if not block.startswith(CHECKPOINT_MAGIC):
+        raise ValueError(f"{path} is not a Tarang checkpoint")
+    header = json.loads(block[len(CHECKPOINT_MAGIC):].decode())
+    if header.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"{path}: unsupported checkpoint version {header.get('version')}")
+    return header
+
+
+def map_checkpoint(path):
+    """(header, read-only memmap of the state) without reading the data block"""
+    header = read_header(path)
+    data = np.memmap(path, dtype=np.dtype(header['dtype']), mode='r',
+                     offset=HEADER_SIZE, shape=tuple(header['shape']))
+    return header, data
+
+
+def load_checkpoint(solver, path):
+    """Restore state, time, step count and RNG stream of solver from a checkpoint
+
+    A single-process checkpoint of another grid is truncated or
+    zero-padded to the solver's, copying only the shared blocks of modes
+    out of the mapped file.
+    """
+    header, data = map_checkpoint(path)
+    if header['kind'] != solver.kind:
+        raise ValueError(f"{path} holds a {header['kind']} state, the solver is {solver.kind}")
+    grid = tuple(header['global_shape'])
+    # Only a whole single-process state can be resampled
+    whole = tuple(header['shape'][1:]) == grid[:-1] + (grid[-1] // 2 + 1,) and solver.fft.nprocs == 1
+    if grid != solver.fft.global_shape and whole and len(grid) == len(solver.fft.global_shape):
+        solver.state[...] = 0
+        for source, target in spectral_blocks(grid, solver.fft.global_shape):
+            np.copyto(solver.state[(slice(None),) + target], data[(slice(None),) + source], casting='same_kind')
+        solver.state *= solver.dealias
+    elif tuple(header['shape']) != solver.state.shape or grid != solver.fft.global_shape:
+        raise ValueError(f"{path} holds a {header['global_shape']} grid block {header['shape']}, "
+                         f"the solver expects {list(solver.fft.global_shape)} block {list(solver.state.shape)}")
+    else:
+        # Precision may differ from the run that wrote it; copyto casts
+        np.copyto(solver.state, data, casting='same_kind')
+    del data
+    solver.t = float(header['t'])
+    solver.dt = float(header['dt'])
+    solver.step_count = int(header['step'])
+    solver.rng.bit_generator.state = header['rng']
+    solver.update_real()
+    return header
@@ -0,0 +1,250 @@
+"""
+Distributed FFT for multi-node runs
+Slab or pencil domain decomposition over mpi4py, with all-to-all transposes between FFT stages
+
+Launch with e.g. `mpirun -n 4 tarang_linux para.py`. The solver is unaware
+of the decomposition: it only sees the local real and spectral blocks, the
+local wavenumbers and the global sum/max reductions of the plan.
+"""
+
+import os
+import numpy as np
+from tarang_engine.timers import timed_transform
+
+# Environment variables set by common MPI launchers
+MPI_LAUNCH_VARIABLES = ('OMPI_COMM_WORLD_SIZE', 'PMI_SIZE', 'PMIX_RANK', 'MPI_LOCALNRANKS', 'MV2_COMM_WORLD_SIZE')
+
+
+def launched_under_mpi():
+    """True when the process looks like it was started by mpirun/mpiexec/srun"""
+    return any(name in os.environ for name in MPI_LAUNCH_VARIABLES)
+
+
+def mpi_world():
+    """COMM_WORLD when running on more than one rank, otherwise None
+
+    mpi4py is only imported under an MPI launcher, so single-process runs
+    never need an MPI installation.
+    """
+    if not launched_under_mpi():
+        return None
+    try:
+        from mpi4py import MPI
+    except ImportError:
+        print("Warning: started under an MPI launcher but mpi4py is not installed; running serially")
+        return None
+    comm = MPI.COMM_WORLD
+    return comm if comm.Get_size() > 1 else None
+
+
+def split_sizes(n, parts):
+    """Block sizes of n points over parts ranks, larger blocks first"""
+    return [n // parts + (1 if r < n % parts else 0) for r in range(parts)]
+
+
+def split_offsets(sizes):
+    """Start index of every block"""
+    return [int(v) for v in np.concatenate(([0], np.cumsum(sizes)[:-1]))]
+
+
+def process_grid(nprocs, decomposition='slab', dims=None):
+    """(P1, P2) process grid: slab is (P, 1), pencil the most square factorisation"""
+    if dims is not None:
+        P1, P2 = (int(v) for v in dims)
+        if P1 * P2 != nprocs:
+            raise ValueError(f"Process grid {P1}x{P2} does not match {nprocs} ranks")
+        return P1, P2
+    decomposition = str(decomposition).lower()
+    if decomposition == 'slab':
+        return nprocs, 1
+    if decomposition == 'pencil':
+        P2 = int(np.sqrt(nprocs))
+        while nprocs % P2:
+            P2 -= 1
+        return nprocs // P2, P2
+    raise ValueError(f"Unknown decomposition '{decomposition}' (expected slab or pencil)")
+
+
+class DistributedFFT:
+    """Real-to-complex 3D transform on a P1 x P2 process grid
+
+    Real space:     x split over P1, y split over P2, z whole   (slab: P2 = 1)
+    Spectral space: x whole, y split over P1, kz split over P2
+
+    Forward: rfft(z) -> transpose y/z within rows -> fft(y)
+             -> transpose x/y within columns -> fft(x); backward reverses it.
+    Transpose and intermediate buffers are kept per batch size, so after
+    the first step the transforms allocate nothing.
+    """
+
+    # PhaseTimers charged with every transform, set by the solver
+    timers = None
+
+    def __init__(self, Nx, Ny, Nz, comm, decomposition='slab', dims=None):
+        from mpi4py import MPI
+        self._MPI = MPI
+        self.comm = comm
+        self.rank = comm.Get_rank()
+        self.nprocs = comm.Get_size()
+        self.dims = process_grid(self.nprocs, decomposition, dims)
+        P1, P2 = self.dims
+        i, j = divmod(self.rank, P2)
+        # comm_a links ranks of one column (varying i), comm_b ranks of one row (varying j)
+        self.comm_a = comm.Split(color=j, key=i)
+        self.comm_b = comm.Split(color=i, key=j)
+
+        Nzh = Nz // 2 + 1
+        if min(Nx, Ny) < P1 or min(Ny, Nzh) < P2:
+            raise ValueError(f"Grid {Nx}x{Ny}x{Nz} is too small for a {P1}x{P2} process grid")
+        self.global_shape = (Nx, Ny, Nz)
+
+        x_sizes, y_real_sizes = split_sizes(Nx, P1), split_sizes(Ny, P2)
+        y_spec_sizes, z_sizes = split_sizes(Ny, P1), split_sizes(Nzh, P2)
+        self.real_shape = (x_sizes[i], y_real_sizes[j], Nz)
+        self.real_offset = (split_offsets(x_sizes)[i], split_offsets(y_real_sizes)[j], 0)
+        self._zstage_shape = (x_sizes[i], y_real_sizes[j], Nzh)
+        self._ystage_shape = (x_sizes[i], Ny, z_sizes[j])
+        self.spectral_shape = (Nx, y_spec_sizes[i], z_sizes[j])
+        self.spectral_offset = (0, split_offsets(y_spec_sizes)[i], split_offsets(z_sizes)[j])
+        self._scratch = {}
+
+    def describe(self):
+        P1, P2 = self.dims
+        kind = 'slab' if P2 == 1 else 'pencil'
+        return f"{kind} decomposition, {P1}x{P2} process grid over {self.nprocs} ranks"
+
+    def wavenumber_indices(self):
+        """Integer wavenumbers of the local spectral block, broadcast-shaped"""
+        Nx, Ny, Nz = self.global_shape
+        _, y0, z0 = self.spectral_offset
+        _, ny_loc, nz_loc = self.spectral_shape
+        nx = np.fft.fftfreq(Nx, 1.0 / Nx).reshape(-1, 1, 1)
+        ny = np.fft.fftfreq(Ny, 1.0 / Ny)[y0:y0 + ny_loc].reshape(1, -1, 1)
+        nz = np.fft.rfftfreq(Nz, 1.0 / Nz)[z0:z0 + nz_loc].reshape(1, 1, -1)
+        return nx, ny, nz
+
+    def _buffer(self, name, shape, dtype):
+        key = (name, shape, np.dtype(dtype))
+        buf = self._scratch.get(key)
+        if buf is None:
+            buf = np.empty(shape, dtype=dtype)
+            self._scratch[key] = buf
+        return buf
+
+    def _exchange(self, src, dst, comm, scatter_axis, gather_axis):
+        """All-to-all transpose: scatter_axis is whole in src and local in dst, gather_axis the reverse"""
+        P = comm.Get_size()
+        if P == 1:
+            np.copyto(dst, src)
+            return dst
+        scatter = split_sizes(src.shape[scatter_axis], P)
+        gather = split_sizes(dst.shape[gather_axis], P)
+        s_off, g_off = split_offsets(scatter), split_offsets(gather)
+
+        sendbuf = self._buffer('send', (src.size,), src.dtype)
+        recvbuf = self._buffer('recv', (dst.size,), dst.dtype)
+        send_counts, recv_counts = [], []
+        pos = 0
+        for q in range(P):
+            index = [slice(None)] * src.ndim
+            index[scatter_axis] = slice(s_off[q], s_off[q] + scatter[q])
+            block = src[tuple(index)]
+            sendbuf[pos:pos + block.size].reshape(block.shape)[...] = block
+            send_counts.append(block.size)
+            pos += block.size
+        for q in range(P):
+            shape = list(dst.shape)
+            shape[gather_axis] = gather[q]
+            recv_counts.append(int(np.prod(shape)))
+
+        comm.Alltoallv([sendbuf, (send_counts, split_offsets(send_counts))],
+                       [recvbuf, (recv_counts, split_offsets(recv_counts))])
+
+        pos = 0
+        for q in range(P):
+            index = [slice(None)] * dst.ndim
+            index[gather_axis] = slice(g_off[q], g_off[q] + gather[q])
+            target = dst[tuple(index)]
+            target[...] = recvbuf[pos:pos + target.size].reshape(target.shape)
+            pos += target.size
+        return dst
+
+    def _ystage(self, zstage):
+        """Buffer for the y transform; with a slab grid the z stage already has whole y"""
+        if self.dims[1] == 1:
+            return zstage
+        return self._buffer('ystage', (zstage.shape[0],) + self._ystage_shape, zstage.dtype)
+
+    @timed_transform
+    def forward(self, field, out=None):
+        """Real field(s) to spectral coefficients, 'forward' normalisation"""
+        lead = field.shape[:-3]
+        batch = int(np.prod(lead)) if lead else 1
+        cdtype = np.result_type(field.dtype, np.complex64)
+        if out is None:
+            out = np.empty(lead + self.spectral_shape, dtype=cdtype)
+        f = field.reshape((batch,) + self.real_shape)
+        o = out.reshape((batch,) + self.spectral_shape)
+
+        zstage = self._buffer('zstage', (batch,) + self._zstage_shape, cdtype)
+        np.fft.rfft(f, axis=-1, norm='forward', out=zstage)
+        ystage = self._ystage(zstage)
+        if ystage is not zstage:
+            self._exchange(zstage, ystage, self.comm_b, scatter_axis=3, gather_axis=2)
+        np.fft.fft(ystage, axis=-2, norm='forward', out=ystage)
+        self._exchange(ystage, o, self.comm_a, scatter_axis=2, gather_axis=1)
+        np.fft.fft(o, axis=-3, norm='forward', out=o)
+        return out
+
+    @timed_transform
+    def backward(self, field_k, out=None, work=None):
+        """Spectral coefficients to real field(s); field_k is left untouched"""
+        lead = field_k.shape[:-3]
+        batch = int(np.prod(lead)) if lead else 1
+        cdtype = field_k.dtype
+        if out is None:
+            out = np.empty(lead + self.real_shape, dtype=np.finfo(cdtype).dtype)
+        if work is None:
+            work = self._buffer('work', (batch,) + self.spectral_shape, cdtype)
+        fk = field_k.reshape((batch,) + self.spectral_shape)
+        w = work.reshape((batch,) + self.spectral_shape)
+        o = out.reshape((batch,) + self.real_shape)
+
+        np.fft.ifft(fk, axis=-3, norm='forward', out=w)
+        zstage = self._buffer('zstage', (batch,) + self._zstage_shape, cdtype)
+        ystage = self._ystage(zstage)
+        self._exchange(w, ystage, self.comm_a, scatter_axis=1, gather_axis=2)
+        np.fft.ifft(ystage, axis=-2, norm='forward', out=ystage)
+        if ystage is not zstage:
+            self._exchange(ystage, zstage, self.comm_b, scatter_axis=2, gather_axis=3)
+        np.fft.irfft(zstage, n=self.global_shape[2], axis=-1, norm='forward', out=o)
+        return out
+
+    def allocate(self, shape, dtype):
+        """Zeroed buffer the transforms and kernels can work on"""
+        return np.zeros(shape, dtype=dtype)
+
+    def share(self, array):
+        """Read-only constant (wavenumbers, masks) in a form the kernels can use"""
+        return array
+
+    def execute(self, kernel, *args):
+        """Run an elementwise kernel from tarang_engine.kernels over the local block"""
+        return kernel(*args)
+
+    def close(self):
+        """Free the row and column communicators"""
+        self.comm_a.Free()
+        self.comm_b.Free()
+
+    def sum(self, value):
+        """Global reduction of a locally computed sum"""
+        return self.comm.allreduce(value, op=self._MPI.SUM)
+
+    def max(self, value):
+        """Global reduction of a locally computed maximum"""
+        return self.comm.allreduce(value, op=self._MPI.MAX)
+
+    def allgather(self, value):
+        """Every rank's value, in rank order"""
+        return self.comm.allgather(value)
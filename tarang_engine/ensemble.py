@@ -0,0 +1,226 @@
+"""
+Batched ensembles for the Tarang engine
+Advances several parameter sets on one grid in lockstep, with the members on an array axis in front of the grid
+
+One solver holds every member's state as (components, members, grid...).
+The FFT plan, operator cache, workspace and kernel calls are shared, so a
+step of M small members costs one batch of M-times-larger transforms
+instead of M interpreter-bound runs. Members may differ only in the keys of
+MEMBER_KEYS: their molecular coefficients become per-member dissipation
+rates, and each member keeps its own random stream, initial condition,
+output directory and output cadences. A second single-member solver on the
+same plan (the scout) takes a copy of one member at a time for progress
+lines, snapshots, spectra, probes and checkpoints, so a member writes
+exactly the files a run of its parameters alone would. Adaptive time
+stepping takes the smallest dt any member allows.
+"""
+
+import os
+import time
+import numpy as np
+from tarang_engine.initial import load_initial_field, set_initial_condition
+from tarang_engine.params import iteration_due
+from tarang_engine.simulation import RunOutputs, Simulation, emit_record, make_fft, make_solver
+from tarang_engine.timers import describe, difference, table
+
+# Parameters that may differ between members, besides every iter_* cadence
+MEMBER_KEYS = (
+    'nu', 'eta', 'kappa', 'random_seed',
+    'input_case', 'INPUT_SET_CASE', 'INPUT_FROM_FILE', 'INPUT_ELSASSER', 'input_dir', 'input_file_name',
+    'output_dir', 'modes_save', 'modes_buffer', 'field_save_buffers',
+)
+
+# Member keys the batched solver takes as one value per member
+MEMBER_COEFFICIENTS = ('nu', 'eta', 'kappa')
+
+
+def ensemble_parameters(params):
+    """One parameter set per entry of the para.py ensemble list of overrides, or [params] without one"""
+    overrides = params.get('ensemble') or ()
+    if not overrides:
+        return [params]
+    return [dict(params, ensemble=None, **override) for override in overrides]
+
+
+def same_value(a, b):
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.array_equal(a, b)
+    return a == b
+
+
+def check_members(param_sets):
+    """Validate that param_sets can share one grid and return them with distinct output directories
+
+    Members writing to the same output_dir get member_000, member_001, ...
+    subdirectories of it.
+    """
+    first = param_sets[0]
+    for m, p in enumerate(param_sets[1:], 1):
+        for name in sorted(set(first) | set(p)):
+            if name in MEMBER_KEYS or name.startswith('iter_') or name == 'ensemble':
+                continue
+            if not same_value(first.get(name), p.get(name)):
+                raise ValueError(f"Ensemble member {m} has {name} = {p.get(name)!r} where member 0 has "
+                                 f"{first.get(name)!r}; members may differ only in iter_* and "
+                                 f"{', '.join(MEMBER_KEYS)}")
+    dirs = [p.get('output_dir') or '' for p in param_sets]
+    if len(set(dirs)) < len(dirs):
+        param_sets = [dict(p, output_dir=os.path.join(d or '.', f'member_{m:03d}'))
+                      for m, (p, d) in enumerate(zip(param_sets, dirs))]
+    return param_sets
+
+
+class Ensemble:
+    """Parameter sets of one grid advanced together by a batched solver
+
+    first_member offsets the member numbers in progress output, for an
+    ensemble run in several batches.
+    """
+
+    def __init__(self, param_sets, comm=None, first_member=0):
+        self.param_sets = check_members(list(param_sets))
+        self.members = len(self.param_sets)
+        first = self.param_sets[0]
+        params = dict(first, ensemble=None, ensemble_members=self.members, SHELL_TRANSFER=False)
+        for name in MEMBER_COEFFICIENTS:
+            values = [float(p.get(name) or 0.0) for p in self.param_sets]
+            if len(set(values)) > 1:
+                params[name] = values
+        self.params = params
+        self.fft = make_fft(first, comm)
+        self.solver = make_solver(params, fft=self.fft)
+        self.scout = make_solver(first, fft=self.fft)
+        # Both solvers charge one set of phase timers
+        self.scout.timers = self.fft.timers = self.solver.timers
+        self.simulations = []
+        for m, p in enumerate(self.param_sets):
+            simulation = Simulation(p, solver=self.scout)
+            simulation.member = first_member + m
+            self.simulations.append(simulation)
+        self.initialise()
+
+    def initialise(self):
+        """Set every member's initial condition through the scout, each from its own random stream"""
+        batch, scout = self.solver, self.scout
+        rngs, clocks = [], set()
+        for m, p in enumerate(self.param_sets):
+            scout.params = p
+            scout.t, scout.dt, scout.step_count = float(p.get('t_initial', 0.0)), float(p['dt']), 0
+            scout.rng = scout.make_rng(p.get('random_seed', 0))
+            if p.get('INPUT_FROM_FILE', False):
+                load_initial_field(scout, p)
+            elif p.get('INPUT_SET_CASE', True):
+                set_initial_condition(scout, p)
+            else:
+                scout.state[...] = 0
+            batch.state[:, m] = scout.state
+            rngs.append(scout.rng)
+            clocks.add((scout.t, scout.step_count))
+        if len(clocks) > 1:
+            raise ValueError("Ensemble members must start from the same t and step")
+        (batch.t, batch.step_count), = clocks
+        batch.rngs = rngs
+        batch.update_real()
+
+    def load(self, m):
+        """Copy member m into the scout, for its diagnostics and outputs"""
+        batch, scout = self.solver, self.scout
+        scout.params = self.param_sets[m]
+        np.copyto(scout.state, batch.state[:, m])
+        scout.t, scout.dt, scout.step_count = batch.t, batch.dt, batch.step_count
+        scout.rng = batch.rngs[m]
+        scout.update_real()
+
+    def report_phases(self, phases):
+        """The phase times per step of the last report interval, shared by every member"""
+        simulation = self.simulations[0]
+        if simulation.progress_format == 'json':
+            emit_record({'event': 'phases', 'step': self.solver.step_count,
+                         'phase_ms_per_step': {name: 1e3 * value for name, value in phases.items()}})
+        else:
+            print(f"Phases: {describe(phases, 1)}")
+
+    def run(self):
+        """Advance every member from t_initial to t_final"""
+        batch, simulations = self.solver, self.simulations
+        lead = simulations[0]
+        cadences = [(p.get('iter_glob_energy_print_start', 0), p.get('iter_glob_energy_print_inter', 1))
+                    for p in self.param_sets]
+        outputs = [RunOutputs(simulation) for simulation in simulations]
+
+        timers = batch.timers
+        print_phases = bool(self.params.get('PRINT_PHASE_TIMES', True))
+        timers.reset()
+        start = time.perf_counter()
+        first_step = batch.step_count
+        last_time, last_step = start, first_step
+        last_phases = timers.snapshot()
+        try:
+            while batch.t < lead.t_final - lead.t_eps:
+                step = batch.step_count
+                printing = [iteration_due(step, *cadence) for cadence in cadences]
+                if any(printing):
+                    now = time.perf_counter()
+                    rate = (step - last_step) / (now - last_time) if step > last_step else 0.0
+                    if print_phases and step > last_step:
+                        phases = timers.snapshot()
+                        self.report_phases({name: value / (step - last_step)
+                                            for name, value in difference(phases, last_phases).items()})
+                        last_phases = phases
+                    last_time, last_step = now, step
+                for m, simulation in enumerate(simulations):
+                    if printing[m] or outputs[m].due(step, first_step):
+                        with timers.phase('diagnostics'):
+                            self.load(m)
+                            if printing[m]:
+                                simulation.report(rate)
+                        outputs[m].record(step, first_step)
+                remaining = lead.t_final - batch.t
+                batch.step(lead.dt if lead.dt <= remaining + lead.t_eps else remaining)
+            # The state at t_final, which the loop above stops short of recording
+            step = batch.step_count
+            for m, output in enumerate(outputs):
+                if output.due(step, first_step, final=True):
+                    with timers.phase('diagnostics'):
+                        self.load(m)
+                    output.record(step, first_step, final=True)
+        finally:
+            for output in outputs:
+                output.close()
+
+        elapsed = time.perf_counter() - start
+        self.steps_taken = batch.step_count - first_step
+        self.elapsed = elapsed
+        self.steps_per_sec = self.steps_taken / elapsed if elapsed > 0 else 0.0
+        self.energies = []
+        for m, simulation in enumerate(simulations):
+            self.load(m)
+            outputs[m].finish(first_step)
+            simulation.report(self.steps_per_sec)
+            self.energies.append(self.scout.energy())
+        self.phase_seconds = timers.snapshot()
+        return self.summary()
+
+    def summary(self):
+        """Throughput summary of the completed ensemble"""
+        member_rate = self.steps_per_sec * self.members
+        ns_per_point = 1e9 / (member_rate * self.solver.grid_points) if member_rate > 0 else 0.0
+        summary = {
+            'members': self.members,
+            'steps': self.steps_taken,
+            'elapsed': self.elapsed,
+            'steps_per_sec': self.steps_per_sec,
+            'member_steps_per_sec': member_rate,
+            'ns_per_point_step': ns_per_point,
+            'energy': self.energies,
+            'phase_seconds': self.phase_seconds,
+        }
+        if self.simulations[0].progress_format == 'json':
+            emit_record(dict(event='summary', t=self.solver.t, **summary))
+            return summary
+        print(f"Completed {self.steps_taken} steps of {self.members} members in {self.elapsed:.3f}s | "
+              f"{self.steps_per_sec:.2f} steps/s | {member_rate:.2f} member-steps/s | "
+              f"{ns_per_point:.2f} ns/point/step")
+        if self.params.get('PRINT_PHASE_TIMES', True):
+            print(table(self.phase_seconds, self.steps_taken))
+        return summary
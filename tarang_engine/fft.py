@@ -0,0 +1,165 @@
+"""
+FFT plans for the Tarang engine
+Real-to-complex transforms over the last three (in 2D two) axes, batched over any leading axes
+"""
+
+import itertools
+import numpy as np
+from tarang_engine.timers import timed_transform
+
+
+class SerialFFT:
+    """Single-process real-to-complex 3D transform
+
+    Spectral coefficients use the 'forward' normalisation, so the k=0 mode
+    is the spatial mean and Parseval's sum needs no extra 1/N factors.
+    Transforms run axis by axis so that, given output (and for the inverse,
+    a complex scratch) buffer, no field-sized temporaries are created.
+    """
+
+    rank = 0
+    nprocs = 1
+    # PhaseTimers charged with every transform, set by the solver
+    timers = None
+
+    def __init__(self, Nx, Ny, Nz):
+        self.global_shape = (Nx, Ny, Nz)
+        self.real_shape = (Nx, Ny, Nz)
+        self.real_offset = (0, 0, 0)
+        self.spectral_shape = (Nx, Ny, Nz // 2 + 1)
+        self.spectral_offset = (0, 0, 0)
+        self.axes = (-3, -2, -1)
+
+    def describe(self):
+        return "single process"
+
+    def wavenumber_indices(self):
+        """Integer wavenumbers of the local spectral block, broadcast-shaped"""
+        Nx, Ny, Nz = self.global_shape
+        nx = np.fft.fftfreq(Nx, 1.0 / Nx).reshape(-1, 1, 1)
+        ny = np.fft.fftfreq(Ny, 1.0 / Ny).reshape(1, -1, 1)
+        nz = np.fft.rfftfreq(Nz, 1.0 / Nz).reshape(1, 1, -1)
+        return nx, ny, nz
+
+    @timed_transform
+    def forward(self, field, out=None):
+        """Real field(s) to spectral coefficients"""
+        if out is None:
+            return np.fft.rfftn(field, axes=self.axes, norm='forward')
+        np.fft.rfft(field, axis=-1, norm='forward', out=out)
+        np.fft.fft(out, axis=-2, norm='forward', out=out)
+        np.fft.fft(out, axis=-3, norm='forward', out=out)
+        return out
+
+    @timed_transform
+    def backward(self, field_k, out=None, work=None):
+        """Spectral coefficients to real field(s); field_k is left untouched"""
+        if out is None or work is None:
+            return np.fft.irfftn(field_k, s=self.real_shape, axes=self.axes, norm='forward', out=out)
+        np.fft.ifft(field_k, axis=-3, norm='forward', out=work)
+        np.fft.ifft(work, axis=-2, norm='forward', out=work)
+        np.fft.irfft(work, n=self.real_shape[-1], axis=-1, norm='forward', out=out)
+        return out
+
+    def allocate(self, shape, dtype):
+        """Zeroed buffer the transforms and kernels can work on"""
+        return np.zeros(shape, dtype=dtype)
+
+    def share(self, array):
+        """Read-only constant (wavenumbers, masks) in a form the kernels can use"""
+        return array
+
+    def execute(self, kernel, *args):
+        """Run an elementwise kernel from tarang_engine.kernels over the whole block"""
+        return kernel(*args)
+
+    def close(self):
+        """Release plan resources"""
+
+    def sum(self, value):
+        """Global reduction of a locally computed sum"""
+        return value
+
+    def max(self, value):
+        """Global reduction of a locally computed maximum"""
+        return value
+
+    def allgather(self, value):
+        """Every rank's value, in rank order"""
+        return [value]
+
+
+class SerialFFT2D(SerialFFT):
+    """Single-process real-to-complex 2D transform for dimension = 2 runs
+
+    Same interface and normalisation as SerialFFT over the last two axes:
+    fields are (Nx, Ny) blocks and the half spectrum runs along y.
+    """
+
+    def __init__(self, Nx, Ny):
+        self.global_shape = (Nx, Ny)
+        self.real_shape = (Nx, Ny)
+        self.real_offset = (0, 0)
+        self.spectral_shape = (Nx, Ny // 2 + 1)
+        self.spectral_offset = (0, 0)
+        self.axes = (-2, -1)
+
+    def wavenumber_indices(self):
+        """Integer wavenumbers of the spectral block, broadcast-shaped"""
+        Nx, Ny = self.global_shape
+        nx = np.fft.fftfreq(Nx, 1.0 / Nx).reshape(-1, 1)
+        ny = np.fft.rfftfreq(Ny, 1.0 / Ny).reshape(1, -1)
+        return nx, ny
+
+    @timed_transform
+    def forward(self, field, out=None):
+        """Real field(s) to spectral coefficients"""
+        if out is None:
+            return np.fft.rfftn(field, axes=self.axes, norm='forward')
+        np.fft.rfft(field, axis=-1, norm='forward', out=out)
+        np.fft.fft(out, axis=-2, norm='forward', out=out)
+        return out
+
+    @timed_transform
+    def backward(self, field_k, out=None, work=None):
+        """Spectral coefficients to real field(s); field_k is left untouched"""
+        if out is None or work is None:
+            return np.fft.irfftn(field_k, s=self.real_shape, axes=self.axes, norm='forward', out=out)
+        np.fft.ifft(field_k, axis=-2, norm='forward', out=work)
+        np.fft.irfft(work, n=self.real_shape[-1], axis=-1, norm='forward', out=out)
+        return out
+
+
+def serial_fft(shape):
+    """Single-process plan for a (Nx, Ny, Nz) or, in 2D, (Nx, Ny) grid"""
+    return SerialFFT2D(*shape) if len(shape) == 2 else SerialFFT(*shape)
+
+
+def shared_modes(M, N, half=False):
+    """(source, target) slice pairs of the modes an FFT axis of M points has in common with one of N
+
+    An axis that keeps its size keeps every mode. Otherwise the modes at
+    and beyond the Nyquist frequency of the coarser axis are dropped, so
+    truncation and zero-padding both leave a real field real. half marks
+    the half-spectrum (rfft) axis, which has no negative frequencies.
+    """
+    if M == N:
+        return [(slice(None), slice(None))]
+    K = min(M, N)
+    pairs = [(slice(0, (K + 1) // 2), slice(0, (K + 1) // 2))]
+    negative = (K - 1) // 2
+    if not half and negative > 0:
+        pairs.append((slice(M - negative, M), slice(N - negative, N)))
+    return pairs
+
+
+def spectral_blocks(source_grid, target_grid):
+    """(source index, target index) pairs that carry the spectral coefficients of one grid over to another
+
+    With 'forward' normalisation a coefficient is the same amplitude on any
+    grid, so spectral truncation or zero-padding is a copy of these blocks
+    into a zeroed target.
+    """
+    last = len(source_grid) - 1
+    axes = [shared_modes(M, N, half=axis == last) for axis, (M, N) in enumerate(zip(source_grid, target_grid))]
+    return [tuple(zip(*pairs)) for pairs in itertools.product(*axes)]
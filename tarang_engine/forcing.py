@@ -0,0 +1,222 @@
+"""
+Random forcing for the Tarang engine
+Band-limited white-noise forcing at a constant injection rate, selected by FORCING_ENABLED / FORCING_SCHEME
+
+The force acts on the modes with forcing_range[0] <= |k| <= forcing_range[1]
+only. Their flat indices are found once; every step then draws fresh random
+phases for just those modes, makes the force orthogonal to the current field
+mode by mode and kicks the state after the integrator step. With no
+force-field correlation the kick dt f adds exactly dt^2 |f|^2 / 2 of energy,
+so scaling |f|^2 over the band to 2 eps / dt injects eps per unit time
+(Alvelius 1999) without any full-grid work.
+
+The noise is drawn for the whole band, numbered the same way on every rank,
+and each rank takes its own modes from it. A mode of the kz = 0 plane gets
+the conjugate of its partner's noise, so the force is Hermitian and the run
+does not depend on the decomposition.
+"""
+
+import numpy as np
+
+# Field name -> position of its rate in para.py injections, outside MHD
+INJECTION_INDEX = {
+    'u': 0,
+    'T': 2,
+}
+
+
+class RandomForcing:
+    """Constant-injection random forcing of the fields named by RANDOM_FORCING_TYPE
+
+    RANDOM_FORCING_TYPE is a string of field names from the solver's
+    linear groups ('u', 'uT', ...). Each forced field gets the rate
+    injections[INJECTION_INDEX[field]]; injection_rate, when set, overrides
+    the velocity's (the vorticity's energy in 2D). MHD forces the Elsasser
+    fields z+- = u +- b instead, at the rates injection_eplus and
+    injection_eminus (injections[0] and injections[1] when unset), as the
+    MHD run form writes them; a residual-energy rate injection_er is not
+    supported. The Nyquist plane of the half-spectrum axis (kz, or ky in
+    2D) is left out. Ensemble members draw from their own streams and are
+    normalised one by one.
+    """
+
+    def __init__(self, solver, params):
+        self.solver = solver
+        ops, fft = solver.ops, solver.fft
+        kf_min, kf_max = (float(v) for v in params.get('forcing_range') or (4, 5))
+        band = (ops.kmag >= kf_min) & (ops.kmag <= kf_max) & ops.dealias
+        # Integer wavenumbers of the band modes, the last along the half-spectrum axis
+        indices = fft.wavenumber_indices()
+        Nh = fft.global_shape[-1]
+        band &= np.broadcast_to(indices[-1] < Nh / 2, band.shape)
+        modes = np.nonzero(band)
+        n = [np.broadcast_to(ni, band.shape)[modes].astype(np.int64) for ni in indices]
+        self._pair(fft, n)
+        modes = tuple(m[self.kept] for m in modes)
+        self.index = np.ravel_multi_index(modes, band.shape)
+        if self.count == 0:
+            raise ValueError(f"forcing_range {params.get('forcing_range')} holds no resolved modes")
+
+        def on_band(a):
+            return np.broadcast_to(a, band.shape)[modes]
+
+        k = [ki for ki in (ops.kx, ops.ky, ops.kz) if ki is not None]
+        # Per-mode arrays broadcast over the member axis of an ensemble
+        self.lead = solver.member_shape
+        khat = np.stack([on_band(ki) for ki in k]) / on_band(ops.kmag)
+        self.khat = khat.reshape(khat.shape[:1] + (1,) * len(self.lead) + khat.shape[1:])
+        self.weight = on_band(ops.mode_weight) * on_band(solver.energy_metric)
+
+        groups = {field: sl for sl, field in solver.linear_groups}
+        self.fields = self._elsasser(params, groups) if solver.kind == 'MHD' else self._plain(params, groups)
+
+        ncomp = max((sl.stop - sl.start for sl, _, _, _ in self.fields), default=1)
+        # One contiguous (2, ncomp, count) draw per member, as a single run makes
+        self.noise = np.empty((solver.members, 2, ncomp, self.count), dtype=solver.real_dtype)
+        # Per-mode buffers of the local band
+        count = len(self.index)
+        self.picked = np.empty((solver.members, ncomp, count), dtype=solver.real_dtype)
+        self.force = np.empty((ncomp,) + self.lead + (count,), dtype=solver.complex_dtype)
+        self.field = np.empty((ncomp,) + self.lead + (count,), dtype=solver.complex_dtype)
+        self.other = np.empty((ncomp,) + self.lead + (count,), dtype=solver.complex_dtype)
+        self.tmp = np.empty(self.lead + (count,), dtype=solver.complex_dtype)
+        self.power = np.empty(self.lead + (count,), dtype=solver.real_dtype)
+        self.coeff = np.empty(self.lead + (count,), dtype=solver.real_dtype)
+        self.injected = 0.0
+
+    def _pair(self, fft, n):
+        """Position of each local band mode in the global band noise, and which take its conjugate
+
+        Modes with kz > 0 and one of each conjugate pair of the kz = 0 plane
+        number the noise, in the order of their global flat index; the other
+        mode of a pair reads its partner's entry. Sets kept (the band modes
+        forced), position, sign (-1 on the imaginary part of conjugated
+        modes) and count, the size of the global noise.
+        """
+        dims = fft.global_shape[:-1] + (fft.global_shape[-1] // 2 + 1,)
+        key = np.ravel_multi_index([ni % N for ni, N in zip(n[:-1], dims)] + [n[-1]], dims)
+        partner = np.ravel_multi_index([-ni % N for ni, N in zip(n[:-1], dims)] + [n[-1]], dims)
+        plane = n[-1] == 0
+        conj = plane & (partner < key)
+        source = np.where(conj, partner, key)
+        keys = np.unique(np.concatenate(fft.allgather(key[~conj])))
+        position = np.searchsorted(keys, source)
+        found = np.isin(source, keys)
+        # A mode of the kz = 0 plane that is its own conjugate would need a real force
+        self.kept = found & ~(plane & (partner == key))
+        self.position = position[self.kept]
+        self.sign = np.where(conj[self.kept], -1, 1).astype(np.int8)
+        self.count = len(keys)
+
+    def _plain(self, params, groups):
+        """(slice, None, 1, rate) per forced field of RANDOM_FORCING_TYPE"""
+        types = str(params.get('RANDOM_FORCING_TYPE') or 'u')
+        injections = list(params.get('injections') or (0, 0, 0))
+        fields = []
+        for field in types:
+            if field not in groups:
+                raise ValueError(f"RANDOM_FORCING_TYPE '{types}': kind='{self.solver.kind}' has no field "
+                                 f"'{field}' (expected letters from {''.join(groups)})")
+            rate = float(injections[INJECTION_INDEX[field]])
+            if field == 'u' and params.get('injection_rate') is not None:
+                rate = float(params['injection_rate'])
+            if rate > 0:
+                fields.append((groups[field], None, 1.0, rate))
+        return fields
+
+    def _elsasser(self, params, groups):
+        """(u slice, b slice, +-1, rate) for z+ and z-"""
+        injections = list(params.get('injections') or (0, 0, 0))
+
+        def rate(name, i):
+            value = params.get(name)
+            return float(injections[i] if value is None else value)
+
+        if params.get('injection_rate') is not None:
+            raise ValueError("injection_rate does not apply to kind='MHD'; set the Elsasser rates "
+                             "injection_eplus and injection_eminus")
+        if rate('injection_er', 2) != 0:
+            raise ValueError(f"injection_er = {rate('injection_er', 2)}: forcing the residual energy is not "
+                             f"supported; force z+ and z- with injection_eplus and injection_eminus")
+        fields = []
+        for sign, name, i in ((1.0, 'injection_eplus', 0), (-1.0, 'injection_eminus', 1)):
+            if rate(name, i) > 0:
+                fields.append((groups['u'], groups['b'], sign, rate(name, i)))
+        return fields
+
+    def apply(self, dt):
+        """Kick every forced field by dt f, injecting rate * dt of energy"""
+        s = self.solver
+        for sl, other_sl, sign, rate in self.fields:
+            ncomp = sl.stop - sl.start
+            flat = s.state[sl].reshape((ncomp,) + self.lead + (-1,))
+            noise, picked = self.noise[:, :, :ncomp], self.picked[:, :ncomp]
+            f, u = self.force[:ncomp], self.field[:ncomp]
+            for m, rng in enumerate(s.rngs):
+                rng.standard_normal(dtype=noise.dtype, out=noise[m, 0])
+                rng.standard_normal(dtype=noise.dtype, out=noise[m, 1])
+            np.take(noise[:, 0], self.position, axis=-1, out=picked)
+            f.real = np.moveaxis(picked, 0, 1).reshape(f.shape)
+            np.take(noise[:, 1], self.position, axis=-1, out=picked)
+            picked *= self.sign
+            f.imag = np.moveaxis(picked, 0, 1).reshape(f.shape)
+            np.take(flat, self.index, axis=-1, out=u)
+            if other_sl is not None:
+                # The Elsasser field z = u + sign b
+                other = s.state[other_sl].reshape((ncomp,) + self.lead + (-1,))
+                np.take(other, self.index, axis=-1, out=self.other[:ncomp])
+                self.other[:ncomp] *= sign
+                u += self.other[:ncomp]
+            if ncomp == 3:
+                self._project(f)
+            # Remove Re(f* . u) mode by mode so the kick does no work against the field
+            self._dot(f, u, self.coeff)
+            self._dot(u, u, self.power)
+            np.divide(self.coeff, self.power, out=self.coeff, where=self.power > 0)
+            for i in range(ncomp):
+                np.multiply(u[i], self.coeff, out=self.tmp)
+                f[i] -= self.tmp
+            # dt f carries dt^2 |f|^2 / 2 = rate * dt over the band of every member
+            self._dot(f, f, self.power)
+            self.power *= self.weight
+            total = np.asarray(s.fft.sum(self.power.sum(axis=-1, dtype=np.float64)))
+            if np.all(total > 0):
+                scale = np.sqrt(2.0 * rate * dt / total).astype(self.power.dtype)
+                f *= scale[..., np.newaxis]
+                if other_sl is None:
+                    flat[..., self.index] += f
+                else:
+                    # z += dt f moves u by dt f / 2 and b by sign dt f / 2, leaving the other Elsasser field
+                    f *= 0.5
+                    flat[..., self.index] += f
+                    f *= sign
+                    other[..., self.index] += f
+                self.injected += rate * dt
+
+    def _project(self, f):
+        """Remove the component of f along khat"""
+        np.einsum('i...n,i...n->...n', self.khat, f, out=self.tmp)
+        for i in range(3):
+            f[i] -= self.khat[i] * self.tmp
+
+    def _dot(self, a, b, out):
+        """Per-mode Re(a* . b) over the components"""
+        np.einsum('i...n,i...n->...n', a.real, b.real, out=out)
+        out += np.einsum('i...n,i...n->...n', a.imag, b.imag)
+        return out
+
+
+FORCING_SCHEMES = {
+    'random': RandomForcing,
+}
+
+
+def make_forcing(solver, params):
+    """The forcing selected by FORCING_SCHEME, or None when FORCING_ENABLED is off"""
+    if not params.get('FORCING_ENABLED', False):
+        return None
+    scheme = str(params.get('FORCING_SCHEME', 'random')).lower()
+    if scheme not in FORCING_SCHEMES:
+        raise ValueError(f"Unsupported FORCING_SCHEME '{params.get('FORCING_SCHEME')}' "
+                         f"(expected one of {', '.join(FORCING_SCHEMES)})")
+    return FORCING_SCHEMES[scheme](solver, params)
@@ -0,0 +1,146 @@
+"""
+Initial conditions for the Tarang engine
+Selected by INPUT_SET_CASE / input_case in para.py, or read from input_dir/input_file_name with INPUT_FROM_FILE
+"""
+
+import os
+import numpy as np
+from tarang_engine.checkpoint import is_checkpoint, load_checkpoint
+from tarang_engine.output import read_real_fields, read_snapshot
+
+
+def taylor_green(solver):
+    """Taylor-Green vortex scaled to the box (its z = 0 cross-section in 2D)"""
+    if solver.dimension == 2:
+        x, y = solver.grid()
+        Lx, Ly = (float(v) for v in solver.params['L'][:2])
+        ax, ay = 2*np.pi*x/Lx, 2*np.pi*y/Ly
+        u = np.zeros((2,) + solver.fft.real_shape, dtype=solver.real_dtype)
+        u[0] = np.sin(ax) * np.cos(ay)
+        u[1] = -np.cos(ax) * np.sin(ay)
+        solver.set_velocity(u)
+        return
+    x, y, z = solver.grid()
+    Lx, Ly, Lz = (float(v) for v in solver.params['L'])
+    ax, ay, az = 2*np.pi*x/Lx, 2*np.pi*y/Ly, 2*np.pi*z/Lz
+    u = np.zeros((3,) + solver.fft.real_shape, dtype=solver.real_dtype)
+    u[0] = np.sin(ax) * np.cos(ay) * np.cos(az)
+    u[1] = -np.cos(ax) * np.sin(ay) * np.cos(az)
+    solver.set_velocity(u)
+
+
+def orszag_tang(solver):
+    """Three-dimensional Orszag-Tang vortex (Politano, Pouquet and Sulem 1995) for MHD"""
+    x, y, z = solver.grid()
+    Lx, Ly, Lz = (float(v) for v in solver.params['L'])
+    ax, ay, az = 2*np.pi*x/Lx, 2*np.pi*y/Ly, 2*np.pi*z/Lz
+    fields = np.zeros((6,) + solver.fft.real_shape, dtype=solver.real_dtype)
+    u, b = fields[:3], fields[3:]
+    u[0] = -2*np.sin(ay)
+    u[1] = 2*np.sin(ax)
+    b[0] = -2*np.sin(2*ay) + np.sin(az)
+    b[1] = 2*np.sin(ax) + np.sin(az)
+    b[2] = np.sin(ax) + np.sin(ay)
+    solver.set_state(fields)
+
+
+def global_noise(solver, count):
+    """count real white-noise fields that do not depend on how the grid is decomposed
+
+    Every global x-plane of every field is drawn from its own stream, seeded
+    by (random_seed, field, x), and a rank keeps its block of the planes it
+    holds.
+    """
+    fft = solver.fft
+    seed = int(solver.params.get('random_seed') or 0)
+    noise = np.empty((count,) + fft.real_shape, dtype=solver.real_dtype)
+    x0 = fft.real_offset[0]
+    block = tuple(slice(o, o + n) for o, n in zip(fft.real_offset[1:], fft.real_shape[1:]))
+    for c in range(count):
+        for i in range(fft.real_shape[0]):
+            plane = np.random.default_rng([seed, c, x0 + i]).standard_normal(fft.global_shape[1:],
+                                                                             dtype=solver.real_dtype)
+            noise[c, i] = plane[block]
+    return noise
+
+
+def random_field(solver, k0=4.0, energy=0.5):
+    """Random field(s) with spectrum ~ k^4 exp(-2 (k/k0)^2)
+
+    Every field of the state (velocity, magnetic field, scalar) gets its
+    own random phases and the given energy; vector fields are solenoidal.
+    The field is the same for any number of ranks.
+    """
+    solver.set_state(global_noise(solver, solver.state.shape[0]))
+    k = np.sqrt(solver.k2)
+    # White noise already carries E(k) ~ k^2 from the shell area
+    shape = k * np.exp(-(k / k0)**2)
+    for sl, _ in solver.linear_groups:
+        fk = solver.state[sl]
+        fk *= shape
+        current = solver.field_energy(fk)
+        if current > 0:
+            fk *= np.sqrt(energy / current)
+    solver.update_real()
+
+
+def thermal_noise(solver, k0=4.0, amplitude=1e-3):
+    """Fluid at rest with a small random temperature perturbation, to seed convection"""
+    random_field(solver, k0=k0, energy=0.5 * amplitude**2)
+    solver.uk[...] = 0
+    solver.update_real()
+
+
+INITIAL_CASES = {
+    'taylor_green': taylor_green,
+    'orszag_tang': orszag_tang,
+    'random': random_field,
+    'thermal_noise': thermal_noise,
+}
+
+
+def set_initial_condition(solver, params):
+    """Fill the solver state from the para.py initial-condition settings"""
+    case = str(params.get('input_case', 'custom')).lower()
+    if case == 'custom':
+        case = solver.default_case
+    if case not in INITIAL_CASES:
+        raise ValueError(f"Unknown input_case '{case}' (expected custom or one of {', '.join(INITIAL_CASES)})")
+    INITIAL_CASES[case](solver)
+
+
+def input_path(params, fft):
+    """input_dir/input_file_name, with the rank suffix the per-rank outputs of a distributed run carry
+
+    Real-space fields (INPUT_REAL_FIELD) are one global file that every
+    rank reads its block of, so they keep the plain name.
+    """
+    path = os.path.join(params.get('input_dir') or '.', params['input_file_name'])
+    if fft.nprocs > 1 and not params.get('INPUT_REAL_FIELD', False):
+        root, ext = os.path.splitext(path)
+        path = f"{root}_rank{fft.rank}{ext}"
+    return path
+
+
+def load_initial_field(solver, params):
+    """Restart from a binary checkpoint (memory-mapped) or an HDF5 field snapshot
+
+    With INPUT_REAL_FIELD the HDF5 file holds real-space fields instead.
+    Either file may come from another resolution, which is truncated or
+    zero-padded to the solver's. With INPUT_ELSASSER an MHD input is read
+    as z+ and z- and converted to velocity and magnetic field.
+    """
+    path = input_path(params, solver.fft)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"INPUT_FROM_FILE is set but {path} does not exist")
+    if is_checkpoint(path):
+        load_checkpoint(solver, path)
+        return
+    read = read_real_fields if params.get('INPUT_REAL_FIELD', False) else read_snapshot
+    if params.get('INPUT_ELSASSER', False):
+        if not hasattr(solver, 'from_elsasser'):
+            raise ValueError(f"INPUT_ELSASSER needs kind='MHD', not '{solver.kind}'")
+        read(solver, path, names=solver.elsasser_names)
+        solver.from_elsasser()
+    else:
+        read(solver, path)
@@ -0,0 +1,245 @@
+"""
+Time integrators for the Tarang engine
+Integrating-factor Runge-Kutta and exponential time differencing schemes, selected by time_scheme
+
+Every scheme treats the linear damping D(k) of each field exactly, together
+with the Coriolis rotation of the velocity when ROTATION_INTEGRATING_FACTOR
+is set, and the solver's rhs() (nonlinear terms) explicitly; random forcing
+kicks the state after the step (see forcing.py). Stage buffers come from
+the solver workspace, so a step allocates no field-sized arrays.
+"""
+
+import numpy as np
+
+
+class Integrator:
+    """Base class: adaptive dt selection and per-field exponential factors"""
+
+    name = None
+    nbuffers = 1
+
+    def __init__(self, solver, adaptive=False, courant=0.5):
+        self.solver = solver
+        self.kernels = solver.kernels
+        # Kernels run through the FFT plan, so a shared-memory pool splits them too
+        self.execute = solver.fft.execute
+        self.adaptive = bool(adaptive)
+        self.courant = float(courant)
+        ws = solver.workspace
+        ncomp = solver.state.shape[0]
+        self.buffers = [ws.spectral(f'stage{i}', ncomp) for i in range(self.nbuffers)]
+        if solver.ops.exact_rotation:
+            self.khat = solver.fft.share(solver.ops.khat)
+            self.rotated = ws.spectral('rotated', 3)
+            self.rotation_tmp = ws.spectral('rotation_tmp')
+
+    def choose_dt(self, dt_max):
+        """Largest dt <= dt_max allowed by the Courant number, once rhs() has run"""
+        if not self.adaptive:
+            return dt_max
+        rate = self.solver.cfl_rate()
+        if rate > 0:
+            return min(dt_max, self.courant / rate)
+        return dt_max
+
+    def factors(self, method, dt, tag=''):
+        """(component slice, factor) pairs for every linearly damped field
+
+        The factor of a rotating velocity is a (real, khat x) pair, see
+        SpectralOperators._exponential. Cached factors are handed to the
+        kernels through fft.share, adaptive ones live in the workspace.
+        """
+        ops = self.solver.ops
+        ws = self.solver.workspace
+        share = self.solver.fft.share
+        pairs = []
+        for sl, field in self.solver.linear_groups:
+            if self.adaptive:
+                name = f'{method}_{field}{tag}'
+                out = ws.spectral(name) if ops.rotates(field) else ws.spectral_real(name)
+                pairs.append((sl, getattr(ops, method)(dt, field, out=out)))
+            else:
+                f = getattr(ops, method)(dt, field)
+                pairs.append((sl, tuple(share(fi) for fi in f) if isinstance(f, tuple) else share(f)))
+        return pairs
+
+    def scale(self, array, factors):
+        """array *= factor, field by field"""
+        for sl, f in factors:
+            if isinstance(f, tuple):
+                self.execute(self.kernels.rotate, self.khat, f[0], f[1], array[sl], self.rotated,
+                             self.rotation_tmp)
+                np.copyto(array[sl], self.rotated)
+            else:
+                self.execute(self.kernels.multiply, array[sl], f)
+        return array
+
+    def multiply(self, array, factors, out):
+        """out = array * factor, field by field"""
+        for sl, f in factors:
+            if isinstance(f, tuple):
+                self.execute(self.kernels.rotate, self.khat, f[0], f[1], array[sl], out[sl], self.rotation_tmp)
+            else:
+                self.execute(self.kernels.product, array[sl], f, out[sl])
+        return out
+
+    def update(self, u, k, c, factors, out):
+        """out = (u + c k) * factor, field by field, in one fused kernel where the backend has one
+
+        out may be u (k is then scratch) or k.
+        """
+        for sl, f in factors:
+            if isinstance(f, tuple):
+                if out is u:
+                    k[sl] *= c
+                    out[sl] += k[sl]
+                else:
+                    np.multiply(k[sl], c, out=out[sl])
+                    out[sl] += u[sl]
+                self.scale(out[sl], [(slice(None), f)])
+            else:
+                self.execute(self.kernels.update, u[sl], k[sl], c, f, out[sl])
+        return out
+
+    def step(self, dt_max):
+        """Advance solver.state in place and return the dt actually taken"""
+        raise NotImplementedError
+
+
+class EulerIF(Integrator):
+    """Integrating-factor Euler: u <- E (u + h N(u))"""
+
+    name = 'EULER'
+
+    def step(self, dt_max):
+        s = self.solver
+        u, k = s.state, self.buffers[0]
+        s.rhs(u, k)
+        h = self.choose_dt(dt_max)
+        self.update(u, k, h, self.factors('integrating_factor', h), out=u)
+        return h
+
+
+class RK2IF(Integrator):
+    """Integrating-factor Heun: u <- E (u + h/2 k1) + h/2 k2"""
+
+    name = 'RK2'
+    nbuffers = 2
+
+    def step(self, dt_max):
+        s = self.solver
+        u = s.state
+        k, stage = self.buffers
+        s.rhs(u, k)
+        h = self.choose_dt(dt_max)
+        E = self.factors('integrating_factor', h)
+
+        self.update(u, k, h, E, out=stage)
+        self.update(u, k, 0.5 * h, E, out=u)
+
+        s.rhs(stage, k)
+        k *= 0.5 * h
+        u += k
+        return h
+
+
+class RK4IF(Integrator):
+    """Integrating-factor classical RK4 with half-step factor Eh = exp(-D h/2)
+
+    u <- Eh [Eh (u + h/6 k1) + h/3 (k2 + k3)] + h/6 k4
+    """
+
+    name = 'RK4'
+    nbuffers = 3
+
+    def step(self, dt_max):
+        s = self.solver
+        u = s.state
+        k, acc, stage = self.buffers
+        s.rhs(u, k)
+        h = self.choose_dt(dt_max)
+        Eh = self.factors('integrating_factor', 0.5 * h, '_half')
+
+        # k1
+        self.update(u, k, h / 6, Eh, out=acc)
+        self.update(u, k, 0.5 * h, Eh, out=stage)
+
+        # k2
+        s.rhs(stage, k)
+        k *= h / 3
+        acc += k
+        k *= 1.5
+        self.multiply(u, Eh, out=stage)
+        stage += k
+
+        # k3
+        s.rhs(stage, k)
+        k *= h / 3
+        acc += k
+        k *= 3.0
+        self.multiply(u, Eh, out=stage)
+        stage += k
+        self.scale(stage, Eh)
+
+        # k4
+        s.rhs(stage, k)
+        self.scale(acc, Eh)
+        k *= h / 6
+        np.add(acc, k, out=u)
+        return h
+
+
+class ETD1(Integrator):
+    """Exponential Euler: u <- E u + h phi1 N(u)"""
+
+    name = 'ETD1'
+
+    def step(self, dt_max):
+        s = self.solver
+        u, k = s.state, self.buffers[0]
+        s.rhs(u, k)
+        h = self.choose_dt(dt_max)
+        self.scale(u, self.factors('integrating_factor', h))
+        self.scale(k, self.factors('phi1', h))
+        u += k
+        return h
+
+
+class ETD2(Integrator):
+    """Cox-Matthews ETD2RK
+
+    a = E u + h phi1 N(u);  u <- a + h phi2 (N(a) - N(u))
+    """
+
+    name = 'ETD2'
+    nbuffers = 2
+
+    def step(self, dt_max):
+        s = self.solver
+        u = s.state
+        k, stage = self.buffers
+        s.rhs(u, k)
+        h = self.choose_dt(dt_max)
+
+        self.multiply(u, self.factors('integrating_factor', h), out=stage)
+        self.multiply(k, self.factors('phi1', h), out=u)
+        stage += u
+
+        s.rhs(stage, u)
+        u -= k
+        self.scale(u, self.factors('phi2', h))
+        u += stage
+        return h
+
+
+INTEGRATORS = {cls.name: cls for cls in (EulerIF, RK2IF, RK4IF, ETD1, ETD2)}
+
+
+def make_integrator(solver, params):
+    """Build the integrator named by time_scheme, adaptive when FIXED_DT is False"""
+    scheme = str(params.get('time_scheme', 'EULER')).upper()
+    if scheme not in INTEGRATORS:
+        raise ValueError(f"Unsupported time_scheme '{params.get('time_scheme')}' "
+                         f"(expected one of {', '.join(INTEGRATORS)})")
+    adaptive = not params.get('FIXED_DT', True)
+    return INTEGRATORS[scheme](solver, adaptive=adaptive, courant=params.get('Courant_no', 0.5))
@@ -0,0 +1,188 @@
+"""
+Elementwise field kernels for the Tarang engine
+Plain in-place NumPy functions; FFT plans execute them whole or split along x between workers
+
+Every array argument is either a field block whose third-from-last axis is x
+or a broadcast wavenumber array of length 1 along that axis, so a kernel
+gives the same result whether it sees the whole grid or any x-slab of it.
+kernel_backend = 'numba' swaps in the fused loops of numba_kernels, which
+have the same names and signatures.
+"""
+
+import sys
+import numpy as np
+
+# Position of the array each kernel updates in place, returned by every plan's execute
+OUTPUT_ARG = {'curl': 4, 'cross': 2, 'project': 4, 'multiply': 0, 'outer': 2, 'elsasser_divergence': 4,
+              'scale_vector': 2, 'advection_divergence': 4, 'rotate': 4, 'coriolis': 2, 'update': 4,
+              'product': 2}
+
+KERNEL_BACKENDS = ('numpy', 'numba')
+# kernel_backend this module implements
+BACKEND = 'numpy'
+
+
+def load_backend(name='numpy'):
+    """Module providing the kernels for kernel_backend, falling back to this one without numba"""
+    backend = str(name or 'numpy').lower()
+    if backend not in KERNEL_BACKENDS:
+        raise ValueError(f"Unsupported kernel_backend '{name}' (expected one of {', '.join(KERNEL_BACKENDS)})")
+    if backend == 'numba':
+        try:
+            from tarang_engine import numba_kernels
+            return numba_kernels
+        except ImportError:
+            print("Warning: kernel_backend = 'numba' but numba is not installed; using the NumPy kernels")
+    return sys.modules[__name__]
+
+
+def curl(kx, ky, kz, fk, out, tmp):
+    """out = i k x fk"""
+    k = (kx, ky, kz)
+    for i in range(3):
+        j, l = (i + 1) % 3, (i + 2) % 3
+        np.multiply(k[j], fk[l], out=out[i])
+        np.multiply(k[l], fk[j], out=tmp)
+        out[i] -= tmp
+        out[i] *= 1j
+    return out
+
+
+def cross(a, b, out, tmp):
+    """out = a x b"""
+    for i in range(3):
+        j, l = (i + 1) % 3, (i + 2) % 3
+        np.multiply(a[j], b[l], out=out[i])
+        np.multiply(a[l], b[j], out=tmp)
+        out[i] -= tmp
+    return out
+
+
+def outer(a, b, out):
+    """out[3 i + j] = a_i b_j"""
+    for i in range(3):
+        for j in range(3):
+            np.multiply(a[i], b[j], out=out[3 * i + j])
+    return out
+
+
+def elsasser_divergence(kx, ky, kz, tk, out, tmp):
+    """MHD nonlinear terms from the spectral tensor T_ij = (z-_i z+_j)^
+
+    out[:3] = -i/2 k_i (T_ij + T_ji)   (velocity)
+    out[3:] = -i/2 k_i (T_ij - T_ji)   (magnetic field)
+    """
+    k = (kx, ky, kz)
+    out[...] = 0
+    for j in range(3):
+        for i in range(3):
+            np.add(tk[3 * i + j], tk[3 * j + i], out=tmp)
+            tmp *= k[i]
+            out[j] += tmp
+            if i != j:
+                np.subtract(tk[3 * i + j], tk[3 * j + i], out=tmp)
+                tmp *= k[i]
+                out[3 + j] += tmp
+    out *= -0.5j
+    return out
+
+
+def scale_vector(a, c, out):
+    """out_i = a_i c for a vector a and a scalar c"""
+    for i in range(3):
+        np.multiply(a[i], c, out=out[i])
+    return out
+
+
+def advection_divergence(kx, ky, kz, fk, out, tmp):
+    """out = -i k . fk, the spectral -div(u c) of a scalar flux fk = (u c)^"""
+    np.multiply(kx, fk[0], out=out)
+    np.multiply(ky, fk[1], out=tmp)
+    out += tmp
+    np.multiply(kz, fk[2], out=tmp)
+    out += tmp
+    out *= -1j
+    return out
+
+
+def project(kx, ky, kz, inv_k2, fk, div, tmp):
+    """Remove the k-parallel part of fk: fk -= k (k . fk) / |k|^2"""
+    np.multiply(kx, fk[0], out=div)
+    np.multiply(ky, fk[1], out=tmp)
+    div += tmp
+    np.multiply(kz, fk[2], out=tmp)
+    div += tmp
+    div *= inv_k2
+    for i, k in enumerate((kx, ky, kz)):
+        np.multiply(k, div, out=tmp)
+        fk[i] -= tmp
+    return fk
+
+
+def multiply(fk, factor):
+    """fk *= factor (dealiasing mask, integrating factor)"""
+    fk *= factor
+    return fk
+
+
+def product(fk, factor, out):
+    """out = fk factor"""
+    np.multiply(fk, factor, out=out)
+    return out
+
+
+def update(u, k, c, factor, out):
+    """out = (u + c k) factor, the integrating-factor stage update
+
+    out may be k, or u itself, in which case k is used as scratch.
+    """
+    if np.may_share_memory(out, u):
+        k *= c
+        out += k
+    else:
+        np.multiply(k, c, out=out)
+        out += u
+    out *= factor
+    return out
+
+
+def modal_energy(fk, weight, out, tmp):
+    """out = weight sum_i |f_i|^2, per mode"""
+    np.abs(fk[0], out=out)
+    np.square(out, out=out)
+    for i in range(1, len(fk)):
+        np.abs(fk[i], out=tmp)
+        np.square(tmp, out=tmp)
+        out += tmp
+    out *= weight
+    return out
+
+
+def energy_sum(fk, weight, extra, out, tmp):
+    """Local sum of weight (times extra, unless None) sum_i |f_i|^2 over the modes, in float64"""
+    e = modal_energy(fk, weight, out, tmp)
+    if extra is not None:
+        e *= extra
+    return float(e.sum(dtype=np.float64))
+
+
+def rotate(khat, c, s, fk, out, tmp):
+    """out = c fk + s (khat x fk); out must not overlap fk"""
+    cross(khat, fk, out, tmp)
+    for i in range(3):
+        out[i] *= s
+        np.multiply(fk[i], c, out=tmp)
+        out[i] += tmp
+    return out
+
+
+def coriolis(khat, sigma, fk, out, tmp, tmp2):
+    """out -= sigma (khat x fk), the projected Coriolis term of a solenoidal field"""
+    for i in range(3):
+        j, l = (i + 1) % 3, (i + 2) % 3
+        np.multiply(khat[l], fk[j], out=tmp)
+        np.multiply(khat[j], fk[l], out=tmp2)
+        tmp -= tmp2
+        tmp *= sigma
+        out[i] += tmp
+    return out
@@ -0,0 +1,121 @@
+"""
+Pseudo-spectral MHD solver
+Incompressible MHD in Elsasser form, sharing the FFT plans, workspace and integrators of the hydro path
+"""
+
+import numpy as np
+from tarang_engine.solver import HydroSolver
+from tarang_engine.spectra import energy_flux, modal_product, shell_spectrum, transfer_spectra
+
+
+class MHDSolver(HydroSolver):
+    """Incompressible MHD with velocity u and magnetic field b (Alfven units)
+
+    The state holds (u, b) so the viscous and resistive damping stay
+    diagonal for the integrating factors. The nonlinear terms are evaluated
+    in Elsasser variables z+- = u +- b: both fields go to real space in one
+    batched inverse FFT of six components, the nine products z-_i z+_j come
+    back in one batched forward FFT, and
+        du/dt = -1/2 [(z-.grad) z+ + (z+.grad) z-] - grad p
+        db/dt = -1/2 [(z-.grad) z+ - (z+.grad) z-]
+    follow from the divergences of that tensor. That is 15 transforms per
+    evaluation against 9 for hydro.
+    """
+
+    kind = 'MHD'
+    linear_groups = ((slice(0, 3), 'u'), (slice(3, 6), 'b'))
+    field_names = ('Vx', 'Vy', 'Vz', 'Bx', 'By', 'Bz')
+    # Dataset names of an Elsasser input file (INPUT_ELSASSER)
+    elsasser_names = ('Zpx', 'Zpy', 'Zpz', 'Zmx', 'Zmy', 'Zmz')
+    spectrum_names = ('Ek', 'Eb', 'Tk', 'Tbk', 'Pik')
+    default_case = 'orszag_tang'
+
+    def __init__(self, params, fft=None):
+        if params.get('SHELL_TRANSFER', False):
+            raise ValueError("SHELL_TRANSFER is only implemented for kind='HYDRO'")
+        super().__init__(params, fft=fft)
+
+    def allocate(self):
+        """Request every buffer the time loop needs from the workspace"""
+        ws = self.workspace
+        self.state = ws.spectral('state', 6)
+        self.uk = self.state[:3]
+        self.bk = self.state[3:]
+        # z+ and z- are transformed together as one batch of six
+        self.zk = ws.spectral('zk', 6)
+        self.z = ws.real('z', 6)
+        self.u = ws.real('u', 3)
+        self.zz = ws.real('zz', 9)
+        self.zzk = ws.spectral('zzk', 9)
+        self.nk = ws.spectral('nk', 6)
+        self.fft_work = ws.spectral('fft_work', 6)
+        self.rtmp = ws.real('rtmp')
+        self.ctmp = ws.spectral('ctmp')
+        self.ctmp2 = ws.spectral('ctmp2')
+        self.mode_buf = ws.spectral_real('mode_energy')
+        self.mode_tmp = ws.spectral_real('mode_tmp')
+
+    def elsasser(self, state, out):
+        """Spectral z+ = u + b and z- = u - b written into out"""
+        np.add(state[:3], state[3:], out=out[:3])
+        np.subtract(state[:3], state[3:], out=out[3:])
+        return out
+
+    def from_elsasser(self):
+        """Convert a state loaded as (z+, z-) into (u, b) in place"""
+        zp, zm = self.zk[:3], self.zk[3:]
+        np.copyto(zp, self.state[:3])
+        np.copyto(zm, self.state[3:])
+        np.add(zp, zm, out=self.uk)
+        np.subtract(zp, zm, out=self.bk)
+        self.state *= 0.5
+        self.update_real()
+
+    def nonlinear(self, state, out):
+        """Dealiased MHD nonlinear terms for (u, b) written into out, with z+- left in self.z"""
+        self.elsasser(state, self.zk)
+        self.fft.backward(self.zk, out=self.z, work=self.fft_work)
+        self.fft.execute(self.kernels.outer, self.z[3:], self.z[:3], self.zz)
+        self.fft.forward(self.zz, out=self.zzk)
+        self.fft.execute(self.kernels.elsasser_divergence, self.kx, self.ky, self.kz, self.zzk, out, self.ctmp)
+        self.fft.execute(self.kernels.multiply, out, self.dealias)
+        self.project(out[:3])
+        return out
+
+    def update_real(self):
+        """Refresh the real-space Elsasser fields and velocity from the spectral state"""
+        self.elsasser(self.state, self.zk)
+        self.fft.backward(self.zk, out=self.z, work=self.fft_work)
+        np.add(self.z[:3], self.z[3:], out=self.u)
+        self.u *= 0.5
+
+    def vector_potential(self, out):
+        """Spectral magnetic vector potential A (curl A = b, div A = 0) written into out"""
+        self.curl(self.bk, out)
+        out *= self.inv_k2
+        return out
+
+    def magnetic_energy(self):
+        """Magnetic energy <|b|^2>/2"""
+        return 0.5 * self.energy_sum(self.bk)
+
+    def cross_helicity(self):
+        """Cross helicity <u . b>/2"""
+        e = modal_product(self, self.uk, self.bk, self.mode_buf)
+        return 0.5 * self.fft.sum(float(e.sum(dtype=np.float64)))
+
+    def report_items(self):
+        """(label, value) pairs for the progress line"""
+        return [('KE', self.energy()), ('ME', self.magnetic_energy()),
+                ('Hc', self.cross_helicity()), ('Ω', self.enstrophy())]
+
+    def spectra(self):
+        """Kinetic and magnetic shell spectra, their transfers and the total energy flux"""
+        tu, tb = transfer_spectra(self)
+        return {'Ek': shell_spectrum(self, self.uk), 'Eb': shell_spectrum(self, self.bk),
+                'Tk': tu, 'Tbk': tb, 'Pik': energy_flux(tu + tb)}
+
+    def velocity_peaks(self):
+        """Largest |z+-_i| per component: the advection speeds of the Elsasser form"""
+        z = self.z.reshape(2, 3, -1)
+        return np.maximum(z.max(axis=(0, 2)), -z.min(axis=(0, 2)))
@@ -0,0 +1,269 @@
+"""
+Numba kernel backend for the Tarang engine
+Fused, thread-parallel versions of the hot elementwise kernels, selected with kernel_backend = 'numba'
+
+Each kernel here is one prange loop over x that reads every input and writes
+every output once, where the NumPy kernels chain three to five full-grid
+passes through temporaries. Broadcast wavenumber and mask arrays are
+expanded with zero strides, so they cost no memory. Arguments outside the
+3D field layout the loops are compiled for (2D runs, unusual broadcasts) go
+to the NumPy kernel of the same name. The remaining kernels are re-exported
+from tarang_engine.kernels unchanged.
+"""
+
+import numba
+import numpy as np
+from tarang_engine import kernels
+from tarang_engine.kernels import (OUTPUT_ARG, advection_divergence, coriolis, product, rotate,  # noqa: F401
+                                   scale_vector)
+
+# kernel_backend this module implements
+BACKEND = 'numba'
+
+_jit = numba.njit(parallel=True, cache=True)
+
+
+def _fields(a):
+    """a as a (components, x, y, z) view, or None when it is not a 3D field block"""
+    if not isinstance(a, np.ndarray):
+        return None
+    if a.ndim == 3:
+        return a[np.newaxis]
+    return a if a.ndim == 4 else None
+
+
+def _spread(a, shape):
+    """Zero-stride expansion of a broadcast array to the grid shape, or None"""
+    a = np.asarray(a)
+    if a.ndim > 3:
+        return None
+    try:
+        return np.broadcast_to(a, shape)
+    except ValueError:
+        return None
+
+
+@_jit
+def _cross(a, b, out):
+    for i in numba.prange(out.shape[1]):
+        for j in range(out.shape[2]):
+            for l in range(out.shape[3]):
+                a0, a1, a2 = a[0, i, j, l], a[1, i, j, l], a[2, i, j, l]
+                b0, b1, b2 = b[0, i, j, l], b[1, i, j, l], b[2, i, j, l]
+                out[0, i, j, l] = a1 * b2 - a2 * b1
+                out[1, i, j, l] = a2 * b0 - a0 * b2
+                out[2, i, j, l] = a0 * b1 - a1 * b0
+
+
+def cross(a, b, out, tmp):
+    """out = a x b"""
+    if a.ndim != 4 or out.shape != a.shape or b.shape != a.shape:
+        return kernels.cross(a, b, out, tmp)
+    _cross(a, b, out)
+    return out
+
+
+@_jit
+def _curl(kx, ky, kz, fk, out):
+    for i in numba.prange(out.shape[1]):
+        for j in range(out.shape[2]):
+            for l in range(out.shape[3]):
+                x, y, z = kx[i, j, l], ky[i, j, l], kz[i, j, l]
+                f0, f1, f2 = fk[0, i, j, l], fk[1, i, j, l], fk[2, i, j, l]
+                out[0, i, j, l] = 1j * (y * f2 - z * f1)
+                out[1, i, j, l] = 1j * (z * f0 - x * f2)
+                out[2, i, j, l] = 1j * (x * f1 - y * f0)
+
+
+def curl(kx, ky, kz, fk, out, tmp):
+    """out = i k x fk"""
+    shape = fk.shape[1:]
+    k = [_spread(ki, shape) for ki in (kx, ky, kz)]
+    if fk.ndim != 4 or out.shape != fk.shape or any(ki is None for ki in k):
+        return kernels.curl(kx, ky, kz, fk, out, tmp)
+    _curl(k[0], k[1], k[2], fk, out)
+    return out
+
+
+@_jit
+def _project(kx, ky, kz, inv_k2, fk):
+    for i in numba.prange(fk.shape[1]):
+        for j in range(fk.shape[2]):
+            for l in range(fk.shape[3]):
+                x, y, z = kx[i, j, l], ky[i, j, l], kz[i, j, l]
+                div = (x * fk[0, i, j, l] + y * fk[1, i, j, l] + z * fk[2, i, j, l]) * inv_k2[i, j, l]
+                fk[0, i, j, l] -= x * div
+                fk[1, i, j, l] -= y * div
+                fk[2, i, j, l] -= z * div
+
+
+def project(kx, ky, kz, inv_k2, fk, div, tmp):
+    """Remove the k-parallel part of fk: fk -= k (k . fk) / |k|^2"""
+    shape = fk.shape[1:]
+    k = [_spread(ki, shape) for ki in (kx, ky, kz, inv_k2)]
+    if fk.ndim != 4 or any(ki is None for ki in k):
+        return kernels.project(kx, ky, kz, inv_k2, fk, div, tmp)
+    _project(k[0], k[1], k[2], k[3], fk)
+    return fk
+
+
+@_jit
+def _outer(a, b, out):
+    for i in numba.prange(out.shape[1]):
+        for j in range(out.shape[2]):
+            for l in range(out.shape[3]):
+                for m in range(3):
+                    am = a[m, i, j, l]
+                    for n in range(3):
+                        out[3 * m + n, i, j, l] = am * b[n, i, j, l]
+
+
+def outer(a, b, out):
+    """out[3 i + j] = a_i b_j"""
+    if a.ndim != 4 or b.shape != a.shape or out.shape[1:] != a.shape[1:]:
+        return kernels.outer(a, b, out)
+    _outer(a, b, out)
+    return out
+
+
+@_jit
+def _elsasser_divergence(kx, ky, kz, tk, out):
+    for i in numba.prange(out.shape[1]):
+        for j in range(out.shape[2]):
+            for l in range(out.shape[3]):
+                k = (kx[i, j, l], ky[i, j, l], kz[i, j, l])
+                for n in range(3):
+                    su = 0j
+                    sb = 0j
+                    for m in range(3):
+                        a, b = tk[3 * m + n, i, j, l], tk[3 * n + m, i, j, l]
+                        su += k[m] * (a + b)
+                        sb += k[m] * (a - b)
+                    out[n, i, j, l] = -0.5j * su
+                    out[3 + n, i, j, l] = -0.5j * sb
+
+
+def elsasser_divergence(kx, ky, kz, tk, out, tmp):
+    """MHD nonlinear terms from the spectral tensor T_ij = (z-_i z+_j)^, see kernels.elsasser_divergence"""
+    shape = tk.shape[1:]
+    k = [_spread(ki, shape) for ki in (kx, ky, kz)]
+    if tk.ndim != 4 or out.shape[1:] != shape or any(ki is None for ki in k):
+        return kernels.elsasser_divergence(kx, ky, kz, tk, out, tmp)
+    _elsasser_divergence(k[0], k[1], k[2], tk, out)
+    return out
+
+
+@_jit
+def _mask(fk, keep):
+    for i in numba.prange(fk.shape[1]):
+        for j in range(fk.shape[2]):
+            for l in range(fk.shape[3]):
+                if not keep[i, j, l]:
+                    for c in range(fk.shape[0]):
+                        fk[c, i, j, l] = 0
+
+
+@_jit
+def _scale(fk, factor):
+    for i in numba.prange(fk.shape[1]):
+        for j in range(fk.shape[2]):
+            for l in range(fk.shape[3]):
+                f = factor[i, j, l]
+                for c in range(fk.shape[0]):
+                    fk[c, i, j, l] *= f
+
+
+def multiply(fk, factor):
+    """fk *= factor (dealiasing mask, integrating factor)"""
+    f4 = _fields(fk)
+    spread = _spread(factor, f4.shape[1:]) if f4 is not None else None
+    if spread is None:
+        return kernels.multiply(fk, factor)
+    if spread.dtype == np.bool_:
+        _mask(f4, spread)
+    else:
+        _scale(f4, spread)
+    return fk
+
+
+@_jit
+def _update(u, k, c, factor, out):
+    for i in numba.prange(out.shape[1]):
+        for j in range(out.shape[2]):
+            for l in range(out.shape[3]):
+                f = factor[i, j, l]
+                for m in range(out.shape[0]):
+                    out[m, i, j, l] = (u[m, i, j, l] + c * k[m, i, j, l]) * f
+
+
+def update(u, k, c, factor, out):
+    """out = (u + c k) factor, the integrating-factor stage update; out may be u or k"""
+    u4, k4, o4 = _fields(u), _fields(k), _fields(out)
+    spread = _spread(factor, o4.shape[1:]) if o4 is not None else None
+    if spread is None or u4 is None or k4 is None or not u4.shape == k4.shape == o4.shape:
+        return kernels.update(u, k, c, factor, out)
+    _update(u4, k4, out.real.dtype.type(c), spread, o4)
+    return out
+
+
+@_jit
+def _modal_energy(fk, weight, out):
+    for i in numba.prange(fk.shape[1]):
+        for j in range(fk.shape[2]):
+            for l in range(fk.shape[3]):
+                e = 0.0
+                for c in range(fk.shape[0]):
+                    f = fk[c, i, j, l]
+                    e += f.real * f.real + f.imag * f.imag
+                out[i, j, l] = weight[i, j, l] * e
+
+
+def modal_energy(fk, weight, out, tmp):
+    """out = weight sum_i |f_i|^2, per mode"""
+    f4 = _fields(fk)
+    spread = _spread(weight, f4.shape[1:]) if f4 is not None else None
+    if spread is None or out.shape != f4.shape[1:]:
+        return kernels.modal_energy(fk, weight, out, tmp)
+    _modal_energy(f4, spread, out)
+    return out
+
+
+@_jit
+def _energy_sum(fk, weight):
+    total = 0.0
+    for i in numba.prange(fk.shape[1]):
+        for j in range(fk.shape[2]):
+            for l in range(fk.shape[3]):
+                e = 0.0
+                for c in range(fk.shape[0]):
+                    f = fk[c, i, j, l]
+                    e += np.float64(f.real) * f.real + np.float64(f.imag) * f.imag
+                total += weight[i, j, l] * e
+    return total
+
+
+@_jit
+def _weighted_energy_sum(fk, weight, extra):
+    total = 0.0
+    for i in numba.prange(fk.shape[1]):
+        for j in range(fk.shape[2]):
+            for l in range(fk.shape[3]):
+                e = 0.0
+                for c in range(fk.shape[0]):
+                    f = fk[c, i, j, l]
+                    e += np.float64(f.real) * f.real + np.float64(f.imag) * f.imag
+                total += weight[i, j, l] * extra[i, j, l] * e
+    return total
+
+
+def energy_sum(fk, weight, extra, out, tmp):
+    """Local sum of weight (times extra, unless None) sum_i |f_i|^2 over the modes, in float64"""
+    f4 = _fields(fk)
+    shape = f4.shape[1:] if f4 is not None else None
+    spread = _spread(weight, shape) if f4 is not None else None
+    extra_spread = _spread(extra, shape) if f4 is not None and extra is not None else None
+    if spread is None or (extra is not None and extra_spread is None):
+        return kernels.energy_sum(fk, weight, extra, out, tmp)
+    if extra is None:
+        return float(_energy_sum(f4, spread))
+    return float(_weighted_energy_sum(f4, spread, extra_spread))
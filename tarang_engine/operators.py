@@ -0,0 +1,247 @@
+"""
+Precomputed spectral operators for the Tarang engine
+Wavenumber grids, dealiasing mask, dissipation and Coriolis operators, cached per grid and parameter set
+"""
+
+from collections import OrderedDict
+import numpy as np
+
+# Parameters that change the operators; anything else can vary without a rebuild
+OPERATOR_KEYS = (
+    'Nx', 'Ny', 'Nz', 'L',
+    'nu', 'nu_hypo', 'nu_hypo_power', 'nu_hyper', 'nu_hyper_power', 'nu_hypo_cutoff',
+    'eta', 'eta_hypo', 'eta_hypo_power', 'eta_hyper', 'eta_hyper_power', 'eta_hypo_cutoff',
+    'kappa', 'kappa_hypo', 'kappa_hypo_power', 'kappa_hyper', 'kappa_hyper_power', 'kappa_hypo_cutoff',
+    'HYPO_DISSIPATION', 'HYPER_DISSIPATION',
+    'ROTATION_ENABLED', 'Omega', 'ROTATION_INTEGRATING_FACTOR',
+)
+
+# Field name -> prefix of its dissipation coefficients in para.py
+DISSIPATION_PREFIX = {
+    'u': 'nu',
+    'b': 'eta',
+    'T': 'kappa',
+}
+
+OPERATOR_CACHE_SIZE = 8
+EXPONENTIAL_CACHE_SIZE = 16
+
+_operator_cache = OrderedDict()
+
+
+def _freeze(value):
+    """Hashable form of a parameter value"""
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (np.floating, np.integer)):
+        return value.item()
+    return value
+
+
+def operator_key(params, fft, real_dtype):
+    """Cache key for the operators of this grid, parameter set and precision"""
+    values = tuple(_freeze(params.get(name)) for name in OPERATOR_KEYS)
+    layout = (type(fft).__name__, fft.spectral_shape, getattr(fft, 'spectral_offset', None))
+    return values + layout + (np.dtype(real_dtype).name,)
+
+
+def get_operators(params, fft, real_dtype=np.float64):
+    """Return the cached SpectralOperators for params, building them on first use"""
+    key = operator_key(params, fft, real_dtype)
+    ops = _operator_cache.get(key)
+    if ops is None:
+        ops = SpectralOperators(params, fft, real_dtype)
+        _operator_cache[key] = ops
+        while len(_operator_cache) > OPERATOR_CACHE_SIZE:
+            _operator_cache.popitem(last=False)
+    else:
+        _operator_cache.move_to_end(key)
+    return ops
+
+
+def member_coefficient(value, ndim):
+    """A molecular coefficient as a float, or a list of them shaped to broadcast over a leading member axis"""
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return np.asarray(value, dtype=np.float64).reshape((-1,) + (1,) * ndim)
+    return float(value or 0.0)
+
+
+def clear_operator_cache():
+    """Drop every cached operator set"""
+    _operator_cache.clear()
+
+
+class SpectralOperators:
+    """Wavenumber grids, masks and dissipation operators for one grid and parameter set
+
+    Instances are shared between runs in the same process, so nothing here
+    may be modified after construction.
+    """
+
+    def __init__(self, params, fft, real_dtype=np.float64):
+        self.params = {name: params.get(name) for name in OPERATOR_KEYS}
+        self.real_dtype = np.dtype(real_dtype)
+        shape = fft.global_shape
+        L = [float(v) for v in params['L']][:len(shape)]
+
+        n = fft.wavenumber_indices()
+        k = [self._readonly(ni * (2*np.pi / Li)) for ni, Li in zip(n, L)]
+        self.kx, self.ky = k[:2]
+        # A dimension = 2 grid has no z axis
+        self.kz = k[2] if len(k) == 3 else None
+        k2 = sum(ki**2 for ki in k)
+        self.k2 = self._readonly(k2)
+        self.kmag = self._readonly(np.sqrt(k2))
+        self.inv_k2 = self._readonly(np.divide(1.0, k2, out=np.zeros_like(k2), where=k2 > 0))
+
+        # 2/3 rule: keep |n| < N/3 along every axis
+        dealias = np.ones(k2.shape, dtype=bool)
+        for ni, Ni in zip(n, shape):
+            dealias &= np.abs(ni) < Ni / 3
+        self.dealias = self._readonly(dealias)
+
+        # Integer shell of every mode in units of the smallest box wavenumber, for E(k)
+        kmin = 2*np.pi / max(L)
+        shell = np.rint(np.sqrt(k2) / kmin).astype(np.intp)
+        shell.setflags(write=False)
+        self.shell = shell
+        kmax = np.sqrt(sum((np.pi * Ni / Li)**2 for Ni, Li in zip(shape, L)))
+        self.nshells = int(np.rint(kmax / kmin)) + 1
+        self.kmin = kmin
+
+        # Modes 0 < n < N/2 along the last axis stand in for their conjugates in the half spectrum
+        self.mode_weight = self._readonly(np.where((n[-1] == 0) | (n[-1] == shape[-1] / 2), 1.0, 2.0))
+
+        # Coriolis: for solenoidal u the projected -2 Omega x u is -sigma(k) khat x u.
+        # In 2D a uniform rotation only changes the pressure, so it is ignored there.
+        omega = np.asarray(params.get('Omega') or (0.0, 0.0, 0.0), dtype=np.float64)
+        self.rotating = (bool(params.get('ROTATION_ENABLED', False)) and bool(np.any(omega != 0))
+                         and self.kz is not None)
+        self.exact_rotation = self.rotating and bool(params.get('ROTATION_INTEGRATING_FACTOR', True))
+        if self.rotating:
+            inv_k = np.divide(1.0, np.sqrt(k2), out=np.zeros_like(k2), where=k2 > 0)
+            khat = np.stack(np.broadcast_arrays(self.kx * inv_k, self.ky * inv_k, self.kz * inv_k))
+            self.khat = self._readonly(khat)
+            self.coriolis_rate = self._readonly(2.0 * np.tensordot(omega, khat, axes=1))
+
+        self._dissipation = {}
+        self._exponentials = OrderedDict()
+
+    def _readonly(self, array):
+        array = np.ascontiguousarray(array, dtype=self.real_dtype if array.dtype != bool else bool)
+        array.setflags(write=False)
+        return array
+
+    def dissipation(self, field='u'):
+        """Total linear damping rate D(k) for a field: molecular + hypo + hyper
+
+        With prefix p (nu, eta or kappa) the rate is
+            p |k|^2 + p_hypo |k|^(2 p_hypo_power) + p_hyper |k|^(2 p_hyper_power)
+        where the hypo term needs HYPO_DISSIPATION (and is limited to
+        |k| <= p_hypo_cutoff when that is positive) and the hyper term needs
+        HYPER_DISSIPATION. A list for p gives one rate per ensemble member,
+        with the member axis in front of the grid.
+        """
+        op = self._dissipation.get(field)
+        if op is not None:
+            return op
+
+        prefix = DISSIPATION_PREFIX[field]
+        p = self.params
+        kmag = self.kmag.astype(np.float64)
+        nonzero = kmag > 0
+        rate = member_coefficient(p.get(prefix), kmag.ndim) * kmag**2
+
+        hypo = float(p.get(f'{prefix}_hypo') or 0.0)
+        if p.get('HYPO_DISSIPATION') and hypo != 0.0:
+            power = 2.0 * float(p.get(f'{prefix}_hypo_power') or 0.0)
+            active = nonzero.copy()
+            cutoff = p.get(f'{prefix}_hypo_cutoff')
+            if cutoff is not None and float(cutoff) > 0:
+                active &= kmag <= float(cutoff)
+            rate += hypo * np.power(kmag, power, out=np.zeros_like(kmag), where=active)
+
+        hyper = float(p.get(f'{prefix}_hyper') or 0.0)
+        if p.get('HYPER_DISSIPATION') and hyper != 0.0:
+            power = 2.0 * float(p.get(f'{prefix}_hyper_power') or 0.0)
+            rate += hyper * np.power(kmag, power, out=np.zeros_like(kmag), where=nonzero)
+
+        op = self._readonly(rate)
+        self._dissipation[field] = op
+        return op
+
+    def rotates(self, field):
+        """Whether the factors of a field are (real, khat x) pairs carrying the exact rotation"""
+        return field == 'u' and self.exact_rotation
+
+    def _exponential(self, kind, dt, field, out, build):
+        """Cached (or, with out, freshly computed) function of -D(k) dt
+
+        For a field that rotates() the argument is -D(k) dt - i sigma(k) dt
+        and the value is the pair (Re f, Im f): since khat x (khat x u) = -u
+        for solenoidal u, f(L) u = Re f u + Im f khat x u. out is then a
+        complex buffer whose real and imaginary views are returned.
+        """
+        rotating = self.rotates(field)
+        if out is not None:
+            if rotating:
+                np.multiply(self.dissipation(field), -dt, out=out.real)
+                np.multiply(self.coriolis_rate, -dt, out=out.imag)
+                z = build(out)
+                return z.real, z.imag
+            return build(np.multiply(self.dissipation(field), -dt, out=out))
+        key = (kind, field, float(dt))
+        value = self._exponentials.get(key)
+        if value is None:
+            z = -self.dissipation(field).astype(np.float64) * dt
+            if rotating:
+                z = build(z - 1j * dt * self.coriolis_rate)
+                value = (self._readonly(z.real), self._readonly(z.imag))
+            else:
+                value = self._readonly(build(z))
+            self._exponentials[key] = value
+            while len(self._exponentials) > EXPONENTIAL_CACHE_SIZE:
+                self._exponentials.popitem(last=False)
+        else:
+            self._exponentials.move_to_end(key)
+        return value
+
+    def integrating_factor(self, dt, field='u', out=None):
+        """exp(-D(k) dt) for a field, or exp of the damped rotation as a pair (see _exponential)
+
+        Cached for the most recent time steps; adaptive-dt callers pass out
+        to recompute into their own buffer instead of churning the cache.
+        """
+        return self._exponential('exp', dt, field, out, lambda z: np.exp(z, out=z))
+
+    def phi1(self, dt, field='u', out=None):
+        """dt * phi1(-D dt), phi1(z) = (e^z - 1)/z, for exponential time differencing"""
+        return self._exponential('phi1', dt, field, out, lambda z: _scaled_phi(z, 1, dt))
+
+    def phi2(self, dt, field='u', out=None):
+        """dt * phi2(-D dt), phi2(z) = (e^z - 1 - z)/z^2, for exponential time differencing"""
+        return self._exponential('phi2', dt, field, out, lambda z: _scaled_phi(z, 2, dt))
+
+
+# Below this |z| the phi functions are evaluated from their Taylor series
+PHI_SERIES_THRESHOLD = 1e-2
+
+
+def _scaled_phi(z, order, dt):
+    """dt * phi_order(z) in place over z, stable for small |z|"""
+    small = np.abs(z) < PHI_SERIES_THRESHOLD
+    zs = z[small]
+    if order == 1:
+        series = 1 + zs/2 * (1 + zs/3 * (1 + zs/4 * (1 + zs/5)))
+    else:
+        series = 0.5 + zs/6 * (1 + zs/4 * (1 + zs/5 * (1 + zs/6)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        em1 = np.expm1(z)
+        if order == 1:
+            np.divide(em1, z, out=z)
+        else:
+            em1 -= z
+            np.divide(em1, np.square(z), out=z)
+    z[small] = series
+    z *= dt
+    return z
@@ -0,0 +1,339 @@
+"""
+Field output for the Tarang engine
+Snapshots are copied into standby buffers and written to HDF5 by a background thread;
+OUTPUT_REAL_FIELD adds real-space snapshots streamed one component at a time
+
+Snapshots and real-space fields are read back one component at a time,
+at the solver's resolution or truncated / zero-padded to it.
+"""
+
+import os
+import queue
+import threading
+import time
+import numpy as np
+from tarang_engine.fft import shared_modes, spectral_blocks
+
+# Bytes of file data read per slab when a real-space input changes resolution
+INPUT_SLAB_BYTES = 64 * 2**20
+
+
+def snapshot_path(output_dir, t, fft):
+    """Snapshot file for time t; every rank of a distributed run writes its own block"""
+    name = f"Soln_{t:.6f}.h5" if fft.nprocs == 1 else f"Soln_{t:.6f}_rank{fft.rank}.h5"
+    return os.path.join(output_dir or '.', name)
+
+
+def real_snapshot_path(output_dir, t):
+    """Real-space snapshot file for time t, one global file however many ranks write it"""
+    return os.path.join(output_dir or '.', f"Real_{t:.6f}.h5")
+
+
+def write_snapshot(path, names, fields, step, t, fft, mode='w'):
+    """Write the spectral state to one HDF5 file, via a temporary name so readers never see a partial file
+
+    mode 'a' adds to a temporary file that already holds other datasets.
+    """
+    import h5py
+    tmp = path + '.tmp'
+    with h5py.File(tmp, mode) as f:
+        f.attrs['t'] = t
+        f.attrs['step'] = step
+        f.attrs['global_shape'] = fft.global_shape
+        f.attrs['spectral_offset'] = fft.spectral_offset
+        for name, field in zip(names, fields):
+            f.create_dataset(name, data=field)
+    os.replace(tmp, path)
+
+
+def read_snapshot(solver, path, names=None):
+    """Load a snapshot written by write_snapshot into the solver state
+
+    names overrides the dataset names read into the state components,
+    e.g. the Elsasser fields of an MHD input file. A snapshot of another
+    single-process grid is truncated or zero-padded to the solver's: only
+    the shared blocks of modes are read, straight into the state.
+    """
+    import h5py
+    fft = solver.fft
+    names = names or solver.field_names
+    with h5py.File(path, 'r') as f:
+        grid = tuple(int(n) for n in f.attrs['global_shape'])
+        blocks = None
+        if grid != fft.global_shape:
+            whole = grid[:-1] + (grid[-1] // 2 + 1,)
+            if fft.nprocs > 1 or len(grid) != len(fft.global_shape) or f[names[0]].shape != whole:
+                raise ValueError(f"{path} holds a {grid} grid, the solver expects {fft.global_shape}; "
+                                 f"resolution changes need a single-process snapshot and run")
+            blocks = spectral_blocks(grid, fft.global_shape)
+        for name, field in zip(names, solver.state):
+            dataset = f[name]
+            if blocks is None:
+                if dataset.dtype == field.dtype:
+                    dataset.read_direct(field)
+                else:
+                    np.copyto(field, dataset[...])
+                continue
+            field[...] = 0
+            for source, target in blocks:
+                if dataset.dtype == field.dtype:
+                    dataset.read_direct(field, source_sel=source, dest_sel=target)
+                else:
+                    field[target] = dataset[source]
+        solver.t = float(f.attrs['t'])
+        solver.step_count = int(f.attrs['step'])
+    if blocks is not None:
+        solver.state *= solver.dealias
+    solver.update_real()
+
+
+def read_real_fields(solver, path, names=None):
+    """Initialise the solver state from real-space fields, one component at a time (INPUT_REAL_FIELD)
+
+    Every dataset holds one field on the global grid, as RealFieldWriter
+    writes them; t and step are taken from the file attributes when it has
+    them. On the solver's grid a rank reads its block straight into the
+    one-field real scratch rtmp and transforms it into its state component,
+    so loading needs no memory beyond the workspace. A field on another
+    grid (single process only) is read INPUT_SLAB_BYTES of x-planes at a
+    time; each slab is transformed along the other axes, truncated or
+    zero-padded to the solver's modes and collected in a stage that a last
+    transform along x turns into the state component. The stage is the
+    component itself unless Nx changes. Vector fields are projected and the
+    state dealiased afterwards.
+    """
+    import h5py
+    fft = solver.fft
+    with h5py.File(path, 'r') as f:
+        for name, field in zip(names or solver.field_names, solver.state):
+            dataset = f[name]
+            grid = dataset.shape
+            if len(grid) != len(fft.global_shape):
+                raise ValueError(f"{path}: '{name}' is {len(grid)}D, the solver is {len(fft.global_shape)}D")
+            if grid == fft.global_shape:
+                block = tuple(slice(o, o + n) for o, n in zip(fft.real_offset, fft.real_shape))
+                dataset.read_direct(solver.rtmp, source_sel=block)
+                fft.forward(solver.rtmp, out=field)
+            elif fft.nprocs > 1:
+                raise ValueError(f"{path} holds a {grid} grid, the solver expects {fft.global_shape}; "
+                                 f"resolution changes need a single-process run")
+            else:
+                resample_real(dataset, field, fft.global_shape)
+        if 't' in f.attrs:
+            solver.t = float(f.attrs['t'])
+        if 'step' in f.attrs:
+            solver.step_count = int(f.attrs['step'])
+    solver.condition_state()
+
+
+def resample_real(dataset, field, grid):
+    """Forward transform of a real dataset on another grid into the spectral field of grid, slab by slab"""
+    source = dataset.shape
+    Mx, Nx = source[0], grid[0]
+    stage = field if Mx == Nx else np.empty((Mx,) + field.shape[1:], dtype=field.dtype)
+    stage[...] = 0
+    blocks = spectral_blocks(source[1:], grid[1:])
+    axes = tuple(range(1, len(source)))
+    rows = max(1, INPUT_SLAB_BYTES // (int(np.prod(source[1:])) * dataset.dtype.itemsize))
+    slab = np.empty((min(rows, Mx),) + source[1:], dtype=dataset.dtype)
+    for x0 in range(0, Mx, rows):
+        x1 = min(x0 + rows, Mx)
+        dataset.read_direct(slab, source_sel=np.s_[x0:x1], dest_sel=np.s_[:x1 - x0])
+        slab_k = np.fft.rfftn(slab[:x1 - x0], axes=axes, norm='forward')
+        for s, t in blocks:
+            stage[(slice(x0, x1),) + t] = slab_k[(slice(None),) + s]
+    np.fft.fft(stage, axis=0, norm='forward', out=stage)
+    if stage is not field:
+        field[...] = 0
+        for s, t in shared_modes(Mx, Nx):
+            field[t] = stage[s]
+    return field
+
+
+class SnapshotWriter:
+    """Double-buffered asynchronous snapshot writer
+
+    submit() copies the state into a free standby buffer and returns; a
+    writer thread drains the queue to disk. With every buffer in flight
+    submit() blocks until one is released, so a slow file system throttles
+    the run instead of growing memory. Write errors are raised on the next
+    submit() or on close().
+
+    The standby buffers hold the state only. Derived fields are computed
+    one group at a time into work, the solver's fft_work scratch, and
+    written to the snapshot's temporary file by submit() itself, before the
+    writer thread adds the state to it.
+    """
+
+    def __init__(self, output_dir, fft, names, shape, dtype, depth=2, work=None):
+        import h5py  # noqa: F401  (fail at start-up, not in the writer thread)
+        self.output_dir = output_dir
+        self.fft = fft
+        self.names = tuple(names)
+        self.work = work
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        self._free = queue.Queue()
+        for _ in range(max(int(depth), 1)):
+            self._free.put(np.empty(shape, dtype=dtype))
+        self._pending = queue.Queue()
+        self._error = None
+        self.written = 0
+        self.stall_time = 0.0
+        self.write_time = 0.0
+        self.derived_time = 0.0
+        self._thread = threading.Thread(target=self._run, name='tarang-snapshot-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                break
+            buf, step, t, mode = item
+            try:
+                start = time.perf_counter()
+                write_snapshot(snapshot_path(self.output_dir, t, self.fft), self.names, buf, step, t, self.fft,
+                               mode)
+                self.write_time += time.perf_counter() - start
+                self.written += 1
+            except Exception as e:
+                self._error = e
+            finally:
+                self._free.put(buf)
+
+    def _raise_pending_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError(f"Snapshot write failed: {error}") from error
+
+    def submit(self, fields, step, t, derived=()):
+        """Queue a copy of fields for writing; blocks only while every standby buffer is in flight
+
+        derived is a sequence of (names, compute) pairs; each compute(out)
+        fills the work scratch, which is written out before the next group.
+        """
+        self._raise_pending_error()
+        start = time.perf_counter()
+        buf = self._free.get()
+        self.stall_time += time.perf_counter() - start
+        np.copyto(buf, fields)
+        mode = 'w'
+        if derived:
+            self.write_derived(snapshot_path(self.output_dir, t, self.fft) + '.tmp', derived)
+            mode = 'a'
+        self._pending.put((buf, step, t, mode))
+
+    def write_derived(self, tmp, derived):
+        """Compute and write every derived group through the work scratch"""
+        import h5py
+        start = time.perf_counter()
+        with h5py.File(tmp, 'w') as f:
+            for names, compute in derived:
+                out = self.work[:len(names)]
+                compute(out)
+                for name, field in zip(names, out):
+                    f.create_dataset(name, data=field)
+        self.derived_time += time.perf_counter() - start
+
+    def close(self):
+        """Flush the queue and stop the writer thread"""
+        if self._thread.is_alive():
+            self._pending.put(None)
+            self._thread.join()
+        self._raise_pending_error()
+
+    def describe(self):
+        """One line summary for the run log"""
+        return (f"{self.written} snapshots written in {self.write_time + self.derived_time:.3f}s "
+                f"(time loop stalled {self.stall_time:.3f}s)")
+
+
+class RealFieldWriter:
+    """Real-space snapshots written one component at a time
+
+    Each field, state or derived, is inverse-transformed into the solver's
+    one-field real scratch buffer rtmp (with ctmp as the transform's work
+    array) and written to its dataset before the next one starts. Derived
+    fields are computed into the fft_work scratch, so a save allocates no
+    field-sized memory at all. The scratch is needed again by the next
+    step, so saves run synchronously in the time loop.
+
+    A distributed run writes one file of global datasets too, each rank its
+    block of every field: collectively through the mpio driver when h5py
+    is built with MPI, otherwise rank after rank, each opening the file in
+    turn once rank 0 has created the datasets.
+    """
+
+    def __init__(self, output_dir, solver, derived=()):
+        import h5py  # noqa: F401  (fail at start-up, not at the first save)
+        self.output_dir = output_dir
+        self.solver = solver
+        self.derived = tuple(derived)
+        for names, _ in self.derived:
+            if len(names) > len(solver.fft_work):
+                raise ValueError(f"Derived output {names} does not fit the fft_work scratch")
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        self.written = 0
+        self.write_time = 0.0
+
+    def fields(self):
+        """(name, spectral field) of the state, then of every derived group as it is computed"""
+        s = self.solver
+        yield from zip(s.field_names, s.state)
+        for names, compute in self.derived:
+            out = s.fft_work[:len(names)]
+            compute(out)
+            yield from zip(names, out)
+
+    def names(self):
+        """Dataset names, in the order fields() yields them"""
+        return self.solver.field_names + sum((names for names, _ in self.derived), ())
+
+    def create(self, f, step, t):
+        """Attributes and empty global datasets of a snapshot file"""
+        fft = self.solver.fft
+        f.attrs['t'] = t
+        f.attrs['step'] = step
+        f.attrs['global_shape'] = fft.global_shape
+        for name in self.names():
+            f.create_dataset(name, shape=fft.global_shape, dtype=self.solver.rtmp.dtype)
+
+    def write(self, step, t):
+        """Write the real-space fields at time t, via a temporary name like write_snapshot"""
+        import h5py
+        s, fft = self.solver, self.solver.fft
+        start = time.perf_counter()
+        path = real_snapshot_path(self.output_dir, t)
+        tmp = path + '.tmp'
+        block = tuple(slice(o, o + n) for o, n in zip(fft.real_offset, fft.real_shape))
+        if fft.nprocs == 1 or h5py.get_config().mpi:
+            driver = dict(driver='mpio', comm=fft.comm) if fft.nprocs > 1 else {}
+            with h5py.File(tmp, 'w', **driver) as f:
+                self.create(f, step, t)
+                for name, field in self.fields():
+                    fft.backward(field, out=s.rtmp, work=s.ctmp)
+                    f[name][block] = s.rtmp
+        else:
+            if fft.rank == 0:
+                with h5py.File(tmp, 'w') as f:
+                    self.create(f, step, t)
+            for name, field in self.fields():
+                fft.backward(field, out=s.rtmp, work=s.ctmp)
+                # Without parallel HDF5 only one rank may have the file open at a time
+                for rank in range(fft.nprocs):
+                    if rank == fft.rank:
+                        with h5py.File(tmp, 'r+') as f:
+                            f[name][block] = s.rtmp
+                    fft.comm.Barrier()
+        if fft.rank == 0:
+            os.replace(tmp, path)
+        if fft.nprocs > 1:
+            fft.comm.Barrier()
+        self.write_time += time.perf_counter() - start
+        self.written += 1
+
+    def describe(self):
+        """One line summary for the run log"""
+        return f"{self.written} real-space snapshots written in {self.write_time:.3f}s"
@@ -0,0 +1,139 @@
+"""
+Parameter loading for the Tarang engine
+Reads para.py files (as written by the web app) on top of engine defaults
+"""
+
+import importlib.util
+import os
+import types
+import numpy as np
+
+# Defaults mirror the keys written into every para.py
+DEFAULT_PARAMETERS = {
+    'dimension': 3,
+    'kind': 'HYDRO',
+    'Nx': 64,
+    'Ny': 64,
+    'Nz': 64,
+    'L': [2*np.pi, 2*np.pi, 2*np.pi],
+    'input_dir': '',
+    'input_file_name': 'init_cond.h5',
+    'output_dir': '',
+    'nu': 0.01,
+    'eta': 0.01,
+    'kappa': 0.01,
+    'Ra': 1e5,
+    'Pr': 1.0,
+    'BUOYANCY_ENABLED': False,
+    'Omega': [0, 0, 0],
+    'ROTATION_ENABLED': False,
+    'ROTATION_INTEGRATING_FACTOR': True,
+    'FORCING_ENABLED': False,
+    'FORCING_SCHEME': 'random',
+    'RANDOM_FORCING_TYPE': 'u',
+    'forcing_range': [4, 5],
+    'injections': [0, 0, 0],
+    'injection_rate': None,
+    't_initial': 0.0,
+    't_final': 0.1,
+    'dt': 0.001,
+    'time_scheme': 'EULER',
+    'FIXED_DT': True,
+    'Courant_no': 0.5,
+    't_eps': 1e-8,
+    'iter_field_save_start': 0,
+    'iter_field_save_inter': 500,
+    'field_save_buffers': 2,
+    'SAVE_VORTICITY': False,
+    'SAVE_VECPOT': False,
+    'iter_checkpoint_save_start': 0,
+    'iter_checkpoint_save_inter': 0,
+    'iter_ekTk_save_start': 0,
+    'iter_ekTk_save_inter': 100,
+    'SHELL_TRANSFER': False,
+    'transfer_shell_edges': None,
+    'transfer_batch': 1,
+    'modes_save': (),
+    'iter_modes_save_start': 0,
+    'iter_modes_save_inter': 200,
+    'modes_buffer': 1024,
+    'iter_glob_energy_print_start': 0,
+    'iter_glob_energy_print_inter': 1,
+    'PRINT_PHASE_TIMES': True,
+    'PROGRESS_FORMAT': 'text',
+    'real_dtype': 'float64',
+    'complex_dtype': 'complex',
+    'INPUT_SET_CASE': True,
+    'INPUT_FROM_FILE': False,
+    'INPUT_ELSASSER': False,
+    'INPUT_REAL_FIELD': False,
+    'OUTPUT_REAL_FIELD': False,
+    'input_case': 'custom',
+    'random_seed': 0,
+    'device_rank': 0,
+    'mpi_decomposition': 'slab',
+    'mpi_proc_grid': None,
+    'shm_workers': 0,
+    'kernel_backend': 'numpy',
+    'ensemble': None,
+    'ensemble_batch': 0,
+}
+
+
+def load_parameters(param_file=None):
+    """Load simulation parameters from a para.py file on top of the defaults"""
+    params = dict(DEFAULT_PARAMETERS)
+
+    if param_file and os.path.exists(param_file):
+        try:
+            spec = importlib.util.spec_from_file_location("params", param_file)
+            params_module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(params_module)
+
+            # Take every public, non-module attribute of the para file
+            for key, value in vars(params_module).items():
+                if key.startswith('_') or isinstance(value, types.ModuleType):
+                    continue
+                params[key] = value
+
+        except Exception as e:
+            print(f"Warning: Could not load parameters from {param_file}: {e}")
+            print("Using default parameters...")
+
+    return params
+
+
+def resolve_dtypes(params):
+    """Real and complex numpy dtypes from real_dtype / complex_dtype
+
+    The generic complex_dtype 'complex' follows the precision of real_dtype,
+    so real_dtype = 'float32' alone selects the single-precision engine.
+    """
+    real = np.dtype(params.get('real_dtype', 'float64'))
+    if real not in (np.float32, np.float64):
+        raise ValueError(f"Unsupported real_dtype '{params.get('real_dtype')}' (expected float32 or float64)")
+    matching = np.result_type(real, np.complex64)
+
+    name = params.get('complex_dtype', 'complex')
+    if name in (None, '', 'complex'):
+        return real, matching
+    cplx = np.dtype(name)
+    if cplx != matching:
+        raise ValueError(f"complex_dtype '{name}' does not match real_dtype '{real.name}' "
+                         f"(use '{matching.name}' or 'complex')")
+    return real, cplx
+
+
+def iteration_due(step, start, inter):
+    """Return True when an iteration-cadence parameter pair fires at this step"""
+    start = int(start)
+    inter = int(inter)
+    if inter <= 0 or step < start:
+        return False
+    return (step - start) % inter == 0
+
+
+def total_steps(params):
+    """Number of fixed-dt steps needed to go from t_initial to t_final"""
+    span = float(params['t_final']) - float(params['t_initial'])
+    return max(int(round(span / float(params['dt']))), 0)
@@ -0,0 +1,135 @@
+"""
+Mode probes for the Tarang engine
+Samples the spectral state at the modes_save wavenumbers into a ring buffer flushed to HDF5 in blocks
+"""
+
+import os
+import numpy as np
+
+
+def planar_modes(modes, dimension):
+    """modes with dimension components: in 2D the (kx, ky, 0) modes of a 3D para.py become (kx, ky)
+
+    Modes with a nonzero component beyond the dimension have no counterpart
+    on the grid and are dropped.
+    """
+    fitted = []
+    for mode in modes:
+        n = tuple(int(v) for v in mode)
+        if len(n) > dimension:
+            if any(n[dimension:]):
+                continue
+            n = n[:dimension]
+        fitted.append(n)
+    return fitted
+
+
+def mode_locations(modes, fft):
+    """Flat indices into the local spectral block of the modes this rank holds
+
+    Returns (positions in the modes list, flat indices, conjugate flags),
+    ordered by flat index so a gather walks memory forwards. Modes with a
+    negative last component (kz, or ky in 2D) are stored as the conjugate of
+    -k in the half spectrum.
+    """
+    shape, offset = fft.spectral_shape, fft.spectral_offset
+    N = fft.global_shape
+    positions, flat, conjugate = [], [], []
+    for p, mode in enumerate(modes):
+        n = [int(v) for v in mode]
+        if len(n) != len(N):
+            raise ValueError(f"Mode {tuple(mode)} does not have {len(N)} components")
+        flip = n[-1] < 0
+        if flip:
+            n = [-v for v in n]
+        if any(abs(ni) > Ni // 2 for ni, Ni in zip(n[:-1], N)) or n[-1] > N[-1] // 2:
+            raise ValueError(f"Mode {tuple(mode)} is outside the {'x'.join(map(str, N))} grid")
+        index = tuple(ni % Ni - oi for ni, Ni, oi in zip(n[:-1], N, offset)) + (n[-1] - offset[-1],)
+        if all(0 <= i < s for i, s in zip(index, shape)):
+            positions.append(p)
+            flat.append(np.ravel_multi_index(index, shape))
+            conjugate.append(flip)
+    order = np.argsort(flat, kind='stable')
+    return (np.array(positions, dtype=np.intp)[order], np.array(flat, dtype=np.intp)[order],
+            np.array(conjugate, dtype=bool)[order])
+
+
+class ModeProbe:
+    """Ring buffer of mode samples, written to disk a block at a time
+
+    Each sample is one np.take of the locally held modes from the flattened
+    state into the next ring row, so sampling costs O(number of modes) and
+    allocates nothing. Full blocks are appended to an extendable HDF5
+    dataset; every rank of a distributed run writes the modes it holds.
+    """
+
+    def __init__(self, path, modes, state, fft, block=1024):
+        self.state = state
+        self.flat_state = state.reshape(state.shape[0], -1)
+        self.positions, self.flat, self.conjugate = mode_locations(modes, fft)
+        self.block = max(int(block), 1)
+        self.ring = np.empty((self.block, state.shape[0], len(self.flat)), dtype=state.dtype)
+        self.times = np.empty(self.block)
+        self.steps = np.empty(self.block, dtype=np.int64)
+        self.count = 0
+        self.samples = 0
+        self.file = None
+        if len(self.flat) == 0:
+            return
+        import h5py
+        if fft.nprocs > 1:
+            root, ext = os.path.splitext(path)
+            path = f"{root}_rank{fft.rank}{ext}"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.file = h5py.File(path, 'a')
+        f = self.file
+        nmodes = len(self.flat)
+        wavenumbers = np.array([modes[p] for p in self.positions], dtype=np.int64).reshape(nmodes, len(fft.global_shape))
+        if 'modes' in f:
+            if not np.array_equal(f['modes'][...], wavenumbers) or f['samples'].shape[1:] != self.ring.shape[1:]:
+                raise ValueError(f"{path} already holds samples of different modes or fields")
+        else:
+            f.create_dataset('modes', data=wavenumbers)
+            f.create_dataset('t', shape=(0,), maxshape=(None,), dtype='f8', chunks=(self.block,))
+            f.create_dataset('step', shape=(0,), maxshape=(None,), dtype='i8', chunks=(self.block,))
+            f.create_dataset('samples', shape=(0,) + self.ring.shape[1:], maxshape=(None,) + self.ring.shape[1:],
+                             dtype=state.dtype, chunks=True)
+
+    def sample(self, t, step):
+        """Record the current state at the probed modes"""
+        if self.file is None:
+            return
+        np.take(self.flat_state, self.flat, axis=1, out=self.ring[self.count])
+        self.times[self.count] = t
+        self.steps[self.count] = step
+        self.count += 1
+        if self.count == self.block:
+            self.flush()
+
+    def flush(self):
+        """Append the buffered samples to the file"""
+        if self.file is None or self.count == 0:
+            return
+        n = self.count
+        rows = self.ring[:n]
+        if self.conjugate.any():
+            rows[..., self.conjugate] = np.conj(rows[..., self.conjugate])
+        f = self.file
+        start = f['t'].shape[0]
+        for name in ('t', 'step', 'samples'):
+            f[name].resize(start + n, axis=0)
+        f['t'][start:] = self.times[:n]
+        f['step'][start:] = self.steps[:n]
+        f['samples'][start:] = rows
+        f.flush()
+        self.samples += n
+        self.count = 0
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
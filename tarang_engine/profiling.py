@@ -0,0 +1,92 @@
+"""
+Whole-run profiling for the Tarang engine
+Deterministic (cProfile) or sampling profiles of a run, written to the output directory
+
+'cprofile' traces every Python call: exact call counts, but every call pays
+for the tracing. 'sampling' reads the main thread's stack on a SIGPROF
+interval timer instead, so the run keeps its speed, and writes the stacks in
+collapsed form (one 'frame;frame;... count' line per stack) for flamegraph.pl
+or speedscope.
+"""
+
+import collections
+import contextlib
+import os
+import signal
+
+PROFILERS = ('cprofile', 'sampling')
+
+
+def profile_path(output_dir, name, rank=0, nprocs=1):
+    """Output file of one rank's profile"""
+    root, ext = os.path.splitext(name)
+    if nprocs > 1:
+        name = f"{root}_rank{rank}{ext}"
+    return os.path.join(output_dir or '.', name)
+
+
+@contextlib.contextmanager
+def profile_run(mode, output_dir='', rank=0, nprocs=1, interval=0.005):
+    """Profile the body with mode ('cprofile', 'sampling' or None for no profiling)"""
+    if mode is None:
+        yield
+        return
+    if mode not in PROFILERS:
+        raise ValueError(f"Unsupported profiler '{mode}' (expected one of {', '.join(PROFILERS)})")
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    if mode == 'cprofile':
+        with _cprofile(profile_path(output_dir, 'profile.pstats', rank, nprocs)):
+            yield
+    else:
+        with _sampling(profile_path(output_dir, 'profile.folded', rank, nprocs), interval):
+            yield
+
+
+@contextlib.contextmanager
+def _cprofile(path):
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        # A readable top list next to the binary stats
+        with open(os.path.splitext(path)[0] + '.txt', 'w') as f:
+            pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(40)
+        print(f"Profile: cProfile stats written to {path}")
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+@contextlib.contextmanager
+def _sampling(path, interval):
+    if not hasattr(signal, 'setitimer'):
+        raise ValueError("--profile=sampling needs signal.setitimer (not available on this platform)")
+    counts = collections.Counter()
+
+    def sample(signum, frame):
+        stack = []
+        while frame is not None:
+            stack.append(_frame_name(frame))
+            frame = frame.f_back
+        counts[';'.join(reversed(stack))] += 1
+
+    previous = signal.signal(signal.SIGPROF, sample)
+    # ITIMER_PROF counts CPU time of the process, so idle waits are not sampled
+    signal.setitimer(signal.ITIMER_PROF, interval, interval)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, previous)
+        with open(path, 'w') as f:
+            for stack, n in counts.most_common():
+                f.write(f"{stack} {n}\n")
+        print(f"Profile: {sum(counts.values())} samples every {1e3 * interval:g} ms written to {path}")
@@ -0,0 +1,130 @@
+"""
+Scalar transport solvers
+Passive scalar and Boussinesq convection, with the scalar advection fused into the velocity's nonlinear evaluation
+"""
+
+import numpy as np
+from tarang_engine.solver import HydroSolver
+from tarang_engine.spectra import energy_flux, modal_product, shell_spectrum, transfer_spectra
+
+
+class ScalarSolver(HydroSolver):
+    """Velocity plus an advected scalar theta, damped by kappa
+
+    The state is (u, theta). u, omega and theta go to real space in one
+    batched inverse FFT of seven components and u x omega and the flux
+    u theta come back in one batched forward FFT of six, so the scalar
+    adds four transforms to the nine of a hydro evaluation. With
+    BUOYANCY_ENABLED theta also drives the flow as a temperature
+    deviation from a linear profile (see ConvectionSolver).
+    """
+
+    kind = 'SCALAR'
+    linear_groups = ((slice(0, 3), 'u'), (slice(3, 4), 'T'))
+    field_names = ('Vx', 'Vy', 'Vz', 'T')
+    spectrum_names = ('Ek', 'Es', 'Tk', 'Tsk', 'Pik', 'Pisk')
+    default_case = 'random'
+
+    def __init__(self, params, fft=None):
+        self.buoyant = bool(params.get('BUOYANCY_ENABLED', False))
+        super().__init__(params, fft=fft)
+
+    @property
+    def kappa(self):
+        """Scalar diffusivity, read from params (RBC derives it from Ra and Pr)"""
+        return float(self.params.get('kappa') or 0.0)
+
+    def allocate(self):
+        """Request every buffer the time loop needs from the workspace"""
+        ws = self.workspace
+        self.state = ws.spectral('state', 4)
+        self.uk = self.state[:3]
+        # u, omega and theta are transformed together as one batch of seven
+        self.uwk = ws.spectral('uwk', 7)
+        self.uw = ws.real('uw', 7)
+        self.u = self.uw[:3]
+        self.w = self.uw[3:6]
+        self.theta = self.uw[6]
+        # u x omega and u theta are transformed back as one batch of six
+        self.flux = ws.real('flux', 6)
+        self.fluxk = ws.spectral('fluxk', 6)
+        self.nk = ws.spectral('nk', 4)
+        self.fft_work = ws.spectral('fft_work', 7)
+        self.rtmp = ws.real('rtmp')
+        self.ctmp = ws.spectral('ctmp')
+        self.ctmp2 = ws.spectral('ctmp2')
+        self.mode_buf = ws.spectral_real('mode_energy')
+        self.mode_tmp = ws.spectral_real('mode_tmp')
+
+    def nonlinear(self, state, out):
+        """Dealiased momentum and scalar terms for (u, theta) written into out, with u left in self.u"""
+        uk = state[:3]
+        np.copyto(self.uwk[:3], uk)
+        self.curl(uk, self.uwk[3:6])
+        np.copyto(self.uwk[6], state[3])
+        self.fft.backward(self.uwk, out=self.uw, work=self.fft_work)
+        self.cross_product(self.u, self.w, self.flux[:3])
+        self.fft.execute(self.kernels.scale_vector, self.u, self.theta, self.flux[3:])
+        self.fft.forward(self.flux, out=self.fluxk)
+        self.fft.execute(self.kernels.multiply, self.fluxk, self.dealias)
+
+        np.copyto(out[:3], self.fluxk[:3])
+        if self.buoyant:
+            # Buoyancy theta z-hat; its gradient part is removed by the projection
+            out[2] += state[3]
+        self.project(out[:3])
+        self.fft.execute(self.kernels.advection_divergence, self.kx, self.ky, self.kz, self.fluxk[3:], out[3], self.ctmp)
+        if self.buoyant:
+            # Advection of the background profile -z gives the source +u_z
+            out[3] += state[2]
+        return out
+
+    def update_real(self):
+        """Refresh the real-space velocity and scalar from the spectral state"""
+        self.fft.backward(self.uk, out=self.u, work=self.fft_work[:3])
+        self.fft.backward(self.state[3:], out=self.uw[6:], work=self.fft_work[6:])
+
+    def scalar_energy(self):
+        """Scalar variance <theta^2>/2"""
+        return 0.5 * self.energy_sum(self.state[3:])
+
+    def nusselt(self):
+        """Nusselt number 1 + <u_z theta> / kappa"""
+        e = modal_product(self, self.state[2:3], self.state[3:], self.mode_buf)
+        flux = self.fft.sum(float(e.sum(dtype=np.float64)))
+        return 1.0 + flux / self.kappa if self.kappa > 0 else float('nan')
+
+    def report_items(self):
+        """(label, value) pairs for the progress line"""
+        items = [('KE', self.energy()), ('Ω', self.enstrophy()), ('Es', self.scalar_energy())]
+        if self.buoyant:
+            items.append(('Nu', self.nusselt()))
+        return items
+
+    def spectra(self):
+        """Velocity and scalar shell spectra, transfers and fluxes"""
+        tu, ts = transfer_spectra(self)
+        out = {'Ek': shell_spectrum(self, self.uk), 'Es': shell_spectrum(self, self.state[3:]),
+               'Tk': tu, 'Tsk': ts, 'Pik': energy_flux(tu), 'Pisk': energy_flux(ts)}
+        if self.shell_transfer is not None:
+            out['Tnm'] = self.shell_transfer.compute()
+        return out
+
+
+class ConvectionSolver(ScalarSolver):
+    """Boussinesq convection in a periodic box (homogeneous Rayleigh-Benard)
+
+    In free-fall units with a unit temperature drop over a unit height
+        du/dt = u x omega + theta z-hat - grad p + nu lap u
+        dtheta/dt = -u . grad theta + u_z + kappa lap theta
+    with nu = sqrt(Pr/Ra) and kappa = 1/sqrt(Ra Pr) from the para.py Ra and
+    Pr, overriding nu and kappa.
+    """
+
+    kind = 'RBC'
+    default_case = 'thermal_noise'
+
+    def __init__(self, params, fft=None):
+        Ra, Pr = float(params['Ra']), float(params['Pr'])
+        params = dict(params, nu=np.sqrt(Pr / Ra), kappa=1.0 / np.sqrt(Ra * Pr), BUOYANCY_ENABLED=True)
+        super().__init__(params, fft=fft)
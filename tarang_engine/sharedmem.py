@@ -0,0 +1,242 @@
+"""
+Shared-memory multi-process engine mode for single large nodes
+A pool of worker processes splits FFT axes and elementwise kernels over fields held in shared memory
+
+Every workspace buffer and constant lives in a multiprocessing.shared_memory
+block; workers attach to the blocks once and afterwards receive only small
+(block, offset, shape, strides) descriptors, so no field data is pickled or
+copied between processes. Selected with shm_workers in para.py or
+`tarang_linux --workers N`; no MPI installation is needed.
+"""
+
+import atexit
+import importlib
+import multiprocessing as mp
+import traceback
+from multiprocessing import shared_memory
+import numpy as np
+from tarang_engine import kernels
+from tarang_engine.fft import SerialFFT
+from tarang_engine.timers import timed_transform
+
+
+class SharedArena:
+    """Allocator placing numpy arrays in shared memory blocks it can later identify"""
+
+    def __init__(self):
+        self._blocks = []
+
+    def zeros(self, shape, dtype):
+        """Zeroed array backed by a new shared memory block"""
+        dtype = np.dtype(dtype)
+        nbytes = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        array.fill(0)
+        self._blocks.append((shm, array.ctypes.data, nbytes))
+        return array
+
+    def describe(self, array):
+        """(block name, byte offset, shape, strides, dtype) for an array inside the arena, else None"""
+        if not isinstance(array, np.ndarray):
+            return None
+        address = array.ctypes.data
+        for shm, start, nbytes in self._blocks:
+            if start <= address < start + nbytes:
+                return (shm.name, address - start, array.shape, array.strides, array.dtype.str)
+        return None
+
+    def close(self):
+        """Unlink every block; views still held elsewhere keep their mapping until released"""
+        for shm, _, _ in self._blocks:
+            try:
+                shm.close()
+            except BufferError:
+                pass
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocks = []
+
+
+class _Attached:
+    """Worker-side cache of attached blocks"""
+
+    def __init__(self):
+        self.blocks = {}
+
+    def array(self, desc):
+        name, offset, shape, strides, dtype = desc
+        shm = self.blocks.get(name)
+        if shm is None:
+            shm = shared_memory.SharedMemory(name=name)
+            self.blocks[name] = shm
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset, strides=strides)
+
+
+def _x_slab(array, nx, xs):
+    """Slice an x-split argument; broadcast wavenumber arrays pass through"""
+    if isinstance(array, np.ndarray) and array.ndim >= 3 and array.shape[-3] == nx:
+        return array[..., xs, :, :]
+    return array
+
+
+def _worker_loop(conn):
+    """Serve transform and kernel requests on the worker's share of the grid"""
+    attached = _Attached()
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        op, payload = message
+        try:
+            if op == 'rfft_planes':
+                src, dst, (x0, x1) = payload
+                f, o = attached.array(src)[..., x0:x1, :, :], attached.array(dst)[..., x0:x1, :, :]
+                np.fft.rfft(f, axis=-1, norm='forward', out=o)
+                np.fft.fft(o, axis=-2, norm='forward', out=o)
+            elif op == 'fft_columns':
+                dst, (y0, y1) = payload
+                o = attached.array(dst)[..., y0:y1, :]
+                np.fft.fft(o, axis=-3, norm='forward', out=o)
+            elif op == 'ifft_columns':
+                src, dst, (y0, y1) = payload
+                f, o = attached.array(src)[..., y0:y1, :], attached.array(dst)[..., y0:y1, :]
+                np.fft.ifft(f, axis=-3, norm='forward', out=o)
+            elif op == 'irfft_planes':
+                src, dst, nz, (x0, x1) = payload
+                w, o = attached.array(src)[..., x0:x1, :, :], attached.array(dst)[..., x0:x1, :, :]
+                np.fft.ifft(w, axis=-2, norm='forward', out=w)
+                np.fft.irfft(w, n=nz, axis=-1, norm='forward', out=o)
+            elif op == 'kernel':
+                module, name, args, nx, (x0, x1) = payload
+                xs = slice(x0, x1)
+                arrays = [_x_slab(attached.array(a[1]) if a[0] == 'shared' else a[1], nx, xs) for a in args]
+                getattr(importlib.import_module(module), name)(*arrays)
+            conn.send(None)
+        except Exception:
+            conn.send(traceback.format_exc())
+    for shm in attached.blocks.values():
+        shm.close()
+
+
+class SharedMemoryFFT(SerialFFT):
+    """Serial-layout transforms and kernels executed by a pool of worker processes
+
+    Forward: workers rfft(z) + fft(y) their x-planes, then fft(x) their
+    y-columns; the inverse runs the same stages in reverse. Kernels are
+    split along x. Arrays that are not in the shared arena fall back to the
+    serial path in the main process.
+    """
+
+    def __init__(self, Nx, Ny, Nz, workers):
+        super().__init__(Nx, Ny, Nz)
+        self.nworkers = int(workers)
+        self.arena = SharedArena()
+        self._constants = {}
+        self._scratch = {}
+        ctx = mp.get_context('spawn')
+        self._conns, self._procs = [], []
+        for _ in range(self.nworkers):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_worker_loop, args=(child,), daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+        self._x_ranges = self._ranges(Nx)
+        self._y_ranges = self._ranges(Ny)
+        atexit.register(self.close)
+
+    def describe(self):
+        return f"shared memory, {self.nworkers} worker processes"
+
+    def _ranges(self, n):
+        bounds = np.linspace(0, n, self.nworkers + 1).round().astype(int)
+        return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def _dispatch(self, op, payloads):
+        """Send one request per worker and wait for all of them"""
+        busy = []
+        for conn, payload in zip(self._conns, payloads):
+            if payload is not None:
+                conn.send((op, payload))
+                busy.append(conn)
+        errors = [err for err in (conn.recv() for conn in busy) if err is not None]
+        if errors:
+            raise RuntimeError(f"Shared-memory worker failed in {op}:\n{errors[0]}")
+
+    def allocate(self, shape, dtype):
+        """Zeroed buffer in shared memory"""
+        return self.arena.zeros(shape, dtype)
+
+    def share(self, array):
+        """Shared-memory copy of a constant, made once per array"""
+        key = id(array)
+        entry = self._constants.get(key)
+        if entry is None:
+            copy = self.arena.zeros(array.shape, array.dtype)
+            copy[...] = array
+            entry = (array, copy)
+            self._constants[key] = entry
+        return entry[1]
+
+    def _scratch_like(self, shape, dtype):
+        key = (shape, np.dtype(dtype))
+        buf = self._scratch.get(key)
+        if buf is None:
+            buf = self.arena.zeros(shape, dtype)
+            self._scratch[key] = buf
+        return buf
+
+    @timed_transform
+    def forward(self, field, out=None):
+        """Real field(s) to spectral coefficients"""
+        src, dst = self.arena.describe(field), self.arena.describe(out)
+        if src is None or dst is None:
+            return super().forward(field, out=out)
+        self._dispatch('rfft_planes', [(src, dst, r) for r in self._x_ranges])
+        self._dispatch('fft_columns', [(dst, r) for r in self._y_ranges])
+        return out
+
+    @timed_transform
+    def backward(self, field_k, out=None, work=None):
+        """Spectral coefficients to real field(s); field_k is left untouched"""
+        if out is not None and work is None:
+            work = self._scratch_like(field_k.shape, field_k.dtype)
+        src, dst, tmp = (self.arena.describe(a) for a in (field_k, out, work))
+        if src is None or dst is None or tmp is None:
+            return super().backward(field_k, out=out, work=work)
+        self._dispatch('ifft_columns', [(src, tmp, r) for r in self._y_ranges])
+        self._dispatch('irfft_planes', [(tmp, dst, self.real_shape[-1], r) for r in self._x_ranges])
+        return out
+
+    def execute(self, kernel, *args):
+        """Run an elementwise kernel split along x over the worker pool"""
+        packed = []
+        for a in args:
+            if isinstance(a, np.ndarray):
+                desc = self.arena.describe(a)
+                if desc is None:
+                    return kernel(*args)
+                packed.append(('shared', desc))
+            else:
+                packed.append(('value', a))
+        nx = self.global_shape[0]
+        self._dispatch('kernel', [(kernel.__module__, kernel.__name__, packed, nx, r) for r in self._x_ranges])
+        return args[kernels.OUTPUT_ARG[kernel.__name__]]
+
+    def close(self):
+        """Stop the workers and release the shared memory"""
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+        self._conns, self._procs = [], []
+        self._constants = {}
+        self._scratch = {}
+        self.arena.close()
@@ -0,0 +1,319 @@
+"""
+Time loop driver for the Tarang engine
+Builds the solver from para.py parameters, steps it and reports progress
+"""
+
+import json
+import math
+import os
+import time
+from tarang_engine.checkpoint import checkpoint_path, save_checkpoint
+from tarang_engine.fft import serial_fft
+from tarang_engine.initial import load_initial_field, set_initial_condition
+from tarang_engine.mhd import MHDSolver
+from tarang_engine.output import RealFieldWriter, SnapshotWriter
+from tarang_engine.params import iteration_due, total_steps
+from tarang_engine.probes import ModeProbe, planar_modes
+from tarang_engine.scalar import ConvectionSolver, ScalarSolver
+from tarang_engine.solver import HydroSolver
+from tarang_engine.spectra import SpectrumWriter
+from tarang_engine.timers import describe, difference, table
+from tarang_engine.twod import VorticitySolver
+
+SOLVERS = {
+    'HYDRO': HydroSolver,
+    'MHD': MHDSolver,
+    'SCALAR': ScalarSolver,
+    'RBC': ConvectionSolver,
+}
+
+# Solvers of dimension = 2 runs
+SOLVERS_2D = {
+    'HYDRO': VorticitySolver,
+}
+
+# report_items() label -> key of the quantity in a JSON progress record
+PROGRESS_KEYS = {
+    'KE': 'energy',
+    'ME': 'magnetic_energy',
+    'Hc': 'cross_helicity',
+    'Ω': 'enstrophy',
+    'Es': 'scalar_energy',
+    'Nu': 'nusselt',
+    'P': 'palinstrophy',
+}
+
+PROGRESS_FORMATS = ('text', 'json')
+
+
+def make_fft(params, comm=None):
+    """FFT plan for the grid: serial, shared-memory worker pool, or distributed over comm"""
+    if int(params.get('dimension', 3)) == 2:
+        if comm is not None or int(params.get('shm_workers') or 0) > 1:
+            raise ValueError("dimension = 2 runs use a single process")
+        return serial_fft((int(params['Nx']), int(params['Ny'])))
+    Nx, Ny, Nz = int(params['Nx']), int(params['Ny']), int(params['Nz'])
+    if comm is None:
+        workers = int(params.get('shm_workers') or 0)
+        if workers > 1:
+            from tarang_engine.sharedmem import SharedMemoryFFT
+            return SharedMemoryFFT(Nx, Ny, Nz, workers)
+        return serial_fft((Nx, Ny, Nz))
+    from tarang_engine.distributed import DistributedFFT
+    return DistributedFFT(Nx, Ny, Nz, comm,
+                          decomposition=params.get('mpi_decomposition', 'slab'),
+                          dims=params.get('mpi_proc_grid'))
+
+
+def make_solver(params, **kwargs):
+    """Instantiate the solver class selected by the para.py 'kind'"""
+    kind = str(params.get('kind', 'HYDRO')).upper()
+    solvers = SOLVERS_2D if int(params.get('dimension', 3)) == 2 else SOLVERS
+    if kind not in solvers:
+        raise ValueError(f"Unsupported kind '{kind}' for dimension = {params.get('dimension', 3)} "
+                         f"(expected one of {', '.join(solvers)})")
+    return solvers[kind](params, **kwargs)
+
+
+class Simulation:
+    """A configured run: solver, initial condition and output cadences"""
+
+    def __init__(self, params, solver=None, comm=None):
+        self.params = params
+        self.solver = solver if solver is not None else make_solver(params, fft=make_fft(params, comm))
+        if solver is None and params.get('INPUT_FROM_FILE', False):
+            load_initial_field(self.solver, params)
+        elif solver is None and params.get('INPUT_SET_CASE', True):
+            set_initial_condition(self.solver, params)
+        self.dt = float(params['dt'])
+        self.t_final = float(params['t_final'])
+        self.t_eps = float(params.get('t_eps', 1e-8))
+        self.fixed_dt = bool(params.get('FIXED_DT', True))
+        self.progress_format = str(params.get('PROGRESS_FORMAT', 'text')).lower()
+        if self.progress_format not in PROGRESS_FORMATS:
+            raise ValueError(f"Unsupported PROGRESS_FORMAT '{params.get('PROGRESS_FORMAT')}' "
+                             f"(expected one of {', '.join(PROGRESS_FORMATS)})")
+        # With adaptive dt this is only the count at the maximum dt
+        self.nsteps = total_steps(params)
+        # Index of this run in an ensemble, which labels its progress output
+        self.member = None
+
+    def report(self, steps_per_sec, phases=None):
+        """Print the global diagnostics, and the phase times per step over the last interval if given"""
+        s = self.solver
+        if self.progress_format == 'json':
+            record = {'event': 'progress', 'step': s.step_count, 'nsteps': self.nsteps if self.fixed_dt else None,
+                      't': s.t, 'dt': s.dt}
+            if self.member is not None:
+                record['member'] = self.member
+            record.update((PROGRESS_KEYS.get(label, label), value) for label, value in s.report_items())
+            record.update(u_max=s.max_velocity(), cfl=s.cfl(s.dt), steps_per_sec=steps_per_sec,
+                          eta_sec=self.eta(steps_per_sec))
+            if phases is not None:
+                record['phase_ms_per_step'] = {name: 1e3 * value for name, value in phases.items()}
+            emit_record(record)
+            return
+        count = f"{s.step_count:4d}/{self.nsteps}" if self.fixed_dt else f"{s.step_count:4d}"
+        values = ''.join(f"{label}={value:.6e} | " for label, value in s.report_items())
+        label = f"Member {self.member:3d} | " if self.member is not None else ''
+        print(f"{label}Step {count}: t={s.t:.4f} | dt={s.dt:.3e} | {values}"
+              f"|u|_max={s.max_velocity():.4f} | CFL={s.cfl(s.dt):.3f} | "
+              f"{steps_per_sec:.2f} steps/s")
+        if phases is not None:
+            print(f"Phases: {describe(phases, 1)}")
+
+    def announce(self, message, event, **fields):
+        """Print message, or in JSON mode the record {'event': event, **fields}"""
+        if self.progress_format == 'json':
+            if self.member is not None:
+                fields = dict(fields, member=self.member)
+            emit_record(dict(event=event, **fields))
+        elif self.member is not None:
+            print(f"Member {self.member:3d} | {message}")
+        else:
+            print(message)
+
+    def eta(self, steps_per_sec):
+        """Seconds to t_final at steps_per_sec, assuming the current dt holds for an adaptive run"""
+        s = self.solver
+        if steps_per_sec <= 0:
+            return None
+        if self.fixed_dt:
+            return max(self.nsteps - s.step_count, 0) / steps_per_sec
+        return max(self.t_final - s.t, 0.0) / (s.dt * steps_per_sec) if s.dt > 0 else None
+
+    def run(self):
+        """Advance the solver from t_initial to t_final"""
+        p = self.params
+        solver = self.solver
+        print_start = p.get('iter_glob_energy_print_start', 0)
+        print_inter = p.get('iter_glob_energy_print_inter', 1)
+        outputs = RunOutputs(self)
+
+        timers = solver.timers
+        print_phases = bool(p.get('PRINT_PHASE_TIMES', True))
+        timers.reset()
+        start = time.perf_counter()
+        first_step = solver.step_count
+        last_time, last_step = start, first_step
+        last_phases = timers.snapshot()
+        try:
+            while solver.t < self.t_final - self.t_eps:
+                step = solver.step_count
+                if iteration_due(step, print_start, print_inter):
+                    now = time.perf_counter()
+                    rate = (step - last_step) / (now - last_time) if step > last_step else 0.0
+                    interval = None
+                    if print_phases and step > last_step:
+                        phases = timers.snapshot()
+                        interval = {name: value / (step - last_step)
+                                    for name, value in difference(phases, last_phases).items()}
+                        last_phases = phases
+                    with timers.phase('diagnostics'):
+                        self.report(rate, interval)
+                    last_time, last_step = now, step
+                outputs.record(step, first_step)
+                remaining = self.t_final - solver.t
+                solver.step(self.dt if self.dt <= remaining + self.t_eps else remaining)
+            # The loop records before each step, so the state at t_final is still due
+            outputs.record(solver.step_count, first_step, final=True)
+        finally:
+            outputs.close()
+
+        elapsed = time.perf_counter() - start
+        outputs.finish(first_step)
+        self.steps_taken = solver.step_count - first_step
+        self.elapsed = elapsed
+        self.steps_per_sec = self.steps_taken / elapsed if elapsed > 0 else 0.0
+        self.phase_seconds = timers.snapshot()
+        self.report(self.steps_per_sec)
+        return self.summary()
+
+    def summary(self):
+        """Throughput summary of the completed run"""
+        s = self.solver
+        ns_per_point = 1e9 / (self.steps_per_sec * s.grid_points) if self.steps_per_sec > 0 else 0.0
+        summary = {
+            'steps': self.steps_taken,
+            'elapsed': self.elapsed,
+            'steps_per_sec': self.steps_per_sec,
+            'ns_per_point_step': ns_per_point,
+            'energy': s.energy(),
+            'phase_seconds': self.phase_seconds,
+        }
+        if self.progress_format == 'json':
+            emit_record(dict(event='summary', t=s.t, **summary))
+            return summary
+        print(f"Completed {self.steps_taken} steps in {self.elapsed:.3f}s | "
+              f"{self.steps_per_sec:.2f} steps/s | {ns_per_point:.2f} ns/point/step")
+        if self.params.get('PRINT_PHASE_TIMES', True):
+            print(table(self.phase_seconds, self.steps_taken))
+        return summary
+
+
+class RunOutputs:
+    """Field snapshots, spectra, mode probes and checkpoints of a Simulation at their para.py cadences"""
+
+    def __init__(self, simulation):
+        self.simulation = simulation
+        p = simulation.params
+        solver = self.solver = simulation.solver
+        output_dir = p.get('output_dir', '')
+        self.save = (p.get('iter_field_save_start', 0), p.get('iter_field_save_inter', 0))
+        self.ckpt = (p.get('iter_checkpoint_save_start', 0), p.get('iter_checkpoint_save_inter', 0))
+        self.ek = (p.get('iter_ekTk_save_start', 0), p.get('iter_ekTk_save_inter', 0))
+        self.modes = (p.get('iter_modes_save_start', 0), p.get('iter_modes_save_inter', 0))
+        self.writer = None
+        self.derived = solver.derived_outputs()
+        if int(self.save[1]) > 0:
+            for names, _ in self.derived:
+                if len(names) > len(solver.fft_work):
+                    raise ValueError(f"Derived output {names} does not fit the fft_work scratch")
+            self.writer = SnapshotWriter(output_dir, solver.fft, solver.field_names, solver.state.shape,
+                                         solver.state.dtype, depth=p.get('field_save_buffers', 2),
+                                         work=solver.fft_work)
+        self.real_writer = None
+        if int(self.save[1]) > 0 and p.get('OUTPUT_REAL_FIELD', False):
+            self.real_writer = RealFieldWriter(output_dir, solver, self.derived)
+        self.ckpt_path = checkpoint_path(output_dir, solver.fft)
+        self.spectra = None
+        if int(self.ek[1]) > 0:
+            self.spectra = SpectrumWriter(os.path.join(output_dir or '.', 'spectrum.h5'),
+                                          solver.spectrum_shapes(), solver.ops.nshells, solver.ops.kmin,
+                                          enabled=solver.fft.rank == 0)
+        self.probe = None
+        modes = planar_modes(p.get('modes_save') or (), len(solver.fft.global_shape))
+        if int(self.modes[1]) > 0 and len(modes) > 0:
+            self.probe = ModeProbe(os.path.join(output_dir or '.', 'modes.h5'), modes,
+                                   solver.state, solver.fft, block=p.get('modes_buffer', 1024))
+
+    def due(self, step, first_step, final=False):
+        """Whether record() has anything to do at this step"""
+        return ((self.writer is not None and iteration_due(step, *self.save))
+                or (self.spectra is not None and iteration_due(step, *self.ek))
+                or (self.probe is not None and iteration_due(step, *self.modes))
+                or (not final and step > first_step and iteration_due(step, *self.ckpt)))
+
+    def record(self, step, first_step, final=False):
+        """Write whatever is due at this step
+
+        final marks the state at t_final, reached after the last step; its
+        checkpoint is left to finish().
+        """
+        solver, timers = self.solver, self.solver.timers
+        if self.writer is not None and iteration_due(step, *self.save):
+            self.simulation.announce(f"Checkpoint: Writing field data at t={solver.t:.4f}", 'field_save',
+                                     step=step, t=solver.t)
+            with timers.phase('io'):
+                self.writer.submit(solver.state, step, solver.t, self.derived)
+                if self.real_writer is not None:
+                    self.real_writer.write(step, solver.t)
+        if self.spectra is not None and iteration_due(step, *self.ek):
+            with timers.phase('diagnostics'):
+                self.spectra.append(solver.t, step, solver.spectra())
+        if self.probe is not None and iteration_due(step, *self.modes):
+            with timers.phase('diagnostics'):
+                self.probe.sample(solver.t, step)
+        # A restart does not rewrite the checkpoint it started from
+        if not final and step > first_step and iteration_due(step, *self.ckpt):
+            with timers.phase('io'):
+                save_checkpoint(solver, self.ckpt_path)
+
+    def close(self):
+        """Flush and close every output file"""
+        with self.solver.timers.phase('io'):
+            for output in (self.writer, self.spectra, self.probe):
+                if output is not None:
+                    output.close()
+
+    def finish(self, first_step):
+        """Final checkpoint and output summary once the time loop is done"""
+        solver = self.solver
+        if int(self.ckpt[1]) > 0 and solver.step_count > first_step:
+            with solver.timers.phase('io'):
+                save_checkpoint(solver, self.ckpt_path)
+            self.simulation.announce(f"Checkpoint: state at t={solver.t:.4f} saved to {self.ckpt_path}",
+                                     'checkpoint', step=solver.step_count, t=solver.t, path=self.ckpt_path)
+        if self.writer is not None:
+            self.simulation.announce(f"Field output: {self.writer.describe()}", 'field_output',
+                                     detail=self.writer.describe())
+        if self.real_writer is not None:
+            self.simulation.announce(f"Real-space output: {self.real_writer.describe()}", 'field_output',
+                                     detail=self.real_writer.describe())
+
+
+def finite(value):
+    """value for a JSON record: NaN and inf become null, numpy scalars plain floats"""
+    if isinstance(value, dict):
+        return {k: finite(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [finite(v) for v in value]
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def emit_record(record):
+    """Print record as one compact JSON line, flushed so a reading pipe sees it at once"""
+    print(json.dumps(finite(record), separators=(',', ':')), flush=True)
@@ -0,0 +1,276 @@
+"""
+Pseudo-spectral Navier-Stokes solver
+Incompressible flow in a triply periodic box, rotational form with 2/3 dealiasing
+"""
+
+import numpy as np
+from tarang_engine import kernels
+from tarang_engine.fft import serial_fft
+from tarang_engine.forcing import make_forcing
+from tarang_engine.integrators import make_integrator
+from tarang_engine.operators import get_operators
+from tarang_engine.params import resolve_dtypes
+from tarang_engine.spectra import ShellTransfer, energy_flux, shell_spectrum, transfer_spectra
+from tarang_engine.timers import PhaseTimers
+from tarang_engine.workspace import Workspace
+
+
+class HydroSolver:
+    """Incompressible Navier-Stokes solver on a real-to-complex spectral grid
+
+    All field arithmetic in the time loop is done in place on buffers from
+    self.workspace, so stepping allocates no field-sized arrays.
+    """
+
+    kind = 'HYDRO'
+    # Component slices of the state and the dissipation operator damping them
+    linear_groups = ((slice(0, 3), 'u'),)
+    # Dataset names of the state components in field snapshots
+    field_names = ('Vx', 'Vy', 'Vz')
+    # Shell spectra written at the iter_ekTk_save cadence
+    spectrum_names = ('Ek', 'Tk', 'Pik')
+    # input_case 'custom' selects this initial condition
+    default_case = 'taylor_green'
+    dimension = 3
+    # Energy of a state mode per |f|^2 / 2 (the 2D vorticity carries 1/k^2)
+    energy_metric = 1.0
+
+    def __init__(self, params, fft=None):
+        """Set up wavenumbers, masks and the workspace buffers"""
+        self.params = params
+        shape = tuple(int(params[name]) for name in ('Nx', 'Ny', 'Nz')[:self.dimension])
+        self.fft = fft if fft is not None else serial_fft(shape)
+        self.timers = PhaseTimers()
+        self.fft.timers = self.timers
+        self.real_dtype, self.complex_dtype = resolve_dtypes(params)
+        # Elementwise kernels: tarang_engine.kernels, or its fused Numba twin
+        self.kernels = kernels.load_backend(params.get('kernel_backend', 'numpy'))
+
+        self.ops = get_operators(params, self.fft, self.real_dtype)
+        share = self.fft.share
+        self.kx, self.ky, self.kz = share(self.ops.kx), share(self.ops.ky), share(self.ops.kz)
+        self.k2, self.inv_k2 = self.ops.k2, share(self.ops.inv_k2)
+        self.dealias = share(self.ops.dealias)
+        self.mode_weight = self.ops.mode_weight
+        # Coriolis term in rhs() unless the integrating factors carry the rotation
+        self.explicit_rotation = self.ops.rotating and not self.ops.exact_rotation
+        if self.explicit_rotation:
+            self.khat, self.coriolis_rate = share(self.ops.khat), share(self.ops.coriolis_rate)
+            self.rotation_rate = float(np.abs(self.ops.coriolis_rate).max())
+
+        L = [float(v) for v in params['L']][:self.dimension]
+        self.grid_points = int(np.prod(shape))
+        self.dx = tuple(Li / Ni for Li, Ni in zip(L, shape))
+
+        # A batched ensemble (see ensemble.py) puts its members on an axis in front of the grid
+        self.members = int(params.get('ensemble_members') or 1)
+        self.member_shape = (self.members,) if params.get('ensemble_members') else ()
+        self.workspace = Workspace(self.member_shape + self.fft.real_shape, self.member_shape + self.fft.spectral_shape,
+                                   self.real_dtype, self.complex_dtype, allocator=self.fft.allocate)
+        self.allocate()
+        self.integrator = make_integrator(self, params)
+        self.shell_transfer = None
+        if params.get('SHELL_TRANSFER', False):
+            self.shell_transfer = ShellTransfer(self, params.get('transfer_shell_edges'),
+                                                params.get('transfer_batch', 1))
+
+        self.forcing = make_forcing(self, params)
+
+        self.t = float(params.get('t_initial', 0.0))
+        self.dt = float(params['dt'])
+        self.step_count = 0
+        self.rng = self.make_rng(params.get('random_seed', 0))
+        # Forcing streams, one per ensemble member
+        self.rngs = [self.rng]
+
+    def make_rng(self, seed):
+        """Random stream for seed, the same on every rank so draws of global arrays agree"""
+        return np.random.default_rng(seed)
+
+    def allocate(self):
+        """Request every buffer the time loop needs from the workspace"""
+        ws = self.workspace
+        self.uk = ws.spectral('uk', 3)
+        self.state = self.uk
+        # u and omega are transformed together as one batch of six
+        self.uwk = ws.spectral('uwk', 6)
+        self.uw = ws.real('uw', 6)
+        self.u = self.uw[:3]
+        self.w = self.uw[3:]
+        self.cross = ws.real('cross', 3)
+        self.nk = ws.spectral('nk', 3)
+        self.fft_work = ws.spectral('fft_work', 6)
+        self.rtmp = ws.real('rtmp')
+        self.ctmp = ws.spectral('ctmp')
+        self.ctmp2 = ws.spectral('ctmp2')
+        self.mode_buf = ws.spectral_real('mode_energy')
+        self.mode_tmp = ws.spectral_real('mode_tmp')
+
+    def grid(self):
+        """Real-space coordinates of the local block, broadcast-shaped"""
+        shape, offset = self.fft.real_shape, self.fft.real_offset
+        coords = []
+        for axis, (n, n0, d) in enumerate(zip(shape, offset, self.dx)):
+            index_shape = [1] * len(shape)
+            index_shape[axis] = -1
+            coords.append((n0 + np.arange(n)).reshape(index_shape) * d)
+        return tuple(coords)
+
+    def project(self, fk):
+        """Remove the compressive part of a spectral vector field in place"""
+        return self.fft.execute(self.kernels.project, self.kx, self.ky, self.kz, self.inv_k2,
+                                fk, self.ctmp, self.ctmp2)
+
+    def curl(self, fk, out):
+        """Spectral curl i k x f written into out"""
+        return self.fft.execute(self.kernels.curl, self.kx, self.ky, self.kz, fk, out, self.ctmp)
+
+    def cross_product(self, a, b, out):
+        """Real-space a x b written into out"""
+        return self.fft.execute(self.kernels.cross, a, b, out, self.rtmp)
+
+    def nonlinear(self, uk, out):
+        """Dealiased, projected u x omega written into out, with u left in self.u"""
+        np.copyto(self.uwk[:3], uk)
+        self.curl(uk, self.uwk[3:])
+        self.fft.backward(self.uwk, out=self.uw, work=self.fft_work)
+        self.cross_product(self.u, self.w, self.cross)
+        self.fft.forward(self.cross, out=out)
+        self.fft.execute(self.kernels.multiply, out, self.dealias)
+        return self.project(out)
+
+    def rhs(self, uk, out):
+        """Explicit part of du/dt written into out
+
+        Dissipation is left out: the time schemes apply it exactly through
+        the cached integrating factor exp(-D(k) dt), as they do the Coriolis
+        term unless ROTATION_INTEGRATING_FACTOR is False.
+        """
+        with self.timers.phase('nonlinear'):
+            self.nonlinear(uk, out)
+            if self.explicit_rotation:
+                self.fft.execute(self.kernels.coriolis, self.khat, self.coriolis_rate, uk[:3], out[:3],
+                                 self.ctmp, self.ctmp2)
+        return out
+
+    def step(self, dt):
+        """Advance one step of at most dt and return the dt taken"""
+        with self.timers.phase('integrator'):
+            dt = self.integrator.step(dt)
+        if self.forcing is not None:
+            with self.timers.phase('forcing'):
+                self.forcing.apply(dt)
+        self.t += dt
+        self.dt = dt
+        self.step_count += 1
+        return dt
+
+    def update_real(self):
+        """Refresh the real-space velocity from the spectral state"""
+        self.fft.backward(self.uk, out=self.u, work=self.fft_work[:3])
+
+    def set_velocity(self, u):
+        """Initialise from a real-space velocity field"""
+        self.fft.forward(np.asarray(u, dtype=self.real_dtype), out=self.uk)
+        self.uk *= self.dealias
+        self.project(self.uk)
+        self.update_real()
+
+    def set_state(self, fields):
+        """Initialise every state component from real-space fields, projecting the vector fields"""
+        self.fft.forward(np.asarray(fields, dtype=self.real_dtype), out=self.state)
+        self.condition_state()
+
+    def condition_state(self):
+        """Dealias a freshly set spectral state, project its vector fields and refresh real space"""
+        self.state *= self.dealias
+        for sl, _ in self.linear_groups:
+            if sl.stop - sl.start == 3:
+                self.project(self.state[sl])
+        self.update_real()
+
+    def modal_energy(self, fk, out):
+        """Per-mode sum of |f_i|^2 over components, weighted for the half spectrum"""
+        return self.kernels.modal_energy(fk, self.mode_weight, out, self.mode_tmp)
+
+    def energy_sum(self, fk, extra=None):
+        """Global sum of the modal energy of fk, times a per-mode extra weight if given"""
+        return self.fft.sum(self.kernels.energy_sum(fk, self.mode_weight, extra, self.mode_buf, self.mode_tmp))
+
+    def field_energy(self, fk):
+        """Energy <|f|^2>/2 of one field of the state"""
+        return 0.5 * self.energy_sum(fk)
+
+    def energy(self):
+        """Kinetic energy <|u|^2>/2"""
+        return self.field_energy(self.uk)
+
+    def enstrophy(self):
+        """Enstrophy <|omega|^2>/2"""
+        return 0.5 * self.energy_sum(self.uk, self.k2)
+
+    def vorticity(self, out):
+        """Spectral vorticity i k x u written into out"""
+        return self.curl(self.uk, out)
+
+    def vector_potential(self, out):
+        """Spectral vector potential A of the velocity (curl A = u, div A = 0) written into out"""
+        self.curl(self.uk, out)
+        out *= self.inv_k2
+        return out
+
+    def derived_outputs(self):
+        """(dataset names, compute(out)) for the derived fields SAVE_VORTICITY / SAVE_VECPOT request
+
+        The writers call compute on the fft_work scratch at save steps
+        only, so derived fields are never kept between saves.
+        """
+        outputs = []
+        if self.params.get('SAVE_VORTICITY', False):
+            outputs.append((('Wx', 'Wy', 'Wz'), self.vorticity))
+        if self.params.get('SAVE_VECPOT', False):
+            outputs.append((('Ax', 'Ay', 'Az'), self.vector_potential))
+        return outputs
+
+    def report_items(self):
+        """(label, value) pairs for the progress line"""
+        return [('KE', self.energy()), ('Ω', self.enstrophy())]
+
+    def spectra(self):
+        """Shell-averaged spectra named by spectrum_names, plus 'Tnm' with SHELL_TRANSFER"""
+        transfer, = transfer_spectra(self)
+        out = {'Ek': shell_spectrum(self, self.uk), 'Tk': transfer, 'Pik': energy_flux(transfer)}
+        if self.shell_transfer is not None:
+            out['Tnm'] = self.shell_transfer.compute()
+        return out
+
+    def spectrum_shapes(self):
+        """Row shape of every dataset spectra() returns"""
+        shapes = {name: self.ops.nshells for name in self.spectrum_names}
+        if self.shell_transfer is not None:
+            shapes['Tnm'] = (self.shell_transfer.nbands,) * 2
+        return shapes
+
+    def velocity_peaks(self):
+        """Largest |u_i| per component: one vectorised max and min over all three"""
+        u = self.u.reshape(3, -1)
+        return np.maximum(u.max(axis=1), -u.min(axis=1))
+
+    def max_velocity(self):
+        """Largest |u_i| over the grid, from the last nonlinear evaluation"""
+        return self.fft.max(float(self.velocity_peaks().max()))
+
+    def cfl_rate(self):
+        """max_i |u_i|/dx_i, the Courant number per unit time step
+
+        An explicit Coriolis term also bounds it by the largest inertial
+        wave frequency 2 |Omega|.
+        """
+        rate = self.fft.max(float((self.velocity_peaks() / self.dx).max()))
+        if self.explicit_rotation:
+            rate = max(rate, self.rotation_rate)
+        return rate
+
+    def cfl(self, dt):
+        """Advective Courant number for the time step dt"""
+        return self.cfl_rate() * dt
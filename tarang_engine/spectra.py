@@ -0,0 +1,195 @@
+"""
+Shell-averaged spectra for the Tarang engine
+E(k), T(k), flux and shell-to-shell transfer by np.bincount over precomputed shell indices, appended to HDF5
+"""
+
+import os
+import numpy as np
+
+
+def shell_spectrum(solver, fk, out=None):
+    """Shell sums of |f(k)|^2 / 2 for a spectral vector field, reduced over ranks
+
+    The per-mode energies go through the solver's mode buffer and are binned
+    in a single bincount pass, so the cost is one sweep over the local
+    modes whatever the number of shells.
+    """
+    e = solver.modal_energy(fk, solver.mode_buf)
+    ops = solver.ops
+    spectrum = np.bincount(ops.shell.ravel(), weights=e.ravel(), minlength=ops.nshells)
+    spectrum *= 0.5
+    spectrum = solver.fft.sum(spectrum)
+    if out is not None:
+        out[...] = spectrum
+        return out
+    return spectrum
+
+
+def modal_product(solver, a, b, out):
+    """Per-mode Re(a* . b) summed over components, weighted for the half spectrum"""
+    tmp = solver.mode_tmp
+    out[...] = 0
+    for i in range(len(a)):
+        np.multiply(a[i].real, b[i].real, out=tmp)
+        out += tmp
+        np.multiply(a[i].imag, b[i].imag, out=tmp)
+        out += tmp
+    out *= solver.mode_weight
+    return out
+
+
+def transfer_spectra(solver):
+    """Nonlinear transfer T(k) into every shell, one array per linear group of the state
+
+    Costs one extra nonlinear evaluation whatever the number of fields.
+    """
+    state = solver.state
+    nk = solver.nonlinear(state, solver.nk)
+    ops = solver.ops
+    spectra = []
+    for sl, _ in solver.linear_groups:
+        t = modal_product(solver, state[sl], nk[sl], solver.mode_buf)
+        spectra.append(solver.fft.sum(np.bincount(ops.shell.ravel(), weights=t.ravel(), minlength=ops.nshells)))
+    return spectra
+
+
+def energy_flux(transfer):
+    """Flux Pi(k) through the sphere of radius k: -sum of T(k') for k' <= k"""
+    return -np.cumsum(transfer)
+
+
+def band_edges(nshells, edges=None):
+    """Shell band boundaries for the transfer matrix: powers of two unless given"""
+    if edges is None:
+        edges = [0, 1]
+        while edges[-1] < nshells:
+            edges.append(2 * edges[-1])
+    edges = [int(e) for e in edges]
+    if edges[-1] < nshells:
+        edges.append(nshells)
+    return edges
+
+
+class ShellTransfer:
+    """Shell-to-shell energy transfer T(n, m) from giver band m to receiver band n
+
+    T(n, m) = -sum over modes of band n of Re(u* . [(u . grad) u^m]), with
+    u^m the velocity filtered to band m. The gradients of `batch` filtered
+    fields are inverse transformed as one batch of 9*batch fields and the
+    advection terms forward transformed as one batch of 3*batch, so the
+    whole matrix costs about 12 * nbands / 9 nonlinear evaluations' worth
+    of FFTs, in ceil(nbands / batch) transform calls per direction.
+
+    The class holds 9*batch spectral and 9*batch real fields, three times
+    the velocity state's memory per batch member: the spectral gradients
+    double as the inverse transform's work array, and the advection terms
+    and their transforms reuse the front of the gradient buffers.
+    """
+
+    def __init__(self, solver, edges=None, batch=1):
+        self.solver = solver
+        ops = solver.ops
+        self.edges = band_edges(ops.nshells, edges)
+        self.nbands = len(self.edges) - 1
+        band = np.searchsorted(self.edges, ops.shell, side='right') - 1
+        self.band = np.clip(band, 0, self.nbands - 1).astype(np.intp)
+        # One band mask, rebuilt from self.band for each giver in turn
+        self.mask = np.empty(self.band.shape, dtype=bool)
+        self.batch = max(1, min(int(batch), self.nbands))
+        ws = solver.workspace
+        self.grad_k = ws.spectral('transfer_grad_k', 9 * self.batch)
+        self.grad = ws.real('transfer_grad', 9 * self.batch)
+
+    def compute(self):
+        """(nbands, nbands) transfer matrix, rows receiving and columns giving"""
+        s = self.solver
+        # Full real-space velocity of the current state
+        s.update_real()
+        k = (s.kx, s.ky, s.kz)
+        matrix = np.zeros((self.nbands, self.nbands))
+        for m0 in range(0, self.nbands, self.batch):
+            givers = range(m0, min(m0 + self.batch, self.nbands))
+            n = len(givers)
+            grad_k = self.grad_k[:9 * n].reshape((n, 3, 3) + s.uk.shape[1:])
+            for b, m in enumerate(givers):
+                mask = np.equal(self.band, m, out=self.mask)
+                for i in range(3):
+                    for j in range(3):
+                        g = grad_k[b, i, j]
+                        np.multiply(s.uk[i], k[j], out=g)
+                        g *= mask
+                        g *= 1j
+            s.fft.backward(self.grad_k[:9 * n], out=self.grad[:9 * n], work=self.grad_k[:9 * n])
+            grad = self.grad[:9 * n].reshape((n, 3, 3) + s.u.shape[1:])
+            # adv[b, i] lands at or before the gradients of (b, i), once they are used
+            adv = self.grad[:3 * n].reshape((n, 3) + s.u.shape[1:])
+            for b in range(n):
+                for i in range(3):
+                    g = grad[b, i]
+                    g[0] *= s.u[0]
+                    for j in (1, 2):
+                        np.multiply(s.u[j], g[j], out=s.rtmp)
+                        g[0] += s.rtmp
+                    adv[b, i] = g[0]
+            adv_k = s.fft.forward(self.grad[:3 * n], out=self.grad_k[:3 * n])
+            adv_k *= s.dealias
+            adv_k = adv_k.reshape((n, 3) + s.uk.shape[1:])
+            for b, m in enumerate(givers):
+                t = modal_product(s, s.uk, adv_k[b], s.mode_buf)
+                matrix[:, m] = -np.bincount(self.band.ravel(), weights=t.ravel(), minlength=self.nbands)
+        return s.fft.sum(matrix)
+
+
+class SpectrumWriter:
+    """Appends one row per save to extendable HDF5 datasets
+
+    The file holds 't' and 'step' of length nsaves and one (nsaves, *shape)
+    dataset per entry of the name -> row shape mapping; an int shape means
+    that many shells. Every append is flushed so the file can be read while
+    the run is going. Only rank 0 of a distributed run writes.
+    """
+
+    def __init__(self, path, shapes, nshells, kmin=1.0, enabled=True):
+        self.path = path
+        self.shapes = {name: (shape,) if isinstance(shape, int) else tuple(shape)
+                       for name, shape in shapes.items()}
+        self.names = tuple(self.shapes)
+        self.nshells = int(nshells)
+        self.file = None
+        if not enabled:
+            return
+        import h5py
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = h5py.File(path, 'a')
+        f = self.file
+        if 'k' not in f:
+            f.create_dataset('k', data=np.arange(self.nshells) * kmin)
+            f.create_dataset('t', shape=(0,), maxshape=(None,), dtype='f8', chunks=(256,))
+            f.create_dataset('step', shape=(0,), maxshape=(None,), dtype='i8', chunks=(256,))
+        for name, shape in self.shapes.items():
+            if name not in f:
+                f.create_dataset(name, shape=(0,) + shape, maxshape=(None,) + shape,
+                                 dtype='f8', chunks=(16,) + shape)
+            elif f[name].shape[1:] != shape:
+                raise ValueError(f"{path}: '{name}' rows are {f[name].shape[1:]}, this run writes {shape}")
+
+    def append(self, t, step, spectra):
+        """Add one row for every spectrum in the name -> array mapping"""
+        if self.file is None:
+            return
+        f = self.file
+        row = f['t'].shape[0]
+        for name in ('t', 'step') + self.names:
+            f[name].resize(row + 1, axis=0)
+        f['t'][row] = t
+        f['step'][row] = step
+        for name in self.names:
+            f[name][row] = spectra[name]
+        f.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,103 @@
+"""
+Per-phase timers for the Tarang engine
+Exclusive wall time of the FFTs, nonlinear term, integrator, forcing, diagnostics and I/O
+
+Phases nest: time spent in an FFT inside the nonlinear term is charged to
+'fft' only, and whatever runs outside every phase is charged to 'other'.
+Each transition costs one time.perf_counter() call, so the timers stay on
+in production runs.
+"""
+
+import functools
+import time
+
+PHASES = ('fft', 'nonlinear', 'integrator', 'forcing', 'diagnostics', 'io', 'other')
+
+
+class _Phase:
+    __slots__ = ('timers', 'name')
+
+    def __init__(self, timers, name):
+        self.timers = timers
+        self.name = name
+
+    def __enter__(self):
+        self.timers.push(self.name)
+
+    def __exit__(self, *exc):
+        self.timers.pop()
+
+
+class PhaseTimers:
+    """Exclusive seconds per phase, accumulated from construction or the last reset()"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self._stack = ['other']
+        self._mark = time.perf_counter()
+
+    def push(self, name):
+        now = time.perf_counter()
+        self.totals[self._stack[-1]] += now - self._mark
+        self._mark = now
+        self._stack.append(name)
+
+    def pop(self):
+        now = time.perf_counter()
+        self.totals[self._stack.pop()] += now - self._mark
+        self._mark = now
+
+    def phase(self, name):
+        """Context manager charging its body to phase name"""
+        return _Phase(self, name)
+
+    def snapshot(self):
+        """Totals so far, including the phase currently running"""
+        now = time.perf_counter()
+        self.totals[self._stack[-1]] += now - self._mark
+        self._mark = now
+        return dict(self.totals)
+
+
+def difference(after, before):
+    """Per-phase seconds between two snapshots"""
+    return {name: after[name] - before.get(name, 0.0) for name in after}
+
+
+def describe(seconds, steps):
+    """One line: ms per step and the share of every phase that took any time"""
+    total = sum(seconds.values())
+    if total <= 0:
+        return "no time recorded"
+    shares = ' | '.join(f"{name} {value / total:.1%}" for name, value in seconds.items() if value / total >= 0.0005)
+    per_step = f"{1e3 * total / steps:.2f} ms/step | " if steps > 0 else ''
+    return per_step + shares
+
+
+def table(seconds, steps):
+    """Multi-line breakdown for the end of a run"""
+    total = sum(seconds.values())
+    lines = [f"{'phase':>12} {'seconds':>10} {'ms/step':>9} {'share':>7}"]
+    for name, value in seconds.items():
+        per_step = 1e3 * value / steps if steps > 0 else 0.0
+        share = value / total if total > 0 else 0.0
+        lines.append(f"{name:>12} {value:10.3f} {per_step:9.3f} {share:7.1%}")
+    return '\n'.join(lines)
+
+
+def timed_transform(method):
+    """Charge an FFT plan method to the 'fft' phase of the plan's timers, when it has any"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        timers = self.timers
+        if timers is None:
+            return method(self, *args, **kwargs)
+        timers.push('fft')
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            timers.pop()
+    return wrapper
@@ -0,0 +1,163 @@
+"""
+Two-dimensional Navier-Stokes solver
+Vorticity-streamfunction form on 2D real-to-complex transforms, for dimension = 2 runs
+"""
+
+import numpy as np
+from tarang_engine.solver import HydroSolver
+from tarang_engine.spectra import energy_flux, modal_product
+
+
+class VorticitySolver(HydroSolver):
+    """Incompressible 2D flow evolved through its scalar vorticity w
+
+        dw/dt = -u . grad w + nu lap w,   u = (d psi/dy, -d psi/dx),   psi = w / k^2
+
+    The state is the single field w on an (Nx, Ny/2+1) spectral grid. u, v,
+    dw/dx and dw/dy go to real space in one batched inverse FFT of four 2D
+    fields and the advection comes back in one forward FFT, against nine 3D
+    transforms of the hydro solver. Energy, enstrophy and palinstrophy are
+    all quadratic in w with weights 1/k^2, 1 and k^2.
+    """
+
+    kind = 'HYDRO'
+    dimension = 2
+    linear_groups = ((slice(0, 1), 'u'),)
+    field_names = ('Wz',)
+    spectrum_names = ('Ek', 'Zk', 'Tk', 'Pik', 'PiZk')
+    default_case = 'random'
+
+    def __init__(self, params, fft=None):
+        if params.get('SHELL_TRANSFER', False):
+            raise ValueError("SHELL_TRANSFER is only implemented for 3D kind='HYDRO'")
+        super().__init__(params, fft=fft)
+
+    @property
+    def energy_metric(self):
+        """A vorticity mode carries |w|^2 / k^2 of energy"""
+        return self.inv_k2
+
+    def allocate(self):
+        """Request every buffer the time loop needs from the workspace"""
+        ws = self.workspace
+        self.state = ws.spectral('state', 1)
+        self.wk = self.state[0]
+        # u, v, dw/dx and dw/dy are transformed together as one batch of four
+        self.gk = ws.spectral('gk', 4)
+        self.g = ws.real('g', 4)
+        self.u = self.g[:2]
+        self.adv = ws.real('adv')
+        self.nk = ws.spectral('nk', 1)
+        self.fft_work = ws.spectral('fft_work', 4)
+        self.rtmp = ws.real('rtmp')
+        self.ctmp = ws.spectral('ctmp')
+        self.mode_buf = ws.spectral_real('mode_energy')
+        self.mode_tmp = ws.spectral_real('mode_tmp')
+
+    def velocity(self, wk, out):
+        """Spectral velocity (i ky psi, -i kx psi) of the vorticity wk written into out[:2]"""
+        psi = np.multiply(wk, self.inv_k2, out=self.ctmp)
+        np.multiply(psi, self.ky, out=out[0])
+        out[0] *= 1j
+        np.multiply(psi, self.kx, out=out[1])
+        out[1] *= -1j
+        return out
+
+    def nonlinear(self, state, out):
+        """Dealiased -u . grad w written into out, with u left in self.u"""
+        wk, gk = state[0], self.gk
+        self.velocity(wk, gk)
+        np.multiply(wk, self.kx, out=gk[2])
+        gk[2] *= 1j
+        np.multiply(wk, self.ky, out=gk[3])
+        gk[3] *= 1j
+        self.fft.backward(gk, out=self.g, work=self.fft_work)
+        g = self.g
+        np.multiply(g[0], g[2], out=self.adv)
+        np.multiply(g[1], g[3], out=self.rtmp)
+        self.adv += self.rtmp
+        self.adv *= -1
+        self.fft.forward(self.adv, out=out[0])
+        out *= self.dealias
+        return out
+
+    def update_real(self):
+        """Refresh the real-space velocity from the spectral vorticity"""
+        self.velocity(self.wk, self.gk)
+        self.fft.backward(self.gk[:2], out=self.u, work=self.fft_work[:2])
+
+    def set_velocity(self, u):
+        """Initialise from a real-space (u, v) field through its vorticity i kx v - i ky u"""
+        uk = self.fft.forward(np.asarray(u, dtype=self.real_dtype), out=self.gk[:2])
+        np.multiply(uk[1], self.kx, out=self.wk)
+        np.multiply(uk[0], self.ky, out=self.ctmp)
+        self.wk -= self.ctmp
+        self.wk *= 1j
+        self.wk *= self.dealias
+        self.update_real()
+
+    def streamfunction(self, out):
+        """Spectral streamfunction w / k^2 written into out"""
+        return np.multiply(self.state, self.inv_k2, out=out)
+
+    def vorticity(self, out):
+        """Spectral vorticity: the state itself"""
+        np.copyto(out, self.state)
+        return out
+
+    def vector_potential(self, out):
+        """Spectral vector potential psi z-hat, stored as its one component"""
+        return self.streamfunction(out)
+
+    def derived_outputs(self):
+        """SAVE_VECPOT adds the streamfunction; the vorticity is the state itself"""
+        if self.params.get('SAVE_VECPOT', False):
+            return [(('Psi',), self.streamfunction)]
+        return []
+
+    def weighted_sum(self, fk, weight):
+        """<|f|^2>/2 with an extra per-mode weight (inv_k2, None or k2)"""
+        return 0.5 * self.energy_sum(fk, weight)
+
+    def field_energy(self, fk):
+        """Kinetic energy <|u|^2>/2 = <|w|^2/k^2>/2 of a vorticity field"""
+        return self.weighted_sum(fk, self.inv_k2)
+
+    def energy(self):
+        """Kinetic energy <|u|^2>/2"""
+        return self.field_energy(self.state)
+
+    def enstrophy(self):
+        """Enstrophy <w^2>/2"""
+        return self.weighted_sum(self.state, None)
+
+    def palinstrophy(self):
+        """Palinstrophy <|grad w|^2>/2"""
+        return self.weighted_sum(self.state, self.k2)
+
+    def report_items(self):
+        """(label, value) pairs for the progress line"""
+        return [('KE', self.energy()), ('Ω', self.enstrophy()), ('P', self.palinstrophy())]
+
+    def shell_sum(self, modal):
+        """Shell sums of a per-mode quantity, reduced over ranks"""
+        ops = self.ops
+        return self.fft.sum(np.bincount(ops.shell.ravel(), weights=modal.ravel(), minlength=ops.nshells))
+
+    def spectra(self):
+        """Energy and enstrophy spectra, energy transfer and the energy and enstrophy fluxes"""
+        z = self.modal_energy(self.state, self.mode_buf)
+        zk = 0.5 * self.shell_sum(z)
+        z *= self.inv_k2
+        ek = 0.5 * self.shell_sum(z)
+        nk = self.nonlinear(self.state, self.nk)
+        t = modal_product(self, self.state, nk, self.mode_buf)
+        tz = self.shell_sum(t)
+        t *= self.inv_k2
+        tk = self.shell_sum(t)
+        return {'Ek': ek, 'Zk': zk, 'Tk': tk, 'Pik': energy_flux(tk), 'PiZk': energy_flux(tz)}
+
+    def velocity_peaks(self):
+        """Largest |u_i| per component"""
+        u = self.u.reshape(2, -1)
+        return np.maximum(u.max(axis=1), -u.min(axis=1))
@@ -0,0 +1,65 @@
+"""
+Workspace arena for the Tarang engine
+Every field-sized buffer the time loop touches is allocated here once, up front
+"""
+
+import numpy as np
+
+
+class Workspace:
+    """Named field buffers for one (real shape, spectral shape, dtype) combination
+
+    Buffers are created on first request and returned as-is afterwards, so a
+    solver that asks for all of its buffers in __init__ allocates nothing
+    inside the time loop. Asking for an existing name with a different
+    layout is a programming error and raises. The allocator comes from the
+    FFT plan, so shared-memory plans get buffers their workers can reach.
+    """
+
+    def __init__(self, real_shape, spectral_shape, real_dtype=np.float64, complex_dtype=np.complex128,
+                 allocator=None):
+        self.allocator = allocator if allocator is not None else np.zeros
+        self.real_shape = tuple(real_shape)
+        self.spectral_shape = tuple(spectral_shape)
+        self.real_dtype = np.dtype(real_dtype)
+        self.complex_dtype = np.dtype(complex_dtype)
+        self._buffers = {}
+
+    def _get(self, name, shape, dtype):
+        """Return the named buffer, allocating it on first use"""
+        buf = self._buffers.get(name)
+        if buf is None:
+            buf = self.allocator(shape, dtype)
+            self._buffers[name] = buf
+        elif buf.shape != shape or buf.dtype != dtype:
+            raise ValueError(f"Workspace buffer '{name}' already exists as {buf.dtype}{buf.shape}, "
+                             f"requested {np.dtype(dtype)}{shape}")
+        return buf
+
+    @staticmethod
+    def _shape(ncomp, base):
+        return base if ncomp is None else (ncomp,) + base
+
+    def real(self, name, ncomp=None):
+        """Real-space buffer with an optional leading component axis"""
+        return self._get(name, self._shape(ncomp, self.real_shape), self.real_dtype)
+
+    def spectral(self, name, ncomp=None):
+        """Complex spectral buffer with an optional leading component axis"""
+        return self._get(name, self._shape(ncomp, self.spectral_shape), self.complex_dtype)
+
+    def spectral_real(self, name, ncomp=None):
+        """Real-valued buffer on the spectral grid (mode energies, masks)"""
+        return self._get(name, self._shape(ncomp, self.spectral_shape), self.real_dtype)
+
+    def __contains__(self, name):
+        return name in self._buffers
+
+    @property
+    def nbytes(self):
+        """Total bytes held by the arena"""
+        return sum(buf.nbytes for buf in self._buffers.values())
+
+    def describe(self):
+        """One line summary of the arena for the run log"""
+        return f"{len(self._buffers)} buffers, {self.nbytes / 2**20:.1f} MiB"
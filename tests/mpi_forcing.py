@@ -0,0 +1,39 @@
+"""
+Forced run under MPI, run by test_mpi.py as mpiexec -n 2 python mpi_forcing.py <decomposition> <kind>
+A distributed forced run matches the same run on one process, whatever the decomposition
+"""
+
+import sys
+import numpy as np
+from mpi4py import MPI
+from tarang_engine.initial import random_field
+from tarang_engine.params import DEFAULT_PARAMETERS
+from tarang_engine.simulation import make_fft, make_solver
+
+
+def main(decomposition, kind):
+    comm = MPI.COMM_WORLD
+    params = dict(DEFAULT_PARAMETERS, kind=kind, Nx=16, Ny=12, Nz=10, mpi_decomposition=decomposition,
+                  random_seed=3, FORCING_ENABLED=True, forcing_range=[2, 3], time_scheme='RK2')
+    if kind == 'MHD':
+        params.update(injection_rate=None, injections=[0.1, 0.05, 0])
+    else:
+        params.update(injection_rate=0.1)
+    solvers = []
+    for fft in (make_fft(params, comm), make_fft(params)):
+        solver = make_solver(params, fft=fft)
+        random_field(solver, 2, 0.5)
+        for _ in range(4):
+            solver.step(1e-3)
+        solvers.append(solver)
+    distributed, serial = solvers
+    block = tuple(slice(o, o + n) for o, n in zip(distributed.fft.real_offset, distributed.fft.real_shape))
+    reference = np.empty_like(serial.rtmp)
+    for c in range(distributed.state.shape[0]):
+        distributed.fft.backward(distributed.state[c].copy(), out=distributed.rtmp)
+        serial.fft.backward(serial.state[c].copy(), out=reference)
+        assert np.allclose(distributed.rtmp, reference[block], rtol=0, atol=1e-12)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,28 @@
+"""
+Real-space field round trip under MPI, run by test_mpi.py as mpiexec -n 2 python mpi_real_fields.py <dir>
+A distributed run writes its final state with OUTPUT_REAL_FIELD and a second one reads it back with INPUT_REAL_FIELD
+"""
+
+import sys
+import numpy as np
+from mpi4py import MPI
+from tarang_engine.params import DEFAULT_PARAMETERS
+from tarang_engine.simulation import Simulation
+
+
+def main(directory):
+    comm = MPI.COMM_WORLD
+    params = dict(DEFAULT_PARAMETERS, kind='MHD', Nx=16, Ny=12, Nz=10, dt=0.01, t_initial=0.0, t_final=0.02,
+                  input_case='random', output_dir=directory, OUTPUT_REAL_FIELD=True,
+                  iter_field_save_start=0, iter_field_save_inter=2, iter_ekTk_save_inter=0,
+                  iter_checkpoint_save_inter=0, iter_glob_energy_print_inter=100, PRINT_PHASE_TIMES=False)
+    writer = Simulation(params, comm=comm)
+    writer.run()
+    reader = Simulation(dict(params, INPUT_SET_CASE=False, INPUT_FROM_FILE=True, INPUT_REAL_FIELD=True,
+                             input_dir=directory, input_file_name='Real_0.020000.h5'), comm=comm)
+    assert reader.solver.step_count == writer.solver.step_count == 2
+    assert np.allclose(reader.solver.state, writer.solver.state, rtol=0, atol=1e-12)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -0,0 +1,20 @@
+"""
+Web app tests
+Progress lines of the engine are parsed into JSON records; needs the web requirements installed
+"""
+
+import pytest
+from tarang_engine.simulation import emit_record
+
+app = pytest.importorskip('app')
+
+
+def test_parse_engine_record(capsys):
+    emit_record({'event': 'progress', 'step': 10, 't': 0.1, 'energy': float('nan')})
+    line = capsys.readouterr().out.strip()
+    assert app.parse_engine_record(line) == {'event': 'progress', 'step': 10, 't': 0.1, 'energy': None}
+
+
+@pytest.mark.parametrize('line', ['Step 10  t = 0.1', '{"event": "progress", "step": ', '{"event"[1]}', ''])
+def test_other_output_is_not_a_record(line):
+    assert app.parse_engine_record(line) is None
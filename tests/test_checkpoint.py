@@ -0,0 +1,44 @@
+"""
+Checkpoint tests
+A saved state maps and loads back exactly, and resamples onto another grid
+"""
+
+import numpy as np
+from tarang_engine.checkpoint import checkpoint_path, load_checkpoint, map_checkpoint, save_checkpoint
+from tarang_engine.initial import random_field
+from tarang_engine.params import DEFAULT_PARAMETERS
+from tarang_engine.simulation import make_solver
+
+
+def advanced_solver(N=16, steps=3):
+    solver = make_solver(dict(DEFAULT_PARAMETERS, kind='MHD', Nx=N, Ny=N, Nz=N, time_scheme='RK2'))
+    random_field(solver, 2, 0.5)
+    for _ in range(steps):
+        solver.step(1e-3)
+    return solver
+
+
+def test_save_map_load_round_trip(tmp_path):
+    saved = advanced_solver()
+    path = save_checkpoint(saved, checkpoint_path(str(tmp_path), saved.fft))
+    header, data = map_checkpoint(path)
+    assert header['step'] == 3 and header['global_shape'] == [16, 16, 16]
+    assert np.array_equal(data, saved.state)
+    del data
+    loaded = advanced_solver(steps=0)
+    load_checkpoint(loaded, path)
+    assert np.array_equal(loaded.state, saved.state)
+    assert (loaded.t, loaded.dt, loaded.step_count) == (saved.t, saved.dt, saved.step_count)
+    assert loaded.rng.standard_normal() == saved.rng.standard_normal()
+
+
+def test_resample_to_finer_grid_and_back(tmp_path):
+    coarse = advanced_solver()
+    path = save_checkpoint(coarse, str(tmp_path / 'coarse.tck'))
+    fine = advanced_solver(N=32, steps=0)
+    load_checkpoint(fine, path)
+    # Every dealiased mode of the coarse grid fits on the fine one
+    assert np.isclose(fine.energy(), coarse.energy())
+    back = advanced_solver(steps=0)
+    load_checkpoint(back, save_checkpoint(fine, str(tmp_path / 'fine.tck')))
+    assert np.allclose(back.state, coarse.state, rtol=0, atol=1e-15)
@@ -0,0 +1,38 @@
+"""
+Random forcing tests
+One kick of a field at rest injects exactly rate * dt of energy
+"""
+
+import numpy as np
+from tarang_engine.params import DEFAULT_PARAMETERS
+from tarang_engine.simulation import make_solver
+
+
+def kicked(dt=0.01, **overrides):
+    params = dict(DEFAULT_PARAMETERS, Nx=16, Ny=16, Nz=16, FORCING_ENABLED=True, forcing_range=[2, 3])
+    params.update(overrides)
+    solver = make_solver(params)
+    solver.state[...] = 0
+    solver.forcing.apply(dt)
+    return solver
+
+
+def test_velocity_injection_rate():
+    solver = kicked(kind='HYDRO', injection_rate=0.1)
+    assert np.isclose(solver.energy(), 0.1 * 0.01)
+    assert np.isclose(solver.forcing.injected, 0.1 * 0.01)
+
+
+def test_elsasser_injection_rates():
+    solver = kicked(kind='MHD', injection_rate=None, injections=[0.1, 0.03, 0])
+    u, b = solver.state[:3], solver.state[3:6]
+    assert np.isclose(solver.field_energy(u + b), 0.1 * 0.01)
+    assert np.isclose(solver.field_energy(u - b), 0.03 * 0.01)
+
+
+def test_force_is_hermitian():
+    solver = kicked(kind='HYDRO', injection_rate=0.1)
+    state = solver.state.copy()
+    real = np.empty((3,) + solver.fft.real_shape)
+    solver.fft.backward(state.copy(), out=real)
+    assert np.allclose(solver.fft.forward(real), state, atol=1e-14)
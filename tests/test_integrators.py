@@ -0,0 +1,30 @@
+"""
+Time integrator tests
+Each scheme converges at its design order on a decaying 2D run
+"""
+
+import numpy as np
+import pytest
+from tarang_engine.initial import random_field
+from tarang_engine.params import DEFAULT_PARAMETERS
+from tarang_engine.simulation import make_solver
+
+T_FINAL = 0.2
+
+
+def final_state(scheme, steps):
+    params = dict(DEFAULT_PARAMETERS, dimension=2, Nx=16, Ny=16, Nz=1, nu=0.05, time_scheme=scheme,
+                  FORCING_ENABLED=False)
+    solver = make_solver(params)
+    random_field(solver, 2, 0.5)
+    for _ in range(steps):
+        solver.step(T_FINAL / steps)
+    return solver.state
+
+
+@pytest.mark.parametrize('scheme, order', [('EULER', 1), ('RK2', 2), ('RK4', 4), ('ETD1', 1), ('ETD2', 2)])
+def test_convergence_order(scheme, order):
+    reference = final_state('RK4', 256)
+    errors = [np.abs(final_state(scheme, steps) - reference).max() for steps in (8, 16, 32)]
+    rates = np.log2(np.divide(errors[:-1], errors[1:]))
+    assert np.all(np.abs(rates - order) < 0.2), rates
@@ -0,0 +1,54 @@
+"""
+Kernel backend tests
+The Numba kernels agree with the NumPy ones to rounding, and a missing numba falls back to NumPy
+"""
+
+import sys
+import numpy as np
+import pytest
+import tarang_engine
+from tarang_engine import kernels
+from tarang_engine.initial import random_field
+from tarang_engine.params import DEFAULT_PARAMETERS
+from tarang_engine.simulation import make_fft, make_solver
+
+# Fused loops round differently from chained NumPy passes, by a few ulps of the state
+TOLERANCE = dict(rtol=1e-12, atol=1e-14)
+
+
+def advanced_state(scheme, backend, workers=0, **overrides):
+    params = dict(DEFAULT_PARAMETERS, kind='MHD', Nx=16, Ny=16, Nz=16, time_scheme=scheme, kernel_backend=backend,
+                  shm_workers=workers, **overrides)
+    fft = make_fft(params)
+    try:
+        solver = make_solver(params, fft=fft)
+        random_field(solver, 2, 0.5)
+        for _ in range(4):
+            solver.step(1e-3)
+        return solver.state.copy()
+    finally:
+        fft.close()
+
+
+@pytest.mark.parametrize('scheme', ['EULER', 'RK2', 'RK4', 'ETD1', 'ETD2'])
+def test_numba_agrees_with_numpy(scheme):
+    pytest.importorskip('numba')
+    assert np.allclose(advanced_state(scheme, 'numba'), advanced_state(scheme, 'numpy'), **TOLERANCE)
+
+
+def test_numba_agrees_with_numpy_on_workers():
+    pytest.importorskip('numba')
+    assert np.allclose(advanced_state('RK4', 'numba', workers=2), advanced_state('RK4', 'numpy'), **TOLERANCE)
+
+
+def test_missing_numba_falls_back_to_numpy(monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, 'numba', None)
+    monkeypatch.delitem(sys.modules, 'tarang_engine.numba_kernels', raising=False)
+    monkeypatch.delattr(tarang_engine, 'numba_kernels', raising=False)
+    assert kernels.load_backend('numba') is kernels
+    assert 'numba is not installed' in capsys.readouterr().out
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match='kernel_backend'):
+        kernels.load_backend('cython')
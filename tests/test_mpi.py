@@ -0,0 +1,36 @@
+"""
+Distributed run tests
+Each test launches a helper script on two ranks and is skipped without mpiexec and mpi4py
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import pytest
+
+pytest.importorskip('mpi4py')
+pytestmark = pytest.mark.skipif(shutil.which('mpiexec') is None, reason='needs mpiexec')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_on_two_ranks(script, *args):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(HERE),
+                                                                    os.environ.get('PYTHONPATH')])))
+    result = subprocess.run(['mpiexec', '-n', '2', sys.executable, os.path.join(HERE, script), *map(str, args)],
+                            env=env, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_real_fields_round_trip(tmp_path):
+    run_on_two_ranks('mpi_real_fields.py', tmp_path)
+    # One global file per save time, with no rank suffix
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith('Real_')) == \
+        ['Real_0.000000.h5', 'Real_0.020000.h5']
+
+
+@pytest.mark.parametrize('decomposition', ['slab', 'pencil'])
+@pytest.mark.parametrize('kind', ['HYDRO', 'MHD'])
+def test_forcing_independent_of_decomposition(decomposition, kind):
+    run_on_two_ranks('mpi_forcing.py', decomposition, kind)
@@ -0,0 +1,60 @@
+"""
+Run output tests
+Checks which states a short run writes at its save cadences
+"""
+
+import os
+import h5py
+import numpy as np
+from tarang_engine.ensemble import Ensemble
+from tarang_engine.params import DEFAULT_PARAMETERS, load_parameters
+from tarang_engine.simulation import RunOutputs, Simulation
+
+PARA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'para.py')
+
+
+def short_run(output_dir, **overrides):
+    params = dict(DEFAULT_PARAMETERS, dimension=2, Nx=16, Ny=16, Nz=1, dt=0.01, t_initial=0.0, t_final=0.1,
+                  output_dir=str(output_dir), iter_field_save_start=0, iter_field_save_inter=5,
+                  iter_ekTk_save_start=0, iter_ekTk_save_inter=5, iter_checkpoint_save_inter=0,
+                  iter_glob_energy_print_inter=100, PRINT_PHASE_TIMES=False)
+    params.update(overrides)
+    return params
+
+
+def test_last_save_time_is_written(tmp_path):
+    Simulation(short_run(tmp_path)).run()
+    saved = sorted(name for name in os.listdir(tmp_path) if name.startswith('Soln_'))
+    assert saved == ['Soln_0.000000.h5', 'Soln_0.050000.h5', 'Soln_0.100000.h5']
+    with h5py.File(tmp_path / 'spectrum.h5', 'r') as f:
+        assert list(f['step'][:]) == [0, 5, 10]
+
+
+def test_ensemble_writes_last_save_time(tmp_path):
+    members = [short_run(tmp_path / name, nu=nu) for name, nu in (('a', 0.01), ('b', 0.02))]
+    Ensemble(members).run()
+    for name in ('a', 'b'):
+        assert os.path.exists(tmp_path / name / 'Soln_0.100000.h5')
+
+
+def test_2d_run_from_shipped_para(tmp_path):
+    params = load_parameters(PARA)
+    params.update(dimension=2, Nx=16, Ny=16, output_dir=str(tmp_path), PRINT_PHASE_TIMES=False)
+    Simulation(params).run()
+    # (1, 0, 0) is the 2D mode (1, 0); (0, 0, 1) has no counterpart and is dropped
+    with h5py.File(tmp_path / 'modes.h5', 'r') as f:
+        assert np.array_equal(f['modes'][...], [[1, 0]])
+        assert list(f['step'][:]) == [0]
+
+
+def test_derived_fields_written_without_wider_buffers(tmp_path):
+    simulation = Simulation(short_run(tmp_path, SAVE_VECPOT=True, t_final=0.05))
+    outputs = RunOutputs(simulation)
+    assert outputs.writer._free.get().shape == simulation.solver.state.shape
+    outputs.close()
+    simulation.run()
+    solver = simulation.solver
+    psi = solver.streamfunction(np.empty_like(solver.state))
+    with h5py.File(tmp_path / 'Soln_0.050000.h5', 'r') as f:
+        assert np.array_equal(f['Psi'][...], psi[0])
+        assert np.array_equal(f['Wz'][...], solver.state[0])
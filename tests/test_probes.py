@@ -0,0 +1,39 @@
+"""
+Mode probe tests
+Samples reach the file a block at a time, with the remainder flushed on close
+"""
+
+import h5py
+import numpy as np
+from tarang_engine.initial import random_field
+from tarang_engine.params import DEFAULT_PARAMETERS
+from tarang_engine.probes import ModeProbe, planar_modes
+from tarang_engine.simulation import make_solver
+
+
+def test_ring_buffer_flush(tmp_path):
+    solver = make_solver(dict(DEFAULT_PARAMETERS, kind='HYDRO', Nx=16, Ny=16, Nz=16))
+    random_field(solver, 2, 0.5)
+    path = str(tmp_path / 'modes.h5')
+    modes = [(1, 0, 0), (0, 2, -1)]
+    probe = ModeProbe(path, modes, solver.state, solver.fft, block=4)
+    expected = []
+    for step in range(10):
+        probe.sample(0.1 * step, step)
+        expected.append([np.conj(solver.state[:, 0, -2, 1]), solver.state[:, 1, 0, 0].copy()])
+        solver.state *= 0.5
+        if step == 4:
+            # One full block written, one sample waiting in the ring
+            with h5py.File(path, 'r') as f:
+                assert f['step'].shape == (4,)
+    probe.close()
+    with h5py.File(path, 'r') as f:
+        # Modes are stored in memory order; (0, 2, -1) is the conjugate of the stored (0, -2, 1)
+        assert f['modes'][:].tolist() == [[0, 2, -1], [1, 0, 0]]
+        assert list(f['step'][:]) == list(range(10))
+        assert np.allclose(f['t'][:], 0.1 * np.arange(10))
+        assert np.array_equal(f['samples'][:], np.moveaxis(np.array(expected), 1, 2))
+
+
+def test_planar_modes():
+    assert planar_modes([(1, 0, 0), (2, 1, 3), (0, 1)], 2) == [(1, 0), (0, 1)]
@@ -0,0 +1,47 @@
+"""
+Spectrum tests
+Shell spectra sum to the energy and the nonlinear transfer conserves it
+"""
+
+import numpy as np
+from tarang_engine.initial import random_field
+from tarang_engine.params import DEFAULT_PARAMETERS
+from tarang_engine.simulation import make_solver
+from tarang_engine.spectra import ShellTransfer, energy_flux, shell_spectrum, transfer_spectra
+
+
+def hydro_solver(**overrides):
+    solver = make_solver(dict(DEFAULT_PARAMETERS, kind='HYDRO', Nx=16, Ny=16, Nz=16, **overrides))
+    random_field(solver, 3, 0.5)
+    return solver
+
+
+def test_shell_spectrum_sums_to_energy():
+    solver = hydro_solver()
+    assert np.isclose(shell_spectrum(solver, solver.uk).sum(), solver.energy())
+
+
+def test_transfer_and_flux_conserve_energy():
+    solver = hydro_solver()
+    transfer, = transfer_spectra(solver)
+    scale = np.abs(transfer).max()
+    assert abs(transfer.sum()) < 1e-12 * scale
+    flux = energy_flux(transfer)
+    assert np.allclose(np.diff(flux), -transfer[1:])
+    assert abs(flux[-1]) < 1e-12 * scale
+
+
+def test_shell_transfer_matches_transfer_spectrum():
+    matrices = []
+    for batch in (1, 3):
+        solver = hydro_solver()
+        shells = ShellTransfer(solver, batch=batch)
+        matrices.append(shells.compute())
+    matrix = matrices[0]
+    assert np.allclose(matrices[1], matrix, rtol=0, atol=1e-15)
+    # Energy moves between bands: T(n, m) = -T(m, n), and the givers add up to the band's T(k)
+    assert np.allclose(matrix, -matrix.T, rtol=0, atol=1e-12)
+    transfer, = transfer_spectra(solver)
+    band = np.clip(np.searchsorted(shells.edges, np.arange(len(transfer)), side='right') - 1, 0, shells.nbands - 1)
+    assert np.allclose(matrix.sum(axis=1), np.bincount(band, weights=transfer, minlength=shells.nbands),
+                       rtol=0, atol=1e-12)